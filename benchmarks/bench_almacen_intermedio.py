@@ -0,0 +1,74 @@
+# bench_almacen_intermedio.py
+"""
+Compara el tiempo de escritura y relectura de los resultados intermedios de cada etapa
+en los formatos del almacén (CSV/JSON histórico, Parquet y Feather).
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_almacen_intermedio [--repeticiones N]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from tasks.extraction.data_extraction import extraer_datos
+from tasks.transformation.data_cleaning import task1_process
+from tasks.transformation.data_transformation import task2_process
+from tasks.transformation.data_integration import task3_process
+from tasks.concatenation.data_concatenation import task4_process
+from tasks.storage.intermediate_store import configurar_almacen, guardar_intermedio, leer_intermedio, FORMATOS
+
+def resultados_por_etapa():
+    """Ejecuta las etapas una vez (con el almacén en un directorio temporal) y retorna sus resultados."""
+    df_licencias_202104, df_licencias_202105, df_terrazas, df_books = extraer_datos()
+    df_terrazas_n, df_licencias_n, df_locales_n, df_books_n = task1_process(df_terrazas, df_licencias_202104, None, df_books)
+    df_licencias_l, _, df_terrazas_l, df_books_l = task2_process(df_licencias_n, df_locales_n, df_terrazas_n, df_books_n)
+    df_joined, df_surface, df_distrito, df_large = task3_process(df_terrazas_l, df_licencias_l)
+    task4_process(df_licencias_202104, df_licencias_202105)
+    df_concatenated = leer_intermedio('Licencias_Concatenadas')
+    return [
+        ('task2_process', 'Licencias_SinDuplicados', df_licencias_l, 'csv'),
+        ('task2_process', 'Terrazas_SinDuplicados', df_terrazas_l, 'csv'),
+        ('task2_process', 'Books_Limpio', df_books_l, 'json'),
+        ('task3_process', 'Licencias_Terrazas_Integradas', df_joined, 'csv'),
+        ('task3_process', 'Superficies_Agregadas', df_surface, 'csv'),
+        ('task3_process', 'Licencias_Por_Distrito', df_distrito, 'csv'),
+        ('task3_process', 'Terrazas_Grandes', df_large, 'csv'),
+        ('concatenate_datasets', 'Licencias_Concatenadas', df_concatenated, 'csv'),
+    ]
+
+def medir(df, nombre, exportacion, repeticiones):
+    escritura, lectura = [], []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        ruta = guardar_intermedio(df, nombre, exportacion)
+        escritura.append(time.perf_counter() - inicio)
+        inicio = time.perf_counter()
+        leer_intermedio(nombre, exportacion=exportacion)
+        lectura.append(time.perf_counter() - inicio)
+    return min(escritura), min(lectura), os.path.getsize(ruta)
+
+def bench_almacen_intermedio(repeticiones=3):
+    filas = []
+    with tempfile.TemporaryDirectory() as directorio:
+        configurar_almacen(formato='parquet', exportar_csv=False, directorio=directorio)
+        resultados = resultados_por_etapa()
+        for formato in FORMATOS:
+            configurar_almacen(formato=formato, exportar_csv=False, directorio=os.path.join(directorio, formato))
+            for etapa, nombre, df, exportacion in resultados:
+                if df is None or df.empty:
+                    continue
+                escritura, lectura, tamano = medir(df, nombre, exportacion, repeticiones)
+                filas.append({'etapa': etapa, 'dataset': nombre, 'formato': formato, 'filas': len(df),
+                              'escritura_s': round(escritura, 4), 'lectura_s': round(lectura, 4), 'bytes': tamano})
+    return pd.DataFrame(filas)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(bench_almacen_intermedio(args.repeticiones).to_string(index=False))
@@ -0,0 +1,73 @@
+# bench_casi_duplicados.py
+"""
+Mide la detección de casi duplicados (tasks/transformation/near_duplicates.py) sobre los locales
+de Terrazas_202104.csv replicados N veces. Cada réplica recibe id_local nuevos y, con
+probabilidad --erratas, una errata de un carácter en el rótulo, de modo que cada local original
+tiene N-1 casi duplicados en su bloque. Se informa de pares candidatos, pares confirmados,
+clusters y tiempo por fase, junto a las comparaciones que haría una búsqueda exhaustiva por bloque.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_casi_duplicados [--factores 1 10 100] [--erratas 0.5]
+"""
+import argparse
+import logging
+import string
+import time
+
+import numpy as np
+import pandas as pd
+
+from tasks.extraction.data_extraction import leer_csv_municipal, RUTA_TERRAZAS
+from tasks.transformation.near_duplicates import detectar_casi_duplicados, COLUMNAS_BLOQUE, COLUMNAS_TEXTO
+
+def con_errata(texto, rng):
+    """Sustituye, borra o inserta un carácter en una posición aleatoria del texto."""
+    posicion = int(rng.integers(0, max(len(texto), 1)))
+    letra = string.ascii_uppercase[int(rng.integers(0, 26))]
+    operacion = rng.integers(0, 3)
+    if operacion == 0:
+        return texto[:posicion] + letra + texto[posicion + 1:]
+    if operacion == 1:
+        return texto[:posicion] + texto[posicion + 1:]
+    return texto[:posicion] + letra + texto[posicion:]
+
+def replicar_locales(locales, factor, erratas=0.5, semilla=0):
+    rng = np.random.default_rng(semilla)
+    id_maximo = int(locales['id_local'].max())
+    replicas = [locales]
+    for replica in range(1, factor):
+        copia = locales.copy()
+        copia['id_local'] = id_maximo + replica * len(locales) + np.arange(len(locales))
+        rotulos = copia['rotulo'].astype(object).to_numpy()
+        cambiar = np.flatnonzero(rng.random(len(copia)) < erratas)
+        rotulos[cambiar] = [con_errata(str(r), rng) for r in rotulos[cambiar]]
+        copia['rotulo'] = rotulos
+        replicas.append(copia)
+    return pd.concat(replicas, ignore_index=True)
+
+def bench_casi_duplicados(factores=(1, 10, 100), erratas=0.5, semilla=0):
+    terrazas = leer_csv_municipal(RUTA_TERRAZAS, 'terrazas')
+    locales = terrazas.drop_duplicates('id_local')[['id_local'] + COLUMNAS_BLOQUE + COLUMNAS_TEXTO]
+    locales = locales.assign(rotulo=locales['rotulo'].astype(object))
+    filas = []
+    for factor in factores:
+        df = replicar_locales(locales, factor, erratas, semilla)
+        inicio = time.perf_counter()
+        clusters, estadisticas = detectar_casi_duplicados(df)
+        segundos = time.perf_counter() - inicio
+        fila = {'factor': factor, 'segundos': round(segundos, 3)}
+        fila.update({k: v for k, v in estadisticas.items() if k != 'segundos'})
+        fila.update({f"s_{fase}": t for fase, t in estadisticas['segundos'].items()})
+        filas.append(fila)
+        logging.info(f"Casi duplicados x{factor}: {fila}")
+    return pd.DataFrame(filas)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factores", type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument("--erratas", type=float, default=0.5, help="Fracción de rótulos replicados con una errata.")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    pd.set_option('display.width', 250)
+    print(bench_casi_duplicados(args.factores, args.erratas, args.semilla).T.to_string(header=False))
@@ -0,0 +1,202 @@
+# bench_etl.py
+"""
+Benchmark de extremo a extremo del pipeline ETL sobre datos sintéticos escalados
+(benchmarks/datos_sinteticos.py). Para cada factor de escala mide por separado extraer_datos,
+task1_process ... task4_process y las cargas al Data Warehouse: tiempo, pico de memoria (RSS)
+y filas por segundo. Los resultados se guardan en JSON, etiquetados con el commit, para
+comparar ejecuciones entre commits con --comparar.
+
+Las cargas se ejecutan contra:
+    postgres  la base de datos de config/db_config.py (por defecto);
+    pgserver  un PostgreSQL embebido y temporal (paquete opcional 'pgserver');
+    sqlite    un archivo SQLite con DataFrame.to_sql (sin COPY, modelo estrella ni Inmon).
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_etl [--factores 1 10 100] [--db pgserver] [--comparar ANTERIOR.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.datos_sinteticos import generar_datasets
+from tasks.extraction.data_extraction import extraer_datos, RUTA_TERRAZAS, RUTA_BOOKS
+from tasks.transformation.data_cleaning import task1_process
+from tasks.transformation.data_transformation import task2_process
+from tasks.transformation.data_integration import task3_process
+from tasks.concatenation.data_concatenation import task4_process
+from tasks.storage.intermediate_store import configurar_almacen, leer_intermedio
+from tasks.pipeline.instrumentation import MedidorMemoria, filas_de
+from tasks.loading.db_pool import cerrar_pool
+
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados')
+UMBRAL_REGRESION = 1.10  # Ratio de tiempo frente a la ejecución anterior que se marca como regresión
+
+def medir_etapa(mediciones, factor, etapa, funcion, *args, filas_entrada=None, **kwargs):
+    """
+    Ejecuta una etapa midiendo tiempo, pico de RSS y filas por segundo. Retorna su resultado.
+    Las etapas que indican un fallo retornando False o None (las cargas) se marcan como no correctas.
+    """
+    with MedidorMemoria() as memoria:
+        inicio = time.perf_counter()
+        resultado = funcion(*args, **kwargs)
+        duracion = time.perf_counter() - inicio
+    filas = (filas_de(resultado) or 0) if filas_entrada is None else filas_entrada
+    mediciones.append({
+        'factor': factor, 'etapa': etapa, 'correcta': resultado is not None and resultado is not False,
+        'segundos': round(duracion, 4), 'filas': filas,
+        'filas_por_segundo': round(filas / duracion) if duracion else None,
+        'rss_pico_mb': round(memoria.pico / 2 ** 20, 1),
+        'rss_incremento_mb': round((memoria.pico - memoria.inicial) / 2 ** 20, 1),
+    })
+    logging.info(f"Benchmark x{factor} {etapa}: {duracion:.2f} s, {filas} filas, pico RSS {memoria.pico / 2 ** 20:.0f} MB.")
+    return resultado
+
+def preparar_base_datos(db, directorio):
+    """
+    Prepara la base de datos de las cargas y retorna el servidor embebido (o None). Con pgserver y
+    sqlite la URL se pasa al pool mediante ETL_DB_URL, sin tocar config/db_config.py.
+    """
+    if db == 'sqlite':
+        os.environ['ETL_DB_URL'] = f"sqlite:///{os.path.join(directorio, 'dw.sqlite')}"
+        return None
+    if db == 'pgserver':
+        try:
+            import pgserver
+        except ImportError:
+            raise SystemExit("El paquete opcional 'pgserver' no está instalado (pip install pgserver).")
+        servidor = pgserver.get_server(os.path.join(directorio, 'pgdata'), cleanup_mode='delete')
+        os.environ['ETL_DB_URL'] = servidor.get_uri()
+        return servidor
+    return None
+
+def cargar(mediciones, factor, db, tablas, df_joined, df_terrazas, df_licencias):
+    """Mide cada carga del Data Warehouse y, en PostgreSQL, el modelo estrella y el modelo Inmon."""
+    from tasks.loading.data_loading import load_to_data_warehouse
+
+    metodo = 'to_sql' if db == 'sqlite' else 'copy'
+    for table_name, df in tablas.items():
+        medir_etapa(mediciones, factor, f"carga_{table_name}", load_to_data_warehouse, df, table_name,
+                    if_exists='replace', metodo=metodo, filas_entrada=len(df))
+    if db == 'sqlite':
+        return
+    from tasks.loading.dimensional_modeling import create_dimensional_tables, populate_dimensional_tables
+    from tasks.loading.inmon_modeling import create_inmon_tables, populate_inmon_tables
+    create_dimensional_tables()
+    create_inmon_tables()
+    medir_etapa(mediciones, factor, 'poblar_kimball', populate_dimensional_tables, df_joined,
+                filas_entrada=len(df_joined))
+    medir_etapa(mediciones, factor, 'poblar_inmon', populate_inmon_tables, df_terrazas, df_licencias,
+                filas_entrada=len(df_terrazas) + len(df_licencias))
+
+def bench_factor(factor, db, cargas=True, semilla=0):
+    """Genera los datos de un factor en un directorio temporal y mide todas las etapas."""
+    mediciones = []
+    directorio_inicial = os.getcwd()
+    rutas = {'ruta_terrazas': os.path.abspath(RUTA_TERRAZAS), 'ruta_books': os.path.abspath(RUTA_BOOKS)}
+    with tempfile.TemporaryDirectory(prefix=f"bench_etl_x{factor}_") as directorio:
+        inicio = time.perf_counter()
+        filas = generar_datasets(factor, directorio, semilla, **rutas)
+        logging.info(f"Datos x{factor} generados en {time.perf_counter() - inicio:.1f} s: {filas}.")
+        servidor = preparar_base_datos(db, directorio) if cargas else None
+        # Las rutas de extracción y del almacén intermedio son relativas a 'datasets/'
+        os.chdir(directorio)
+        try:
+            configurar_almacen(directorio='datasets')
+            lic_04, lic_05, terrazas, books = medir_etapa(mediciones, factor, 'extraer_datos', extraer_datos)
+            if lic_04 is None:
+                raise RuntimeError("La extracción de los datos sintéticos falló. Verifica el log.")
+            terrazas_n, licencias_n, locales_n, books_n = medir_etapa(
+                mediciones, factor, 'task1_process', task1_process, terrazas, lic_04, None, books)
+            licencias_l, _, terrazas_l, _ = medir_etapa(
+                mediciones, factor, 'task2_process', task2_process, licencias_n, locales_n, terrazas_n, books_n)
+            df_joined, df_surface, _, _ = medir_etapa(
+                mediciones, factor, 'task3_process', task3_process, terrazas_l, licencias_l)
+            medir_etapa(mediciones, factor, 'task4_process', task4_process, lic_04, lic_05)
+            # La Tarea 4 guarda un bloque por mes; la carga medida es la del dataset completo
+            df_concatenated = leer_intermedio('Licencias_Concatenadas')
+            if cargas:
+                cargar(mediciones, factor, db, {
+                    'licencias_terrazas_integradas': df_joined,
+                    'licencias_concatenadas': df_concatenated,
+                    'superficies_agregadas': df_surface,
+                }, df_joined, terrazas_l, licencias_l)
+        finally:
+            cerrar_pool()
+            os.chdir(directorio_inicial)
+            os.environ.pop('ETL_DB_URL', None)
+            if servidor is not None:
+                servidor.cleanup()
+    for medicion in mediciones:
+        medicion['filas_terrazas'] = filas['terrazas']
+    return mediciones
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+def guardar_resultados(mediciones, db, ruta=None):
+    """Guarda las mediciones en JSON junto con el commit y el entorno. Retorna la ruta."""
+    commit = commit_actual()
+    if ruta is None:
+        os.makedirs(DIRECTORIO_RESULTADOS, exist_ok=True)
+        ruta = os.path.join(DIRECTORIO_RESULTADOS, f"etl_{commit}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    documento = {
+        'commit': commit, 'fecha': datetime.now().isoformat(timespec='seconds'), 'db': db,
+        'entorno': {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                    'plataforma': platform.platform(), 'cpus': os.cpu_count()},
+        'mediciones': mediciones,
+    }
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(documento, f, indent=2, ensure_ascii=False)
+    return ruta
+
+def comparar(mediciones, ruta_anterior):
+    """Tiempo y memoria de cada etapa frente a una ejecución anterior guardada en JSON."""
+    with open(ruta_anterior, encoding='utf-8') as f:
+        anterior = json.load(f)
+    df_anterior = pd.DataFrame(anterior['mediciones']).set_index(['factor', 'etapa'])
+    df_actual = pd.DataFrame(mediciones).set_index(['factor', 'etapa'])
+    comparacion = df_actual[['segundos', 'rss_pico_mb']].join(
+        df_anterior[['segundos', 'rss_pico_mb']], rsuffix='_anterior', how='inner')
+    comparacion['ratio_tiempo'] = (comparacion['segundos'] / comparacion['segundos_anterior']).round(2)
+    comparacion['ratio_memoria'] = (comparacion['rss_pico_mb'] / comparacion['rss_pico_mb_anterior']).round(2)
+    comparacion['regresion'] = comparacion['ratio_tiempo'] > UMBRAL_REGRESION
+    print(f"\nComparación con el commit {anterior['commit']} ({anterior['fecha']}):")
+    print(comparacion.reset_index().to_string(index=False))
+    return comparacion
+
+def bench_etl(factores=(1, 10), db='postgres', cargas=True, semilla=0):
+    mediciones = []
+    for factor in factores:
+        mediciones.extend(bench_factor(factor, db, cargas, semilla))
+    return mediciones
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factores", type=int, nargs='+', default=[1, 10],
+                        help="Factores de escala (p. ej. 1 10 100 1000; 1000 necesita decenas de GB de memoria).")
+    parser.add_argument("--db", choices=['postgres', 'pgserver', 'sqlite'], default='postgres')
+    parser.add_argument("--sin-cargas", action="store_true", help="Medir solo extracción y transformación.")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="Ruta del JSON de resultados (por defecto, benchmarks/resultados/).")
+    parser.add_argument("--comparar", metavar="JSON", help="Resultados anteriores con los que comparar.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    resultados = bench_etl(args.factores, args.db, not args.sin_cargas, args.semilla)
+    print(pd.DataFrame(resultados).drop(columns='filas_terrazas').to_string(index=False))
+    print(f"\nResultados guardados en {guardar_resultados(resultados, args.db, args.salida)}")
+    if args.comparar:
+        comparar(resultados, args.comparar)
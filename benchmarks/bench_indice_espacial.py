@@ -0,0 +1,84 @@
+# bench_indice_espacial.py
+"""
+Compara las consultas del índice de rejilla (tasks/transformation/spatial_index.py) con el
+cálculo por fuerza bruta de todas las distancias entre pares (por lotes de filas, en NumPy),
+sobre las coordenadas de Terrazas_202104.csv replicadas N veces con un desplazamiento aleatorio
+de hasta --dispersion metros. Se miden la construcción del índice, el conteo de terrazas a
+menos de --radio metros de cada terraza y sus --k vecinos más cercanos, y se comprueba que los
+resultados coinciden. La fuerza bruta se omite por encima de --max-fuerza-bruta puntos.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_indice_espacial [--factores 1 10 100] [--radio 50] [--k 10]
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from tasks.extraction.data_extraction import leer_csv_municipal, RUTA_TERRAZAS
+from tasks.transformation.spatial_index import IndiceRejilla, coordenadas_validas, COLUMNAS_COORDENADAS
+
+FILAS_LOTE_FUERZA_BRUTA = 1000  # Filas de la matriz de distancias que se calculan a la vez
+
+def replicar_coordenadas(x, y, factor, dispersion=100.0, semilla=0):
+    rng = np.random.default_rng(semilla)
+    desplazamiento = rng.uniform(-dispersion, dispersion, size=(factor - 1, len(x), 2))
+    return (np.concatenate([x] + [x + d[:, 0] for d in desplazamiento]),
+            np.concatenate([y] + [y + d[:, 1] for d in desplazamiento]))
+
+def fuerza_bruta(x, y, radio, k):
+    """Conteo en radio y distancias de los k más cercanos calculando todas las distancias."""
+    conteos = np.empty(len(x), dtype=np.int64)
+    distancias_k = np.empty((len(x), k))
+    for inicio in range(0, len(x), FILAS_LOTE_FUERZA_BRUTA):
+        bloque = slice(inicio, inicio + FILAS_LOTE_FUERZA_BRUTA)
+        distancias = np.hypot(x[bloque, None] - x[None, :], y[bloque, None] - y[None, :])
+        conteos[bloque] = (distancias <= radio).sum(axis=1)
+        distancias_k[bloque] = np.sort(np.partition(distancias, k - 1, axis=1)[:, :k], axis=1)
+    return conteos, distancias_k
+
+def bench_indice_espacial(factores=(1, 10, 100), radio=50.0, k=10, dispersion=100.0, max_fuerza_bruta=100_000):
+    terrazas = leer_csv_municipal(RUTA_TERRAZAS, 'terrazas')
+    x0 = terrazas[COLUMNAS_COORDENADAS[0]].to_numpy(dtype=np.float64)
+    y0 = terrazas[COLUMNAS_COORDENADAS[1]].to_numpy(dtype=np.float64)
+    validos = coordenadas_validas(x0, y0)
+    x0, y0 = x0[validos], y0[validos]
+    filas = []
+    for factor in factores:
+        x, y = replicar_coordenadas(x0, y0, factor, dispersion)
+        inicio = time.perf_counter()
+        indice = IndiceRejilla(x, y)
+        construccion = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        conteos = indice.contar_en_radio(x, y, radio)
+        t_radio = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        _, distancias_k = indice.k_vecinos(x, y, k)
+        t_knn = time.perf_counter() - inicio
+        fila = {'factor': factor, 'puntos': len(x), 'construccion_s': round(construccion, 3),
+                'radio_s': round(t_radio, 3), 'knn_s': round(t_knn, 3),
+                'vecinos_medio': round(float(conteos.mean()) - 1, 2)}
+        if len(x) <= max_fuerza_bruta:
+            inicio = time.perf_counter()
+            conteos_fb, distancias_fb = fuerza_bruta(x, y, radio, k)
+            t_fb = time.perf_counter() - inicio
+            fila.update({'fuerza_bruta_s': round(t_fb, 3),
+                         'aceleracion': round(t_fb / (t_radio + t_knn), 1),
+                         'iguales': bool((conteos == conteos_fb).all() and np.allclose(distancias_k, distancias_fb))})
+        filas.append(fila)
+        logging.info(f"Índice espacial x{factor}: {fila}")
+    return pd.DataFrame(filas)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factores", type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument("--radio", type=float, default=50.0)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dispersion", type=float, default=100.0, help="Desplazamiento máximo de las réplicas (m).")
+    parser.add_argument("--max-fuerza-bruta", type=int, default=100_000,
+                        help="Puntos a partir de los que no se ejecuta la fuerza bruta (coste cuadrático).")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(bench_indice_espacial(args.factores, args.radio, args.k, args.dispersion, args.max_fuerza_bruta).to_string(index=False))
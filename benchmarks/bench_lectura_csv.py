@@ -0,0 +1,81 @@
+# bench_lectura_csv.py
+"""
+Compara la lectura actual de un export municipal (pd.read_csv con el esquema, como en
+leer_csv_municipal) con leer_csv_mmap (archivo mapeado y rangos de filas parseados en
+varios procesos con el motor C de pandas o con pyarrow) sobre Terrazas_202104.csv
+replicado 1, 10 y 100 veces con benchmarks/datos_sinteticos.py.
+
+El pico de RSS es el del proceso principal: con varios procesos, la memoria de cada
+trabajador (su rango y su DataFrame parcial) no se suma.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_lectura_csv [--factores 1 10 100] [--procesos 4] [--repeticiones 3]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.datos_sinteticos import leer_plantilla_csv, replica_terrazas, _escribir_csv
+from tasks.extraction.data_extraction import ENCODING, RUTA_TERRAZAS
+from tasks.extraction.mmap_csv import leer_csv_mmap
+from tasks.extraction.schemas import opciones_lectura_csv
+from tasks.pipeline.instrumentation import MedidorMemoria
+
+def escribir_terrazas(factor, ruta):
+    """Escribe el export de terrazas replicado 'factor' veces. Retorna las filas escritas."""
+    plantilla = leer_plantilla_csv(RUTA_TERRAZAS)
+    for replica in range(factor):
+        _escribir_csv(replica_terrazas(plantilla, replica), ruta, replica == 0)
+    return len(plantilla) * factor
+
+def lectores(procesos):
+    opciones = opciones_lectura_csv('terrazas')
+    return {
+        'pd.read_csv': lambda ruta: pd.read_csv(ruta, sep=';', encoding=ENCODING, **opciones),
+        'mmap + motor C': lambda ruta: leer_csv_mmap(ruta, encoding=ENCODING, max_workers=procesos, **opciones),
+        'mmap + pyarrow': lambda ruta: leer_csv_mmap(ruta, encoding=ENCODING, max_workers=procesos,
+                                                     motor='pyarrow', **opciones),
+    }
+
+def medir(lector, ruta, repeticiones):
+    tiempos, pico = [], 0
+    for _ in range(repeticiones):
+        with MedidorMemoria() as memoria:
+            inicio = time.perf_counter()
+            df = lector(ruta)
+            tiempos.append(time.perf_counter() - inicio)
+        pico = max(pico, memoria.pico - memoria.inicial)
+    return min(tiempos), pico, df
+
+def bench_lectura_csv(factores=(1, 10, 100), procesos=None, repeticiones=3):
+    procesos = procesos or os.cpu_count()
+    filas = []
+    with tempfile.TemporaryDirectory(prefix="bench_lectura_csv_") as directorio:
+        for factor in factores:
+            ruta = os.path.join(directorio, f"Terrazas_x{factor}.csv")
+            n = escribir_terrazas(factor, ruta)
+            referencia = None
+            for metodo, lector in lectores(procesos).items():
+                segundos, pico, df = medir(lector, ruta, repeticiones)
+                if referencia is None:
+                    referencia, tiempo_referencia = df, segundos
+                filas.append({'factor': factor, 'mb_archivo': round(os.path.getsize(ruta) / 2 ** 20, 1),
+                              'filas': n, 'metodo': metodo, 'segundos': round(segundos, 3),
+                              'aceleracion': round(tiempo_referencia / segundos, 2),
+                              'rss_incremento_mb': round(pico / 2 ** 20, 1), 'iguales': df.equals(referencia)})
+            os.remove(ruta)
+    return pd.DataFrame(filas)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factores", type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument("--procesos", type=int, help="Procesos de leer_csv_mmap (por defecto, los CPUs).")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(f"CPUs: {os.cpu_count()}")
+    print(bench_lectura_csv(args.factores, args.procesos, args.repeticiones).to_string(index=False))
@@ -0,0 +1,63 @@
+# bench_normalizacion.py
+"""
+Compara la normalización numérica de la Tarea 1 antes y después de vectorizarla: tiempo y pico
+de memoria (tracemalloc) sobre Terrazas_202104.csv replicado N veces.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_normalizacion [--factor 100] [--repeticiones 3]
+"""
+import argparse
+import logging
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from tasks.extraction.data_extraction import leer_csv_municipal, RUTA_TERRAZAS
+from tasks.extraction.schemas import columnas_no_normalizables
+from tasks.transformation.data_cleaning import normalize_numeric_columns
+
+def normalizacion_anterior(df, rango_umbral=950, excluir=()):
+    """Implementación anterior: copia del DataFrame y max/min/mean/std por columna."""
+    numeric_cols = [c for c in df.select_dtypes(include=[np.number]).columns if c not in excluir]
+    df_normalized = df.copy()
+    for col in numeric_cols:
+        if df[col].max() - df[col].min() > rango_umbral and df[col].std() != 0:
+            df_normalized[col] = (df[col] - df[col].mean()) / df[col].std()
+    return df_normalized
+
+def medir(funcion, df, repeticiones):
+    tiempos, picos = [], []
+    for _ in range(repeticiones):
+        entrada = df.copy()
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        funcion(entrada)
+        tiempos.append(time.perf_counter() - inicio)
+        picos.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return min(tiempos), max(picos)
+
+def bench_normalizacion(factor=100, repeticiones=3):
+    terrazas = leer_csv_municipal(RUTA_TERRAZAS, 'terrazas')
+    df = pd.concat([terrazas] * factor, ignore_index=True)
+    excluir = columnas_no_normalizables(df, 'terrazas')
+
+    filas = []
+    for nombre, funcion in [
+        ('anterior', lambda d: normalizacion_anterior(d, excluir=excluir)),
+        ('vectorizada', lambda d: normalize_numeric_columns(d, 'Terrazas', excluir=excluir)),
+    ]:
+        tiempo, pico = medir(funcion, df, repeticiones)
+        filas.append({'implementacion': nombre, 'filas': len(df), 'tiempo_s': round(tiempo, 4),
+                      'pico_memoria_mb': round(pico / 1024 ** 2, 1)})
+    return pd.DataFrame(filas)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=100)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(bench_normalizacion(args.factor, args.repeticiones).to_string(index=False))
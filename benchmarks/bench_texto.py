@@ -0,0 +1,60 @@
+# bench_texto.py
+"""
+Compara la limpieza de texto anterior de clean_text_columns (apply + lower + strip + regex,
+fila a fila) con la normalización fusionada sobre valores únicos de text_normalization, en los
+campos descriptivos con relleno de Terrazas_202104.csv (57 columnas) replicado N veces.
+Para cada tipo de salida se mide el tiempo y la memoria de las columnas resultantes.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_texto [--factor 20] [--repeticiones 3]
+"""
+import argparse
+import logging
+import time
+
+import pandas as pd
+
+from tasks.extraction.data_extraction import ENCODING, RUTA_TERRAZAS
+from tasks.extraction.schemas import ESQUEMA_TERRAZAS, bytes_en_memoria
+from tasks.transformation.text_normalization import normalizar_serie, TIPOS_SALIDA
+
+# Campos descriptivos del export que llegan con relleno de espacios
+COLUMNAS_TEXTO = [c for c, spec in ESQUEMA_TERRAZAS.items() if spec['recortar']]
+
+def limpieza_anterior(serie):
+    """Implementación anterior de clean_text_columns (sin la corrección ortográfica)."""
+    serie = serie.fillna('').apply(lambda x: ', '.join(x) if isinstance(x, list) else str(x))
+    return serie.str.lower().str.strip().replace(r'\s+', ' ', regex=True)
+
+def medir(funcion, df, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = pd.DataFrame({col: funcion(df[col]) for col in COLUMNAS_TEXTO})
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+def bench_texto(factor=20, repeticiones=3):
+    base = pd.read_csv(RUTA_TERRAZAS, sep=';', encoding=ENCODING, dtype=str)
+    df = pd.concat([base] * factor, ignore_index=True)[COLUMNAS_TEXTO]
+    filas = []
+    tiempo_anterior, referencia = medir(limpieza_anterior, df, repeticiones)
+    filas.append({'metodo': 'anterior (apply + 3 pasadas)', 'tipo': 'object', 'segundos': round(tiempo_anterior, 3),
+                  'mb_resultado': round(bytes_en_memoria(referencia) / 2 ** 20, 1), 'aceleracion': 1.0, 'iguales': True})
+    for dtype in TIPOS_SALIDA:
+        tiempo, resultado = medir(lambda serie: normalizar_serie(serie, dtype=dtype), df, repeticiones)
+        filas.append({'metodo': 'fusionada sobre únicos', 'tipo': dtype, 'segundos': round(tiempo, 3),
+                      'mb_resultado': round(bytes_en_memoria(resultado) / 2 ** 20, 1),
+                      'aceleracion': round(tiempo_anterior / tiempo, 1),
+                      'iguales': resultado.astype(object).equals(referencia)})
+    logging.info(f"Benchmark de texto: {len(df)} filas, {len(COLUMNAS_TEXTO)} columnas.")
+    return pd.DataFrame(filas)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=20)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(f"Columnas: {', '.join(COLUMNAS_TEXTO)}")
+    print(bench_texto(args.factor, args.repeticiones).to_string(index=False))
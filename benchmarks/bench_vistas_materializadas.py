@@ -0,0 +1,95 @@
+# bench_vistas_materializadas.py
+"""
+Compara la latencia de las consultas de BI sobre las vistas materializadas con la del GROUP BY
+equivalente sobre la tabla cruda licencias_terrazas_integradas (la consulta ad hoc que las vistas
+sustituyen) y con la definición de cada vista sobre las tablas del modelo estrella. Necesita la
+base de datos de config/db_config.py con la tabla integrada cargada y el modelo estrella poblado.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_vistas_materializadas [--repeticiones 20]
+"""
+import argparse
+import logging
+import statistics
+import time
+
+import pandas as pd
+
+from tasks.loading.db_pool import obtener_conexion, cerrar_pool
+from tasks.loading.materialized_views import VISTAS_MATERIALIZADAS
+
+# GROUP BY de cada vista calculado directamente sobre el JOIN de la Tarea 3 cargado en el Data
+# Warehouse: mismas claves (con los mismos valores para los nulos) y mismos agregados
+CONSULTAS_TABLA_INTEGRADA = {
+    'mv_terrazas_distrito_barrio_periodo': """
+        SELECT COALESCE(id_distrito_local_x, -1) AS id_distrito,
+               COALESCE(desc_distrito_local_x, 'SIN DISTRITO') AS desc_distrito,
+               COALESCE(id_barrio_local_x, -1) AS id_barrio,
+               COALESCE(desc_barrio_local_x, 'SIN BARRIO') AS desc_barrio,
+               COALESCE(desc_periodo_terraza, 'SIN PERIODO') AS desc_periodo,
+               COALESCE(desc_situacion_terraza, 'SIN SITUACION') AS desc_situacion,
+               COUNT(*) AS num_hechos,
+               COUNT(DISTINCT id_terraza) AS num_terrazas,
+               COUNT(DISTINCT ref_licencia) AS num_licencias,
+               SUM("Superficie_ES") AS superficie_total,
+               AVG("Superficie_ES") AS superficie_media
+        FROM licencias_terrazas_integradas
+        GROUP BY 1, 2, 3, 4, 5, 6
+    """,
+    'mv_terrazas_distrito_mes': """
+        SELECT COALESCE(id_distrito_local_x, -1) AS id_distrito,
+               COALESCE(desc_distrito_local_x, 'SIN DISTRITO') AS desc_distrito,
+               COALESCE(EXTRACT(YEAR FROM "Fecha_Dec_Lic")::int, -1) AS anio,
+               COALESCE(EXTRACT(MONTH FROM "Fecha_Dec_Lic")::int, -1) AS mes,
+               COUNT(*) AS num_hechos,
+               COUNT(DISTINCT ref_licencia) AS num_licencias,
+               SUM("Superficie_ES") AS superficie_total
+        FROM licencias_terrazas_integradas
+        GROUP BY 1, 2, 3, 4
+    """,
+}
+
+def medir(cursor, consulta, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cursor.execute(consulta)
+        cursor.fetchall()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos), max(tiempos)
+
+def bench_vistas(repeticiones=20):
+    connection = obtener_conexion(autocommit=True)
+    if connection is None:
+        raise SystemExit("No se pudo conectar a la base de datos.")
+    filas = []
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM hechoLugar;")
+            hechos = cursor.fetchone()[0]
+            for vista, spec in VISTAS_MATERIALIZADAS.items():
+                # Consulta típica: un distrito concreto, sobre la tabla cruda, sobre el modelo estrella
+                # y sobre la vista
+                cursor.execute(f"SELECT id_distrito FROM {vista} LIMIT 1;")
+                fila = cursor.fetchone()
+                filtro = f" WHERE id_distrito = {fila[0]}" if fila else ""
+                for origen, consulta in [
+                    ('tabla integrada', f"SELECT * FROM ({CONSULTAS_TABLA_INTEGRADA[vista]}) q"),
+                    ('modelo estrella', f"SELECT * FROM ({spec['definicion']}) q"),
+                    ('vista', f"SELECT * FROM {vista}"),
+                ]:
+                    for tipo, sql in [('completa', consulta), ('un distrito', consulta + filtro)]:
+                        mediana, maximo = medir(cursor, sql, repeticiones)
+                        filas.append({'vista': vista, 'origen': origen, 'consulta': tipo, 'hechos': hechos,
+                                      'mediana_ms': round(mediana * 1000, 2), 'max_ms': round(maximo * 1000, 2)})
+    finally:
+        connection.close()
+        cerrar_pool()
+    return pd.DataFrame(filas)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(bench_vistas(args.repeticiones).to_string(index=False))
@@ -0,0 +1,148 @@
+# datos_sinteticos.py
+"""
+Genera versiones sintéticas de los datasets de entrada (Terrazas, Licencias de dos meses y
+Books) multiplicadas por un factor de escala, con el mismo formato que los exports originales
+(';', Latin-1, coma decimal y JSON extendido de MongoDB).
+
+Cada réplica copia las filas de la plantilla desplazando sus identificadores, de modo que las
+cardinalidades se comportan como en datos reales más grandes: el número de locales ('id_local')
+y terrazas crece con el factor, mientras que los barrios ('id_barrio_local') y distritos siguen
+siendo los 128 y 21 de Madrid. Cada local tiene entre una y dos licencias, como en el export.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.datos_sinteticos --factor 10 --directorio /tmp/etl_x10
+"""
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from tasks.extraction.data_extraction import ENCODING, RUTA_TERRAZAS, RUTA_BOOKS
+
+FRACCION_SEGUNDA_LICENCIA = 0.32  # Locales con dos licencias (≈ 8275 licencias para 6275 locales)
+TIPOS_LICENCIA = {1: 'Declaración Responsable', 2: 'Licencia'}
+PRIMERA_FECHA_LICENCIA, ULTIMA_FECHA_LICENCIA = '2015-01-01', '2020-06-22'
+
+# Columnas del export de licencias: datos del local y de la licencia
+COLUMNAS_LOCAL_LICENCIAS = ['id_local', 'id_distrito_local', 'desc_distrito_local', 'id_barrio_local',
+                            'desc_barrio_local', 'id_ndp_edificio', 'id_clase_ndp_edificio', 'id_vial_edificio',
+                            'clase_vial_edificio', 'desc_vial_edificio', 'nom_edificio',
+                            'num_edificio', 'Cod_Postal', 'coordenada_x_local', 'coordenada_y_local',
+                            'id_tipo_acceso_local', 'desc_tipo_acceso_local', 'id_situacion_local',
+                            'desc_situacion_local', 'secuencial_local_PC', 'rotulo']
+
+def leer_plantilla_csv(ruta):
+    """Lee un export como texto, sin convertir nada, para reescribirlo con el mismo formato."""
+    return pd.read_csv(ruta, sep=';', encoding=ENCODING, dtype=str, keep_default_na=False)
+
+def _renumerar(columna, replica):
+    """
+    Identificadores de una réplica: la réplica 0 conserva los originales y las demás usan valores
+    consecutivos por encima del máximo, para no salir del INT de las tablas del modelo estrella.
+    """
+    if replica == 0:
+        return columna
+    valores = columna.astype(np.int64)
+    codigos, unicos = pd.factorize(valores, sort=True)
+    return pd.Series(valores.max() + 1 + (replica - 1) * len(unicos) + codigos, index=columna.index).astype(str)
+
+def replica_terrazas(plantilla, replica):
+    """Réplica 'replica' de las terrazas: mismas filas con id_local e id_terraza renumerados."""
+    return plantilla.assign(id_terraza=_renumerar(plantilla['id_terraza'], replica),
+                            id_local=_renumerar(plantilla['id_local'], replica))
+
+def replica_licencias(terrazas, replica, semilla=0):
+    """Licencias de los locales de una réplica de terrazas: una por local y, a veces, una segunda."""
+    rng = np.random.default_rng(semilla + replica)
+    locales = terrazas.drop_duplicates('id_local')[COLUMNAS_LOCAL_LICENCIAS]
+    repeticiones = 1 + (rng.random(len(locales)) < FRACCION_SEGUNDA_LICENCIA)
+    licencias = locales.loc[locales.index.repeat(repeticiones)].reset_index(drop=True)
+
+    n = len(licencias)
+    dias = (pd.Timestamp(ULTIMA_FECHA_LICENCIA) - pd.Timestamp(PRIMERA_FECHA_LICENCIA)).days
+    fechas = pd.Timestamp(PRIMERA_FECHA_LICENCIA) + pd.to_timedelta(rng.integers(0, dias + 1, n), unit='D')
+    tipos = rng.choice(list(TIPOS_LICENCIA), n, p=[0.7, 0.3])
+    secuencia = np.arange(n) + replica * 10 ** 7
+    licencias['ref_licencia'] = pd.Series(rng.integers(100, 1000, n)).astype(str) + '/' + \
+        pd.Series(fechas.year).astype(str) + '/' + pd.Series(secuencia).astype(str)
+    licencias['id_tipo_licencia'] = tipos.astype(str)
+    licencias['desc_tipo_licencia'] = pd.Series(tipos).map(TIPOS_LICENCIA).to_numpy()
+    licencias['id_tipo_situacion_licencia'] = '2'
+    licencias['desc_tipo_situacion_licencia'] = 'Concedida'
+    licencias['Fecha_Dec_Lic'] = fechas.strftime('%d/%m/%Y')
+    return licencias
+
+def variacion_mes_siguiente(licencias, replica, semilla=0):
+    """
+    Licencias del mes siguiente: se dan de baja el 5 %, cambia la situación del 2 % y el resto
+    se repite tal cual, como entre dos exports mensuales consecutivos.
+    """
+    rng = np.random.default_rng(semilla + replica + 1)
+    siguiente = licencias[rng.random(len(licencias)) >= 0.05].copy()
+    cambian = rng.random(len(siguiente)) < 0.02
+    siguiente.loc[cambian, 'id_tipo_situacion_licencia'] = '3'
+    siguiente.loc[cambian, 'desc_tipo_situacion_licencia'] = 'Cese'
+    return siguiente
+
+def replica_books(lineas, replica):
+    """Réplica de books.json: los _id de las réplicas son ObjectId distintos para cada una."""
+    if replica == 0:
+        return lineas
+    salida = []
+    for i, linea in enumerate(lineas):
+        registro = json.loads(linea)
+        registro['_id'] = {'$oid': f"{replica:08x}{i:016x}"}
+        salida.append(json.dumps(registro))
+    return salida
+
+def _escribir_csv(df, ruta, primera):
+    df.to_csv(ruta, sep=';', encoding=ENCODING, index=False, header=primera, mode='w' if primera else 'a')
+
+def generar_datasets(factor, directorio, semilla=0, ruta_terrazas=RUTA_TERRAZAS, ruta_books=RUTA_BOOKS):
+    """
+    Escribe en 'directorio'/datasets los cuatro archivos de entrada del pipeline multiplicados
+    por 'factor'. Se genera réplica a réplica, así que la memoria no depende del factor.
+
+    Retorna:
+        dict: filas generadas por archivo.
+    """
+    destino = os.path.join(directorio, 'datasets')
+    os.makedirs(destino, exist_ok=True)
+    rutas = {
+        'terrazas': os.path.join(destino, os.path.basename(ruta_terrazas)),
+        'licencias_202104': os.path.join(destino, 'Licencias_Locales_202104.csv'),
+        'licencias_202105': os.path.join(destino, 'Licencias_Locales_202105.csv'),
+        'books': os.path.join(destino, os.path.basename(ruta_books)),
+    }
+    plantilla = leer_plantilla_csv(ruta_terrazas)
+    with open(ruta_books, 'r', encoding='utf-8') as f:
+        lineas_books = [linea.rstrip('\n') for linea in f if linea.strip()]
+
+    filas = dict.fromkeys(rutas, 0)
+    with open(rutas['books'], 'w', encoding='utf-8') as f_books:
+        for replica in range(factor):
+            terrazas = replica_terrazas(plantilla, replica)
+            licencias = replica_licencias(terrazas, replica, semilla)
+            siguiente = variacion_mes_siguiente(licencias, replica, semilla)
+            _escribir_csv(terrazas, rutas['terrazas'], replica == 0)
+            _escribir_csv(licencias, rutas['licencias_202104'], replica == 0)
+            _escribir_csv(siguiente, rutas['licencias_202105'], replica == 0)
+            books = replica_books(lineas_books, replica)
+            f_books.write('\n'.join(books) + '\n')
+            for clave, n in (('terrazas', len(terrazas)), ('licencias_202104', len(licencias)),
+                             ('licencias_202105', len(siguiente)), ('books', len(books))):
+                filas[clave] += n
+    logging.info(f"Datasets sintéticos x{factor} generados en '{destino}': {filas}.")
+    return filas
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=1)
+    parser.add_argument("--directorio", required=True)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(generar_datasets(args.factor, args.directorio, args.semilla))
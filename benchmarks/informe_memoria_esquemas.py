@@ -0,0 +1,35 @@
+# informe_memoria_esquemas.py
+"""
+Informe de memoria por dataset antes y después de aplicar el registro de esquemas.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.informe_memoria_esquemas
+"""
+import logging
+import os
+
+import pandas as pd
+
+from tasks.extraction.data_extraction import ENCODING, RUTA_LICENCIAS_202104, RUTA_TERRAZAS, RUTA_BOOKS, leer_csv_municipal
+from tasks.extraction.schemas import aplicar_esquema, registrar_informe_memoria
+
+def informe_memoria_esquemas():
+    informes = []
+    for nombre, ruta, esquema in [('Terrazas', RUTA_TERRAZAS, 'terrazas'),
+                                  ('Licencias 202104', RUTA_LICENCIAS_202104, 'licencias')]:
+        if not os.path.exists(ruta):
+            logging.warning(f"Archivo '{ruta}' no encontrado. Se omite del informe.")
+            continue
+        df_sin_tipar = pd.read_csv(ruta, sep=';', encoding=ENCODING)
+        df_tipado = leer_csv_municipal(ruta, esquema)
+        informes.append(registrar_informe_memoria(nombre, df_sin_tipar, df_tipado))
+
+    if os.path.exists(RUTA_BOOKS):
+        df_sin_tipar = pd.read_json(RUTA_BOOKS, lines=True)
+        df_tipado = aplicar_esquema(df_sin_tipar.copy(), 'books')
+        informes.append(registrar_informe_memoria('Books', df_sin_tipar, df_tipado))
+    return pd.DataFrame(informes)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    print(informe_memoria_esquemas().to_string(index=False))
@@ -1,14 +1,25 @@
 # main_etl.py
+import argparse
 import logging
 import os
-from tasks.extraction.data_extraction import extraer_datos
-from tasks.transformation.data_cleaning import task1_process
-from tasks.transformation.data_transformation import task2_process
-from tasks.transformation.data_integration import task3_process
-from tasks.concatenation.data_concatenation import task4_process
-from tasks.loading.dimensional_modeling import create_dimensional_tables
-from tasks.loading.inmon_modeling import create_inmon_tables
+from tasks.extraction.data_extraction import (extraer_datos, extraer_datos_por_bloques, calcular_tamano_bloque,
+                                              cargar_manifiesto, FuenteBloques, MANIFIESTO_FUENTES, RUTA_LICENCIAS_202104)
+from tasks.pipeline.instrumentation import configurar_instrumentacion, medir, escribir_prometheus, PERFILADORES
+from tasks.pipeline.scheduler import Etapa, ErrorEtapa, ejecutar_grafo
+from tasks.pipeline.stage_cache import CacheEtapas
+from tasks.storage.intermediate_store import (configurar_almacen, iniciar_bloques_intermedios, guardar_bloque_intermedio,
+                                              leer_bloques_intermedios, leer_intermedio, FORMATOS)
+from tasks.transformation.data_cleaning import task1_process, task1_process_por_bloques, ruta_estadisticas
+from tasks.transformation.data_transformation import task2_process, task2_process_por_bloques
+from tasks.transformation.near_duplicates import task2_casi_duplicados, POLITICAS
+from tasks.transformation.data_integration import (task3_join, task3_superficies, task3_licencias_distrito,
+                                                  task3_terrazas_grandes, task3_rejilla, task3_process_por_bloques,
+                                                  FILAS_JOIN_PARTICIONADO)
+from tasks.concatenation.data_concatenation import task4_process, task4_process_por_bloques, meses_adicionales
+from tasks.loading.dimensional_modeling import create_dimensional_tables, populate_dimensional_tables
+from tasks.loading.inmon_modeling import create_inmon_tables, populate_inmon_tables
 from tasks.loading.data_loading import load_to_data_warehouse
+from tasks.loading.db_pool import registrar_metricas_pool, cerrar_pool
 
 # Configuración del log
 log_dir = "logs"
@@ -21,83 +32,271 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-def main_etl():
+RUTA_LINEA_TEMPORAL = os.path.join(log_dir, "etl_timeline.json")
+RUTA_METRICAS = os.path.join(log_dir, "etl_metrics.jsonl")
+DIRECTORIO_DATASETS = os.path.dirname(RUTA_LICENCIAS_202104)
+
+def validar_extraccion(resultado):
+    df_licencias_202104, df_licencias_202105, df_terrazas, df_books = resultado
+    if any(df is None or df.empty for df in [df_licencias_202104, df_terrazas, df_books]):
+        logging.error("Error: uno o más DataFrames esenciales no se extrajeron correctamente.")
+        raise ErrorEtapa("Error durante la extracción de datos. Verifica los registros de extracción.")
+    logging.info(f"Extracción completada: Licencias 202104 - {len(df_licencias_202104)} registros")
+    logging.info(f"Extracción completada: Licencias 202105 - {len(df_licencias_202105) if df_licencias_202105 is not None else 'Archivo no generado'}")
+    logging.info(f"Extracción completada: Terrazas - {len(df_terrazas)} registros")
+    logging.info(f"Extracción completada: Libros - {len(df_books)} registros")
+    logging.info("Extracción de datos completada.")
+    return resultado
+
+def validar_tarea1(resultado):
+    df_terrazas_normalizadas, df_licencias_normalizadas, _, df_books_normalizadas = resultado
+    if any(df is None or df.empty for df in [df_terrazas_normalizadas, df_licencias_normalizadas, df_books_normalizadas]):
+        raise ErrorEtapa("Error durante la transformación de datos - Tarea 1. Verifica los registros.")
+    logging.info("Transformación de datos - Tarea 1 completada.")
+    return resultado
+
+ETAPAS_CARGA = ['carga_integradas', 'carga_concatenadas', 'carga_superficies']
+
+def cargar_tabla(df, table_name, if_exists='replace'):
+    """
+    Carga un resultado (DataFrame o fuente por bloques) en el Data Warehouse. Lanza ErrorEtapa si
+    la carga falla, de modo que el grafo no ejecuta las etapas que dependen de ella.
+    """
+    if isinstance(df, FuenteBloques):
+        return cargar_tabla_por_bloques(df, table_name, if_exists=if_exists)
+    if df.empty:
+        return True
+    if not load_to_data_warehouse(df, table_name, if_exists=if_exists):
+        raise ErrorEtapa(f"Error durante la carga de la tabla '{table_name}' al Data Warehouse. Verifica los registros.")
+    return True
+
+def cargar_tabla_por_bloques(fuente, table_name, if_exists='replace'):
+    """
+    Carga una fuente por bloques en el Data Warehouse: el primer bloque con 'if_exists' y los
+    siguientes se añaden ('append') o, en modo 'merge', se fusionan. Lanza ErrorEtapa si falla algún bloque.
+    """
+    for indice, bloque in enumerate(fuente):
+        modo = if_exists if indice == 0 or if_exists == 'merge' else 'append'
+        if not load_to_data_warehouse(bloque, table_name, if_exists=modo):
+            raise ErrorEtapa(f"Error durante la carga del bloque {indice} de la tabla '{table_name}' al Data Warehouse. "
+                             f"Verifica los registros.")
+    return True
+
+def construir_grafo(cache, modo_carga='replace', manifiesto=None, politica_duplicados='marcar',
+                    directorio_estadisticas=None, actualizar_estadisticas=False):
+    """
+    Grafo de etapas del pipeline. Cada etapa recibe los resultados de sus dependencias; las que
+    no dependen entre sí se ejecutan en paralelo. Las etapas que calculan datasets pasan por la
+    caché; las que escriben en el Data Warehouse se ejecutan siempre, porque su efecto depende del
+    estado de la base de datos y no solo de sus entradas.
+    """
+    def extraccion():
+        fuentes = manifiesto or MANIFIESTO_FUENTES
+        return validar_extraccion(cache.ejecutar(
+            'extraccion', extraer_datos,
+            archivos=[spec['ruta'] for spec in fuentes],
+            parametros={'manifiesto': manifiesto}
+        ))
+
+    def tarea1(extraido):
+        df_licencias_202104, _, df_terrazas, df_books = extraido
+        # Las estadísticas de normalización guardadas son una entrada más de la etapa
+        estadisticas = [ruta_estadisticas(directorio_estadisticas, esquema) for esquema in ('terrazas', 'licencias', 'books')]
+        return validar_tarea1(cache.ejecutar(
+            'tarea1', task1_process, df_terrazas, df_licencias_202104, None, df_books,
+            archivos=[ruta for ruta in estadisticas if ruta and os.path.exists(ruta)],
+            parametros={'directorio_estadisticas': directorio_estadisticas,
+                        'actualizar_estadisticas': actualizar_estadisticas}
+        ))
+
+    def tarea2(normalizado):
+        df_terrazas_normalizadas, df_licencias_normalizadas, df_locales_normalizadas, df_books_normalizadas = normalizado
+        resultado = cache.ejecutar('tarea2', task2_process, df_licencias_normalizadas, df_locales_normalizadas,
+                                   df_terrazas_normalizadas, df_books_normalizadas)
+        logging.info("Transformación de datos - Tarea 2 completada.")
+        return resultado
+
+    # Tarea 2 retorna (licencias, locales, terrazas, books); la detección de casi duplicados mantiene esa forma
+    def casi_duplicados(limpio):
+        df_licencias, df_locales, df_terrazas, df_books = limpio
+        df_licencias, df_terrazas = cache.ejecutar('casi_duplicados', task2_casi_duplicados, df_licencias, df_terrazas,
+                                                   parametros={'politica': politica_duplicados})
+        return df_licencias, df_locales, df_terrazas, df_books
+
+    def tarea3_join(limpio):
+        df_licencias, _, df_terrazas, _ = limpio
+        # El JOIN particionado retorna las partes que escribe en el almacén intermedio, así que,
+        # como la Tarea 4, no pasa por la caché
+        if len(df_terrazas) + len(df_licencias) >= FILAS_JOIN_PARTICIONADO:
+            return task3_join(df_terrazas, df_licencias)
+        return cache.ejecutar('tarea3_join', task3_join, df_terrazas, df_licencias)
+
+    def tarea3_superficies(limpio):
+        return cache.ejecutar('tarea3_superficies', task3_superficies, limpio[2])
+
+    def tarea3_distritos(limpio):
+        return cache.ejecutar('tarea3_distritos', task3_licencias_distrito, limpio[0])
+
+    def tarea3_grandes(limpio):
+        return cache.ejecutar('tarea3_grandes', task3_terrazas_grandes, limpio[2])
+
+    def tarea3_rejilla(limpio):
+        return cache.ejecutar('tarea3_rejilla', task3_rejilla, limpio[2])
+
+    def tarea4(extraido):
+        df_licencias_202104, df_licencias_202105, _, _ = extraido
+        # Además de 202104 y 202105, la Tarea 4 incluye los demás exports mensuales de 'datasets/'.
+        # No pasa por la caché: su resultado son las partes mensuales que escribe en el almacén intermedio
+        resultado = task4_process(df_licencias_202104, df_licencias_202105, directorio=DIRECTORIO_DATASETS)
+        logging.info("Concatenación de datos - Tarea 4 completada.")
+        return resultado
+
+    def carga(table_name):
+        return lambda df: cargar_tabla(df, table_name, if_exists=modo_carga)
+
+    def carga_por_bloques(table_name):
+        return lambda fuente: cargar_tabla_por_bloques(fuente, table_name, if_exists=modo_carga)
+
+    # El DDL de los modelos va después de las cargas, como en el pipeline secuencial
+    def modelado_kimball(*_):
+        create_dimensional_tables()
+        logging.info("Modelado completado: tablas Kimball creadas.")
+
+    def poblar_kimball(df_joined, _):
+        # Las claves sustitutas del modelo estrella se asignan sobre el JOIN completo
+        if isinstance(df_joined, FuenteBloques):
+            df_joined = leer_intermedio(df_joined.nombre)
+        return populate_dimensional_tables(df_joined)
+
+    def modelado_inmon(*_):
+        create_inmon_tables()
+        logging.info("Modelado completado: tablas Inmon creadas.")
+
+    def poblar_inmon(limpio, _):
+        return populate_inmon_tables(limpio[2], limpio[0])
+
+    return [
+        Etapa('extraccion', extraccion, [], 'la extracción de datos'),
+        Etapa('tarea1', tarea1, ['extraccion'], 'la transformación de datos - Tarea 1'),
+        Etapa('tarea2', tarea2, ['tarea1'], 'la transformación de datos - Tarea 2'),
+        Etapa('casi_duplicados', casi_duplicados, ['tarea2'], 'la detección de casi duplicados'),
+        Etapa('tarea3_join', tarea3_join, ['casi_duplicados'], 'la integración de datos - Tarea 3 (JOIN)'),
+        Etapa('tarea3_superficies', tarea3_superficies, ['casi_duplicados'], 'la integración de datos - Tarea 3 (superficies)'),
+        Etapa('tarea3_distritos', tarea3_distritos, ['casi_duplicados'], 'la integración de datos - Tarea 3 (distritos)'),
+        Etapa('tarea3_grandes', tarea3_grandes, ['casi_duplicados'], 'la integración de datos - Tarea 3 (terrazas grandes)'),
+        Etapa('tarea3_rejilla', tarea3_rejilla, ['casi_duplicados'], 'la integración de datos - Tarea 3 (rejilla espacial)'),
+        Etapa('tarea4', tarea4, ['extraccion'], 'la concatenación de datos - Tarea 4'),
+        Etapa('carga_integradas', carga('licencias_terrazas_integradas'), ['tarea3_join'],
+              'la carga de datos al Data Warehouse'),
+        Etapa('carga_concatenadas', carga_por_bloques('licencias_concatenadas'), ['tarea4'],
+              'la carga de datos al Data Warehouse'),
+        Etapa('carga_superficies', carga('superficies_agregadas'), ['tarea3_superficies'],
+              'la carga de datos al Data Warehouse'),
+        Etapa('modelado_kimball', modelado_kimball, ETAPAS_CARGA, 'la creación de tablas de modelado'),
+        Etapa('poblar_kimball', poblar_kimball, ['tarea3_join', 'modelado_kimball'], 'la carga del modelo estrella'),
+        Etapa('modelado_inmon', modelado_inmon, ETAPAS_CARGA, 'la creación de tablas de modelado'),
+        Etapa('poblar_inmon', poblar_inmon, ['casi_duplicados', 'modelado_inmon'], 'la carga del modelo Inmon'),
+    ]
+
+ETAPAS = ('extraccion', 'tarea1', 'tarea2', 'casi_duplicados', 'tarea3_join', 'tarea3_superficies', 'tarea3_distritos',
+          'tarea3_grandes', 'tarea3_rejilla')
+
+def main_etl(cache=None, max_workers=4, modo_carga='replace', manifiesto=None, politica_duplicados='marcar',
+             directorio_estadisticas=None, actualizar_estadisticas=False):
     print("Iniciando el pipeline ETL...")
     logging.info("Iniciando el pipeline ETL...")
+    cache = cache or CacheEtapas()
+
+    grafo = construir_grafo(cache, modo_carga, manifiesto, politica_duplicados, directorio_estadisticas,
+                            actualizar_estadisticas)
+    _, completado = ejecutar_grafo(grafo, max_workers=max_workers, ruta_linea_temporal=RUTA_LINEA_TEMPORAL)
+    if not completado:
+        return
+
+    logging.info("Pipeline ETL completado con éxito.")
+    print("Pipeline ETL completado.")
+
+def guardar_y_cargar_bloques(fuente, nombre, table_name=None, exportacion='csv'):
+    """
+    Recorre una fuente por bloques una sola vez: guarda cada bloque como una parte del
+    resultado 'nombre' en el almacén intermedio y, si se indica tabla, lo carga en el Data Warehouse.
+    """
+    filas = 0
+    with medir(f"bloques_{nombre}") as medicion:
+        iniciar_bloques_intermedios(nombre)
+        for indice, bloque in enumerate(fuente):
+            guardar_bloque_intermedio(bloque, nombre, indice, exportacion)
+            if table_name:
+                load_to_data_warehouse(bloque, table_name, if_exists='replace' if indice == 0 else 'append')
+            filas += len(bloque)
+        medicion.filas_salida = filas
+    logging.info(f"Dataset {nombre} guardado por bloques: {filas} registros.")
+    return filas
+
+def main_etl_por_bloques(chunksize):
+    """Pipeline ETL en modo streaming: ninguna etapa mantiene un dataset de origen completo en memoria."""
+    print(f"Iniciando el pipeline ETL por bloques de {chunksize} filas...")
+    logging.info(f"Iniciando el pipeline ETL por bloques de {chunksize} filas...")
 
     # Extracción de datos
     try:
-        df_licencias_202104, df_licencias_202105, df_terrazas, df_books = extraer_datos()
-        logging.info(f"Extracción completada: Licencias 202104 - {len(df_licencias_202104)} registros")
-        logging.info(f"Extracción completada: Licencias 202105 - {len(df_licencias_202105) if df_licencias_202105 is not None else 'Archivo no generado'}")
-        logging.info(f"Extracción completada: Terrazas - {len(df_terrazas)} registros")
-        logging.info(f"Extracción completada: Libros - {len(df_books)} registros")
-        
-        if any(df is None or df.empty for df in [df_licencias_202104, df_terrazas, df_books]):
-            logging.error("Error: uno o más DataFrames esenciales no se extrajeron correctamente.")
+        fuente_licencias_202104, fuente_licencias_202105, fuente_terrazas, fuente_books = extraer_datos_por_bloques(chunksize)
+        if any(fuente is None for fuente in [fuente_licencias_202104, fuente_terrazas, fuente_books]):
+            logging.error("Error: una o más fuentes esenciales no se extrajeron correctamente.")
             print("Error durante la extracción de datos. Verifica los registros de extracción.")
             return
-        logging.info("Extracción de datos completada.")
+        logging.info("Extracción de datos por bloques completada.")
     except Exception as e:
         logging.error(f"Error inesperado durante la extracción de datos: {e}")
         print(f"Error inesperado durante la extracción de datos: {e}")
         return
 
-    # Transformación - Tarea 1
+    # Transformación - Tareas 1 y 2
     try:
-        df_terrazas_normalizadas, df_licencias_normalizadas, df_locales_normalizadas, df_books_normalizadas = task1_process(
-            df_terrazas, df_licencias_202104, None, df_books
+        fuente_terrazas_norm, fuente_licencias_norm, fuente_books_norm = task1_process_por_bloques(
+            fuente_terrazas, fuente_licencias_202104, fuente_books
         )
-        if any(df is None or df.empty for df in [df_terrazas_normalizadas, df_licencias_normalizadas, df_books_normalizadas]):
+        if any(fuente is None for fuente in [fuente_terrazas_norm, fuente_licencias_norm, fuente_books_norm]):
             logging.error("Error durante la transformación de datos - Tarea 1. Verifica los registros.")
             print("Error durante la transformación de datos - Tarea 1. Verifica los registros.")
             return
-        logging.info("Transformación de datos - Tarea 1 completada.")
-    except Exception as e:
-        logging.error(f"Error durante la transformación de datos - Tarea 1: {e}")
-        print(f"Error durante la transformación de datos - Tarea 1: {e}")
-        return
-
-    # Transformación - Tarea 2
-    try:
-        df_licencias_limpio, df_locales_limpio, df_terrazas_limpio, df_books_limpio = task2_process(
-            df_licencias_normalizadas, df_locales_normalizadas, df_terrazas_normalizadas, df_books_normalizadas
+        fuente_licencias_limpio, fuente_terrazas_limpio, fuente_books_limpio = task2_process_por_bloques(
+            fuente_licencias_norm, fuente_terrazas_norm, fuente_books_norm
         )
-        logging.info("Transformación de datos - Tarea 2 completada.")
+        guardar_y_cargar_bloques(fuente_licencias_limpio, 'Licencias_SinDuplicados')
+        guardar_y_cargar_bloques(fuente_terrazas_limpio, 'Terrazas_SinDuplicados')
+        guardar_y_cargar_bloques(fuente_books_limpio, 'Books_Limpio', exportacion='json')
+        logging.info("Transformación de datos por bloques - Tareas 1 y 2 completadas.")
     except Exception as e:
-        logging.error(f"Error durante la transformación de datos - Tarea 2: {e}")
-        print(f"Error durante la transformación de datos - Tarea 2: {e}")
+        logging.error(f"Error durante la transformación de datos por bloques - Tareas 1 y 2: {e}")
+        print(f"Error durante la transformación de datos por bloques - Tareas 1 y 2: {e}")
         return
 
-    # Integración - Tarea 3
+    # Integración - Tarea 3 (lee los resultados de la Tarea 2 para no recalcularlos en cada pasada)
     try:
-        df_joined, df_surface_barrio, df_licencias_distrito, df_large_terrazas = task3_process(df_terrazas_limpio, df_licencias_limpio)
-        logging.info("Integración de datos - Tarea 3 completada.")
+        fuente_terrazas_limpio = leer_bloques_intermedios('Terrazas_SinDuplicados')
+        fuente_licencias_limpio = leer_bloques_intermedios('Licencias_SinDuplicados')
+        fuente_joined, df_surface_barrio, df_licencias_distrito, fuente_large_terrazas = task3_process_por_bloques(
+            fuente_terrazas_limpio, fuente_licencias_limpio
+        )
+        guardar_y_cargar_bloques(fuente_joined, 'Licencias_Terrazas_Integradas', 'licencias_terrazas_integradas')
+        guardar_y_cargar_bloques(fuente_large_terrazas, 'Terrazas_Grandes')
+        if not df_surface_barrio.empty:
+            load_to_data_warehouse(df_surface_barrio, 'superficies_agregadas')
+        logging.info("Integración de datos por bloques - Tarea 3 completada.")
     except Exception as e:
-        logging.error(f"Error durante la integración de datos - Tarea 3: {e}")
-        print(f"Error durante la integración de datos - Tarea 3: {e}")
+        logging.error(f"Error durante la integración de datos por bloques - Tarea 3: {e}")
+        print(f"Error durante la integración de datos por bloques - Tarea 3: {e}")
         return
 
     # Concatenación - Tarea 4
     try:
-        df_concatenated = task4_process(df_licencias_202104, df_licencias_202105)
-        logging.info("Concatenación de datos - Tarea 4 completada.")
+        fuente_concatenada = task4_process_por_bloques(fuente_licencias_202104, fuente_licencias_202105)
+        guardar_y_cargar_bloques(fuente_concatenada, 'Licencias_Concatenadas', 'licencias_concatenadas')
+        logging.info("Concatenación de datos por bloques - Tarea 4 completada.")
     except Exception as e:
-        logging.error(f"Error durante la concatenación de datos - Tarea 4: {e}")
-        print(f"Error durante la concatenación de datos - Tarea 4: {e}")
-        return
-
-    # Carga de datos al Data Warehouse
-    try:
-        if not df_joined.empty:
-            load_to_data_warehouse(df_joined, 'licencias_terrazas_integradas')
-        if not df_concatenated.empty:
-            load_to_data_warehouse(df_concatenated, 'licencias_concatenadas')
-        if not df_surface_barrio.empty:
-            load_to_data_warehouse(df_surface_barrio, 'superficies_agregadas')
-    except Exception as e:
-        logging.error(f"Error durante la carga de datos al Data Warehouse: {e}")
-        print(f"Error durante la carga de datos al Data Warehouse: {e}")
+        logging.error(f"Error durante la concatenación de datos por bloques - Tarea 4: {e}")
+        print(f"Error durante la concatenación de datos por bloques - Tarea 4: {e}")
         return
 
     # Modelado - Creación de Tablas Dimensionales y Modelo Inmon
@@ -110,8 +309,66 @@ def main_etl():
         print(f"Error durante la creación de tablas de modelado: {e}")
         return
 
-    logging.info("Pipeline ETL completado con éxito.")
+    logging.info("Pipeline ETL por bloques completado con éxito.")
     print("Pipeline ETL completado.")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pipeline ETL de licencias, terrazas y libros.")
+    parser.add_argument("--max-memory", type=int, metavar="MB",
+                        help="Activa el modo streaming y elige el tamaño de bloque para no superar este límite de memoria.")
+    parser.add_argument("--chunksize", type=int, metavar="FILAS",
+                        help="Activa el modo streaming con un tamaño de bloque fijo (tiene prioridad sobre --max-memory).")
+    parser.add_argument("--formato-intermedio", choices=FORMATOS, default=None,
+                        help="Formato de los resultados intermedios en 'datasets/' (por defecto, parquet).")
+    parser.add_argument("--exportar-csv", action="store_true",
+                        help="Exportar además los resultados intermedios en CSV/JSON.")
+    parser.add_argument("--forzar", action="append", choices=ETAPAS, default=[], metavar="ETAPA",
+                        help=f"Recalcular una etapa aunque sus entradas no hayan cambiado (repetible): {', '.join(ETAPAS)}.")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="Desactivar la caché de etapas y recalcular todo.")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Número máximo de etapas independientes que se ejecutan a la vez.")
+    parser.add_argument("--perfilar", action="append", default=[], metavar="ETAPA",
+                        help="Perfilar una etapa instrumentada (repetible), p. ej. tarea2 o carga_licencias_concatenadas. "
+                             "El perfil se guarda en logs/perfil_<ETAPA>.")
+    parser.add_argument("--perfilador", choices=PERFILADORES, default='cprofile',
+                        help="Perfilador de --perfilar (pyinstrument es opcional).")
+    parser.add_argument("--metricas-prometheus", metavar="RUTA",
+                        help="Escribir las métricas de las etapas en un textfile de Prometheus (node_exporter).")
+    parser.add_argument("--manifiesto", metavar="RUTA",
+                        help="Manifiesto JSON de las fuentes a extraer (por defecto, los cuatro datasets de 'datasets/').")
+    parser.add_argument("--casi-duplicados", choices=POLITICAS, default='marcar',
+                        help="Política para los locales casi duplicados: 'marcar' (por defecto) solo guarda los clusters, "
+                             "'canonico' asigna a cada local el id_local canónico de su cluster y 'eliminar' además quita las licencias y terrazas repetidas tras la fusión.")
+    parser.add_argument("--modo-carga", choices=['replace', 'merge'], default='replace',
+                        help="'replace' (por defecto) reescribe las tablas; 'merge' inserta y actualiza solo las filas "
+                             "que cambiaron, pero no borra las claves que ya no están en el origen.")
+    parser.add_argument("--estadisticas-normalizacion", metavar="DIRECTORIO",
+                        help="Reutilizar las estadísticas de normalización de la Tarea 1 guardadas en este directorio "
+                             "(se ajustan y guardan en la primera ejecución).")
+    parser.add_argument("--actualizar-estadisticas", action="store_true",
+                        help="Combinar las estadísticas guardadas con las de los datos actuales (requiere --estadisticas-normalizacion).")
+    args = parser.parse_args()
+    if args.actualizar_estadisticas and not args.estadisticas_normalizacion:
+        parser.error("--actualizar-estadisticas requiere --estadisticas-normalizacion.")
+    return args
+
 if __name__ == "__main__":
-    main_etl()
\ No newline at end of file
+    args = parse_args()
+    configurar_almacen(formato=args.formato_intermedio, exportar_csv=args.exportar_csv or None)
+    configurar_instrumentacion(ruta_eventos=RUTA_METRICAS, ruta_prometheus=args.metricas_prometheus,
+                               perfilar=args.perfilar, perfilador=args.perfilador, directorio_perfiles=log_dir)
+    try:
+        if args.chunksize:
+            main_etl_por_bloques(args.chunksize)
+        elif args.max_memory:
+            main_etl_por_bloques(calcular_tamano_bloque(args.max_memory))
+        else:
+            main_etl(CacheEtapas(forzar=args.forzar, desactivada=args.sin_cache), max_workers=args.workers,
+                     modo_carga=args.modo_carga, manifiesto=cargar_manifiesto(args.manifiesto) if args.manifiesto else None,
+                     politica_duplicados=args.casi_duplicados, directorio_estadisticas=args.estadisticas_normalizacion,
+                     actualizar_estadisticas=args.actualizar_estadisticas)
+    finally:
+        registrar_metricas_pool()
+        escribir_prometheus()
+        cerrar_pool()
\ No newline at end of file
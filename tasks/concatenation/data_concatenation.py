@@ -1,25 +1,40 @@
 # data_concatenation.py
 import pandas as pd
+import numpy as np
 import logging
-import os
+from tasks.concatenation.monthly_ingestion import concatenar_meses, descubrir_meses, hash_filas, CLAVE_LICENCIA
+from tasks.extraction.data_extraction import FuenteBloques
+from tasks.pipeline.instrumentation import instrumentar
+from tasks.storage.intermediate_store import (guardar_intermedio, guardar_bloque_intermedio, iniciar_bloques_intermedios,
+                                              leer_bloques_intermedios)
 
-def concatenate_datasets(df1, df2=None):
+PERIODO_202104, PERIODO_202105 = '202104', '202105'
+
+def concatenate_datasets(df1, df2=None, otros_meses=None):
     """
-    Concatenar dos datasets de licencias, eliminando duplicados y verificando columnas clave.
+    Concatenar datasets mensuales de licencias, conservando la versión más reciente de cada
+    licencia (clave 'id_local' + 'ref_licencia') y verificando columnas clave.
+
+    Los meses se deduplican del más reciente al más antiguo (ver deduplicar_meses) y cada uno se
+    guarda en cuanto se procesa como una parte de 'Licencias_Concatenadas', sin concatenarlos en
+    memoria. Las partes se numeran del mes más antiguo al más reciente, de modo que el resultado
+    se lee en orden cronológico.
     
     Parámetros:
         df1 (DataFrame): Primer dataset de licencias (obligatorio).
-        df2 (DataFrame): Segundo dataset de licencias (opcional).
+        df2 (DataFrame): Segundo dataset de licencias, posterior al primero (opcional).
+        otros_meses (list): pares (periodo 'YYYYMM', ruta o DataFrame) de más meses (opcional).
     
     Retorna:
-        DataFrame: DataFrame concatenado sin duplicados.
+        FuenteBloques: fuente con un bloque por mes, sin duplicados.
     """
     logging.info("Iniciando la concatenación de datasets.")
+    iniciar_bloques_intermedios('Licencias_Concatenadas')
     
     # Verificar que los DataFrames no estén vacíos y contengan columnas clave
     if df1.empty:
         logging.warning("El primer dataset está vacío. La concatenación no se completará.")
-        return pd.DataFrame()  # Retornar un DataFrame vacío si el primer dataset está vacío
+        return leer_bloques_intermedios('Licencias_Concatenadas')  # Fuente vacía si el primer dataset está vacío
 
     if df2 is not None and df2.empty:
         logging.warning("El segundo dataset está vacío. Procediendo solo con el primer dataset.")
@@ -30,43 +45,76 @@ def concatenate_datasets(df1, df2=None):
     if df2 is not None:
         logging.info(f"Registros iniciales - Dataset 2: {len(df2)}")
 
-    # Realizar la concatenación si ambos DataFrames están disponibles
-    if df2 is not None:
-        if set(df1.columns) != set(df2.columns):
+    meses = [(PERIODO_202104, df1)] + ([(PERIODO_202105, df2)] if df2 is not None else []) + list(otros_meses or [])
+
+    # Realizar la concatenación si hay más de un mes disponible
+    if len(meses) > 1:
+        if df2 is not None and set(df1.columns) != set(df2.columns):
             logging.warning("Los datasets no tienen las mismas columnas. La concatenación podría resultar en un DataFrame con NaNs.")
         
-        # Concatenar y eliminar duplicados
-        df_concatenated = pd.concat([df1, df2], ignore_index=True).drop_duplicates().reset_index(drop=True)
-        logging.info(f"Concatenación completada. Número de registros resultantes: {len(df_concatenated)}.")
+        # Deduplicar mes a mes por clave y hash de contenido; concatenar_meses entrega primero el
+        # mes más reciente, que se guarda como la última parte
+        filas, estadisticas = 0, []
+        for indice, (_, df_mes, estadisticas_mes) in enumerate(concatenar_meses(meses)):
+            guardar_bloque_intermedio(df_mes, 'Licencias_Concatenadas', len(meses) - 1 - indice)
+            filas += len(df_mes)
+            estadisticas.append(estadisticas_mes)
+        guardar_intermedio(pd.DataFrame(estadisticas), 'Duplicados_Licencias_Por_Mes')
+        logging.info(f"Concatenación completada. Número de registros resultantes: {filas}.")
     else:
-        df_concatenated = df1  # Si solo hay un dataset, continuar con él
+        guardar_bloque_intermedio(df1, 'Licencias_Concatenadas', 0)  # Si solo hay un dataset, continuar con él
         logging.warning("Solo un archivo disponible. Concatenación omitida, se usará el dataset original.")
 
-    # Asegurar existencia del directorio 'datasets'
-    output_dir = 'datasets'
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        logging.info(f"Directorio '{output_dir}' creado.")
-
-    # Guardar el dataset concatenado
-    output_file = os.path.join(output_dir, 'Licencias_Concatenadas.csv')
-    df_concatenated.to_csv(output_file, index=False)
-    logging.info(f"Dataset Licencias_Concatenadas guardado en '{output_file}'.")
+    return leer_bloques_intermedios('Licencias_Concatenadas')
 
-    return df_concatenated
+def meses_adicionales(directorio):
+    """Exports mensuales de licencias de 'directorio' distintos de 202104 y 202105."""
+    return [(periodo, ruta) for periodo, ruta in descubrir_meses(directorio)
+            if periodo not in (PERIODO_202104, PERIODO_202105)]
 
-def task4_process(df_licencias_202104, df_licencias_202105=None):
+@instrumentar('tarea4')
+def task4_process(df_licencias_202104, df_licencias_202105=None, directorio=None):
     """
     Ejecuta el proceso de concatenación para los datasets de licencias.
     
     Parámetros:
         df_licencias_202104 (DataFrame): Dataset de licencias de abril 2021.
         df_licencias_202105 (DataFrame): Dataset de licencias de mayo 2021 (opcional).
+        directorio (str): si se indica, se incluyen también los demás exports
+            'Licencias_Locales_YYYYMM.csv' de ese directorio.
     
     Retorna:
-        DataFrame: DataFrame concatenado.
+        FuenteBloques: fuente por bloques (uno por mes) del dataset concatenado.
     """
     logging.info("Iniciando proceso de concatenación de licencias - Tarea 4.")
-    df_concatenated = concatenate_datasets(df_licencias_202104, df_licencias_202105)
-    logging.info("Tarea 4 completada: Dataset 'Licencias_Concatenadas' guardado en 'datasets/Licencias_Concatenadas.csv'")
-    return df_concatenated
+    otros_meses = meses_adicionales(directorio) if directorio else None
+    fuente_concatenada = concatenate_datasets(df_licencias_202104, df_licencias_202105, otros_meses)
+    logging.info("Tarea 4 completada: Dataset 'Licencias_Concatenadas' guardado en el almacén intermedio.")
+    return fuente_concatenada
+
+def task4_process_por_bloques(fuente_licencias_202104, fuente_licencias_202105=None, clave=CLAVE_LICENCIA):
+    """
+    Variante de la Tarea 4 para el modo streaming, con el mismo criterio que concatenate_datasets:
+    de cada licencia (por el hash de su clave) se conserva la versión del mes más reciente y,
+    dentro de un mes, la última fila.
+
+    Una primera pasada guarda solo el hash de 64 bits de la clave de cada fila, en orden
+    cronológico; la última aparición de cada hash es la fila que se conserva. La segunda pasada
+    recorre de nuevo los bloques y entrega las filas conservadas, del mes más antiguo al más reciente.
+    """
+    logging.info("Iniciando proceso de concatenación de licencias por bloques - Tarea 4.")
+    fuentes = [f for f in (fuente_licencias_202104, fuente_licencias_202105) if f is not None]
+
+    def generar():
+        claves = [hash_filas(bloque, clave) for fuente in fuentes for bloque in fuente]
+        conservar = ~pd.Series(np.concatenate(claves) if claves else np.empty(0, dtype=np.uint64)).duplicated(keep='last').to_numpy()
+        inicio, filas = 0, 0
+        for fuente in fuentes:
+            for bloque in fuente:
+                mascara = conservar[inicio:inicio + len(bloque)]
+                inicio += len(bloque)
+                filas += int(mascara.sum())
+                yield bloque[mascara]
+        logging.info(f"Concatenación por bloques completada. Número de registros resultantes: {filas}.")
+
+    return FuenteBloques('Licencias_Concatenadas', generar)
@@ -0,0 +1,134 @@
+# monthly_ingestion.py
+import logging
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from tasks.extraction.data_extraction import leer_csv_municipal
+
+PATRON_LICENCIAS = re.compile(r'^Licencias_Locales_(\d{6})\.csv$')
+CLAVE_LICENCIA = ['id_local', 'ref_licencia']  # Clave natural de una licencia en los exports mensuales
+
+def descubrir_meses(directorio='datasets', patron=PATRON_LICENCIAS):
+    """
+    Busca los exports mensuales de licencias ('Licencias_Locales_YYYYMM.csv') de un directorio.
+
+    Retorna:
+        list: pares (periodo 'YYYYMM', ruta), del mes más antiguo al más reciente.
+    """
+    if not os.path.isdir(directorio):
+        logging.warning(f"El directorio '{directorio}' no existe. No hay exports mensuales de licencias.")
+        return []
+    meses = []
+    for archivo in os.listdir(directorio):
+        coincidencia = patron.match(archivo)
+        if coincidencia:
+            meses.append((coincidencia.group(1), os.path.join(directorio, archivo)))
+    meses.sort()
+    logging.info(f"Exports mensuales de licencias encontrados en '{directorio}': {[periodo for periodo, _ in meses]}.")
+    return meses
+
+def leer_meses(meses, max_workers=4):
+    """
+    Lee los meses en un pool de hilos y los entrega en el orden de 'meses'. Cada mes puede
+    ser la ruta de su export o un DataFrame ya cargado. Solo se adelanta la lectura de
+    'max_workers' meses, de modo que no se tienen todos en memoria a la vez.
+
+    Genera:
+        tuple: (periodo, DataFrame).
+    """
+    def leer(origen):
+        return origen if isinstance(origen, pd.DataFrame) else leer_csv_municipal(origen, 'licencias')
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pendientes = deque()
+        for periodo, origen in meses:
+            pendientes.append((periodo, pool.submit(leer, origen)))
+            if len(pendientes) >= max_workers:
+                periodo_listo, futuro = pendientes.popleft()
+                yield periodo_listo, futuro.result()
+        while pendientes:
+            periodo_listo, futuro = pendientes.popleft()
+            yield periodo_listo, futuro.result()
+
+def hash_filas(df, columnas=None):
+    """Hash de 64 bits por fila de 'columnas' (todas por defecto), independiente del índice."""
+    return pd.util.hash_pandas_object(df if columnas is None else df[columnas], index=False).to_numpy()
+
+def deduplicar_meses(meses, clave=CLAVE_LICENCIA):
+    """
+    Concatena meses de licencias conservando solo la versión más reciente de cada clave.
+
+    Los meses se recorren del más reciente al más antiguo y se compara cada fila por su clave y
+    por un hash de su contenido, en lugar de por todas las columnas. Del pasado solo se guarda
+    un par de hashes por clave ya vista, así que la memoria depende de un mes y de las claves, no
+    del total de filas. Las filas se entregan mes a mes, empezando por el más reciente.
+
+    Parámetros:
+        meses (iterable): pares (periodo, DataFrame) del más reciente al más antiguo.
+        clave (list): columnas que identifican una licencia.
+
+    Genera:
+        tuple: (periodo, filas conservadas del mes, estadísticas del mes).
+    """
+    claves_vistas = np.empty(0, dtype=np.uint64)
+    hashes_vistos = np.empty(0, dtype=np.uint64)
+    for periodo, df in meses:
+        faltan = [c for c in clave if c not in df.columns]
+        if faltan:
+            raise ValueError(f"El mes {periodo} no tiene las columnas de la clave: {faltan}")
+        claves = hash_filas(df, clave)
+        contenido = hash_filas(df)
+
+        # Dentro del mes se queda la última fila de cada clave
+        ultima = ~pd.Series(claves).duplicated(keep='last').to_numpy()
+        hash_ultima = pd.Series(contenido[ultima], index=claves[ultima])
+        descartadas = ~ultima
+        identicas = int((contenido[descartadas] == hash_ultima.loc[claves[descartadas]].to_numpy()).sum())
+
+        # Frente a los meses más recientes: nueva, sin cambios o sustituida por una versión posterior
+        posicion = pd.Index(claves_vistas).get_indexer(claves[ultima]) if len(claves_vistas) else np.full(int(ultima.sum()), -1)
+        vista = posicion >= 0
+        sin_cambios = int((hashes_vistos[posicion[vista]] == contenido[ultima][vista]).sum())
+        conservar = np.flatnonzero(ultima)[~vista]
+
+        claves_vistas = np.concatenate([claves_vistas, claves[conservar]])
+        hashes_vistos = np.concatenate([hashes_vistos, contenido[conservar]])
+        estadisticas = {
+            'periodo': periodo,
+            'filas': len(df),
+            'duplicadas_en_mes': identicas,
+            'versiones_en_mes': int(descartadas.sum()) - identicas,
+            'sin_cambios_posteriores': sin_cambios,
+            'sustituidas_posteriores': int(vista.sum()) - sin_cambios,
+            'conservadas': len(conservar),
+        }
+        yield periodo, df.iloc[conservar], estadisticas
+
+def concatenar_meses(meses, clave=CLAVE_LICENCIA, max_workers=4):
+    """
+    Motor de la Tarea 4 para cualquier número de meses: lee los meses en paralelo y los
+    deduplica por clave y hash de contenido (ver deduplicar_meses).
+
+    Parámetros:
+        meses (list): pares (periodo, ruta o DataFrame), en cualquier orden.
+
+    Genera:
+        tuple: (periodo, filas conservadas del mes, estadísticas del mes), del más reciente al más antiguo.
+    """
+    inicio = time.perf_counter()
+    ordenados = sorted(meses, key=lambda mes: mes[0], reverse=True)
+    for periodo, df, estadisticas in deduplicar_meses(leer_meses(ordenados, max_workers), clave):
+        logging.info(
+            f"Licencias {periodo}: {estadisticas['filas']} filas, {estadisticas['duplicadas_en_mes']} duplicadas y "
+            f"{estadisticas['versiones_en_mes']} versiones anteriores en el mismo mes, "
+            f"{estadisticas['sin_cambios_posteriores']} sin cambios y {estadisticas['sustituidas_posteriores']} "
+            f"sustituidas en meses posteriores, {estadisticas['conservadas']} conservadas."
+        )
+        yield periodo, df, estadisticas
+    logging.info(f"Concatenación de {len(ordenados)} meses de licencias completada en {time.perf_counter() - inicio:.2f} s.")
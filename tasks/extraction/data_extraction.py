@@ -1,12 +1,194 @@
 # data_extraction.py
 import pandas as pd
+import contextvars
+import json
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tasks.extraction.mmap_csv import leer_csv_mmap, RangosInconsistentes
+from tasks.extraction.extended_json import leer_json_extendido, leer_json_extendido_por_bloques
+from tasks.extraction.schemas import opciones_lectura_csv, aplicar_esquema, SEPARADOR_DECIMAL, FORMATO_FECHA
+from tasks.pipeline.instrumentation import instrumentar, registrar_bytes
 
 ENCODING = 'ISO-8859-1'
 
+RUTA_LICENCIAS_202104 = "datasets/Licencias_Locales_202104.csv"
+RUTA_LICENCIAS_202105 = "datasets/Licencias_Locales_202105.csv"
+RUTA_TERRAZAS = "datasets/Terrazas_202104.csv"
+RUTA_BOOKS = "datasets/books.json"
+
+FILAS_MUESTRA = 1000  # Filas leídas para estimar el tamaño en memoria de cada registro
+FACTOR_HOLGURA = 4  # Copias intermedias que las transformaciones hacen de cada bloque
+TAMANO_BLOQUE_MINIMO = 1000
+TAMANO_BLOQUE_POR_DEFECTO = 50000  # Si no hay ningún archivo con el que estimar los bytes por fila
+FORMATOS_FUENTE = ('csv', 'json')
+UMBRAL_LECTURA_MMAP = 256 * 2 ** 20  # Exports a partir de este tamaño se leen con mmap en varios procesos
+
+def fuente(nombre, ruta, esquema, formato='csv', obligatoria=True):
+    """
+    Declara una fuente del manifiesto de extracción.
+
+    Parámetros:
+        nombre (str): identificador de la fuente en el resultado de extraer_fuentes().
+        ruta (str): archivo de la fuente.
+        esquema (str): esquema de schemas.ESQUEMAS que se aplica al leerla.
+        formato (str): 'csv' (export municipal) o 'json' (JSON-lines extendido).
+        obligatoria (bool): si falta una fuente obligatoria, la extracción falla.
+    """
+    if formato not in FORMATOS_FUENTE:
+        raise ValueError(f"Formato de fuente no soportado: {formato}. Opciones: {FORMATOS_FUENTE}")
+    return {'nombre': nombre, 'ruta': ruta, 'esquema': esquema, 'formato': formato, 'obligatoria': obligatoria}
+
+# Fuentes del pipeline; extraer_datos() las lee en paralelo
+MANIFIESTO_FUENTES = [
+    fuente('licencias_202104', RUTA_LICENCIAS_202104, 'licencias'),
+    fuente('licencias_202105', RUTA_LICENCIAS_202105, 'licencias', obligatoria=False),
+    fuente('terrazas', RUTA_TERRAZAS, 'terrazas'),
+    fuente('books', RUTA_BOOKS, 'books', formato='json'),
+]
+
+def cargar_manifiesto(ruta):
+    """Lee un manifiesto de fuentes en JSON: una lista de objetos con los campos de fuente()."""
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return [fuente(**entrada) for entrada in json.load(f)]
+
+class FuenteBloques:
+    """
+    Fuente de datos re-iterable que produce DataFrames de tamaño acotado.
+
+    Cada iteración vuelve a abrir el origen, de modo que las etapas que necesitan más de
+    una pasada (por ejemplo, para calcular estadísticas antes de normalizar) pueden
+    recorrer los bloques varias veces sin mantener el dataset completo en memoria.
+    """
+
+    def __init__(self, nombre, fabrica):
+        self.nombre = nombre
+        self._fabrica = fabrica
+
+    def __iter__(self):
+        for bloque in self._fabrica():
+            if not bloque.empty:
+                yield bloque
+
+    def mapear(self, funcion, nombre=None):
+        """Retorna una nueva fuente que aplica 'funcion' a cada bloque."""
+        return FuenteBloques(nombre or self.nombre, lambda: (funcion(bloque) for bloque in self))
+
+    def esta_vacia(self):
+        return next(iter(self), None) is None
+
+def leer_csv_municipal(ruta, esquema, **kwargs):
+    """
+    Lee un export municipal (';' y Latin-1) aplicando su esquema durante el parseo. Los exports
+    de más de UMBRAL_LECTURA_MMAP bytes se leen con leer_csv_mmap si hay más de un CPU.
+    """
+    if not kwargs and (os.cpu_count() or 1) > 1 and os.path.getsize(ruta) >= UMBRAL_LECTURA_MMAP:
+        try:
+            df = leer_csv_mmap(ruta, sep=';', encoding=ENCODING, **opciones_lectura_csv(esquema))
+            registrar_bytes(leidos=os.path.getsize(ruta))
+            return aplicar_esquema(df, esquema)
+        except (RangosInconsistentes, pd.errors.ParserError) as e:
+            logging.warning(f"No se pudo leer {ruta} por rangos ({e}). Se lee de forma secuencial.")
+    df = pd.read_csv(ruta, sep=';', encoding=ENCODING, **opciones_lectura_csv(esquema), **kwargs)
+    if 'chunksize' in kwargs:
+        return df
+    registrar_bytes(leidos=os.path.getsize(ruta))
+    return aplicar_esquema(df, esquema)
+
+def leer_csv_por_bloques(ruta, chunksize, sep=';', encoding=ENCODING, esquema=None):
+    """
+    Crea una fuente por bloques para un CSV (por defecto, formato municipal: ';' y Latin-1).
+    Si se indica 'esquema', cada bloque se tipa al leerse.
+    """
+    if esquema is None:
+        return FuenteBloques(ruta, lambda: pd.read_csv(ruta, sep=sep, encoding=encoding, chunksize=chunksize))
+    return FuenteBloques(ruta, lambda: (aplicar_esquema(bloque, esquema)
+                                        for bloque in leer_csv_municipal(ruta, esquema, chunksize=chunksize)))
+
+def leer_json_por_bloques(ruta, chunksize):
+    """Crea una fuente por bloques para un fichero JSON-lines, leyendo lotes de líneas."""
+    return FuenteBloques(ruta, lambda: (aplicar_esquema(bloque, 'books')
+                                        for bloque in leer_json_extendido_por_bloques(ruta, chunksize)))
+
+def leer_fuente(spec):
+    """Lee una fuente del manifiesto completa, aplicando su esquema."""
+    if spec['formato'] == 'json':
+        return aplicar_esquema(leer_json_extendido(spec['ruta']), spec['esquema'])
+    return leer_csv_municipal(spec['ruta'], spec['esquema'])
+
+def extraer_fuentes(manifiesto=None, max_workers=4):
+    """
+    Lee todas las fuentes de un manifiesto a la vez en un pool de hilos. El parser de CSV de
+    pandas libera el GIL, así que los exports grandes se leen en paralelo de verdad.
+
+    Retorna:
+        dict: nombre -> DataFrame; las fuentes opcionales que no existen quedan como None.
+
+    Lanza FileNotFoundError si falta una fuente obligatoria.
+    """
+    manifiesto = MANIFIESTO_FUENTES if manifiesto is None else manifiesto
+    faltan = [spec['ruta'] for spec in manifiesto if spec['obligatoria'] and not os.path.exists(spec['ruta'])]
+    if faltan:
+        raise FileNotFoundError(f"Fuentes obligatorias no encontradas: {faltan}")
+
+    def leer_cronometrado(spec):
+        inicio = time.perf_counter()
+        return leer_fuente(spec), time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    datos, tiempos = {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Cada lectura se ejecuta en una copia del contexto para que cuente en la etapa que se está midiendo
+        futuros = {spec['nombre']: pool.submit(contextvars.copy_context().run, leer_cronometrado, spec)
+                   for spec in manifiesto if os.path.exists(spec['ruta'])}
+        for spec in manifiesto:
+            if spec['nombre'] not in futuros:
+                datos[spec['nombre']] = None
+                continue
+            datos[spec['nombre']], tiempos[spec['nombre']] = futuros[spec['nombre']].result()
+            logging.info(f"Fuente '{spec['nombre']}' ({spec['ruta']}) leída en {tiempos[spec['nombre']]:.2f} s: "
+                         f"{len(datos[spec['nombre']])} registros.")
+    total = time.perf_counter() - inicio
+    suma = sum(tiempos.values())
+    logging.info(f"Extracción de {len(tiempos)} fuentes en {total:.2f} s (suma de los tiempos por fuente "
+                 f"{suma:.2f} s, solapamiento x{suma / total if total else 0:.1f}).")
+    return datos
+
+def estimar_bytes_por_fila(ruta):
+    """Estima los bytes en memoria de una fila leyendo una muestra del principio del archivo."""
+    if ruta.endswith('.json'):
+        muestra = leer_json_extendido(ruta, nrows=FILAS_MUESTRA)
+    else:
+        muestra = pd.read_csv(ruta, sep=';', encoding=ENCODING, nrows=FILAS_MUESTRA)
+    if muestra.empty:
+        return 1
+    return max(1, int(muestra.memory_usage(deep=True).sum() / len(muestra)))
+
+def calcular_tamano_bloque(max_memoria_mb, rutas=None):
+    """
+    Calcula el número de filas por bloque para que un bloque, con sus copias intermedias,
+    quepa en el presupuesto de memoria indicado (en MB).
+    """
+    rutas = rutas or [RUTA_LICENCIAS_202104, RUTA_TERRAZAS, RUTA_BOOKS]
+    existentes = [ruta for ruta in rutas if os.path.exists(ruta)]
+    if not existentes:
+        logging.error(f"Ninguno de los archivos {rutas} existe para estimar el tamaño de bloque. "
+                      f"Se usan {TAMANO_BLOQUE_POR_DEFECTO} filas por bloque.")
+        return TAMANO_BLOQUE_POR_DEFECTO
+    bytes_por_fila = max(estimar_bytes_por_fila(ruta) for ruta in existentes)
+    tamano = int(max_memoria_mb * 1024 * 1024 / (bytes_por_fila * FACTOR_HOLGURA))
+    tamano = max(TAMANO_BLOQUE_MINIMO, tamano)
+    logging.info(f"Tamaño de bloque calculado: {tamano} filas ({bytes_por_fila} bytes/fila estimados, límite {max_memoria_mb} MB).")
+    return tamano
+
 def generar_variacion(df, nombre_nuevo_archivo):
+    """
+    Genera el mes siguiente a partir de 'df', lo guarda en 'nombre_nuevo_archivo' y lo retorna,
+    de modo que no hace falta volver a leer el archivo recién escrito. 'df' no se modifica.
+    """
     logging.info(f"Generando variación del archivo: {nombre_nuevo_archivo}")
+    df = df.copy()
     
     if 'fecha' in df.columns:
         df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce') + pd.DateOffset(months=1)
@@ -19,14 +201,87 @@ def generar_variacion(df, nombre_nuevo_archivo):
         logging.warning("La columna 'licencias_count' no se encontró; omitiendo ajuste de conteo.")
     
     try:
-        df.to_csv(nombre_nuevo_archivo, sep=';', index=False, encoding=ENCODING)
+        df.to_csv(nombre_nuevo_archivo, sep=';', index=False, encoding=ENCODING,
+                  decimal=SEPARADOR_DECIMAL, date_format=FORMATO_FECHA)
         logging.info(f"Archivo generado y guardado: {nombre_nuevo_archivo}")
         print(f"Archivo generado y guardado como {nombre_nuevo_archivo}.")
     except Exception as e:
         logging.error(f"Error al guardar el archivo {nombre_nuevo_archivo}: {e}")
         print(f"Error: No se pudo guardar el archivo {nombre_nuevo_archivo}.")
+    return df
+
+def generar_variacion_por_bloques(fuente, nombre_nuevo_archivo):
+    """Genera el archivo de variación bloque a bloque, sin cargar el dataset de origen completo."""
+    logging.info(f"Generando variación por bloques del archivo: {nombre_nuevo_archivo}")
+    primero = True
+    for bloque in fuente:
+        if 'fecha' in bloque.columns:
+            bloque['fecha'] = pd.to_datetime(bloque['fecha'], errors='coerce') + pd.DateOffset(months=1)
+        if 'licencias_count' in bloque.columns:
+            bloque['licencias_count'] = bloque['licencias_count'] * 1.05
+        bloque.to_csv(nombre_nuevo_archivo, sep=';', index=False, encoding=ENCODING,
+                      decimal=SEPARADOR_DECIMAL, date_format=FORMATO_FECHA,
+                      mode='w' if primero else 'a', header=primero)
+        primero = False
+    logging.info(f"Archivo generado y guardado: {nombre_nuevo_archivo}")
+
+def extraer_datos_por_bloques(chunksize):
+    """
+    Modo de extracción en streaming: retorna fuentes por bloques en lugar de DataFrames completos.
+
+    Retorna:
+        tuple: (licencias_202104, licencias_202105, terrazas, books) como FuenteBloques;
+        licencias_202105 es None si no se pudo obtener.
+    """
+    logging.info(f"Iniciando extracción de datos por bloques de {chunksize} filas...")
+    print("Extrayendo datos por bloques...")
+
+    try:
+        for ruta in (RUTA_LICENCIAS_202104, RUTA_TERRAZAS, RUTA_BOOKS):
+            if not os.path.exists(ruta):
+                raise FileNotFoundError(ruta)
+        fuente_licencias_202104 = leer_csv_por_bloques(RUTA_LICENCIAS_202104, chunksize, esquema='licencias')
+        fuente_terrazas = leer_csv_por_bloques(RUTA_TERRAZAS, chunksize, esquema='terrazas')
+        fuente_books = leer_json_por_bloques(RUTA_BOOKS, chunksize)
+
+        if any(fuente.esta_vacia() for fuente in (fuente_licencias_202104, fuente_terrazas, fuente_books)):
+            logging.error("Uno o más archivos obligatorios están vacíos. Abortar proceso de extracción.")
+            print("Error: Uno o más archivos obligatorios están vacíos.")
+            return None, None, None, None
+    except FileNotFoundError as fnf_error:
+        logging.error(f"Archivo no encontrado durante la extracción: {fnf_error}")
+        print(f"Error: Archivo requerido no encontrado - {fnf_error}")
+        return None, None, None, None
+    except Exception as e:
+        logging.error(f"Error inesperado durante la extracción de datos: {e}")
+        print(f"Error: Error inesperado durante la extracción de datos - {e}")
+        return None, None, None, None
+
+    fuente_licencias_202105 = None
+    try:
+        if not os.path.exists(RUTA_LICENCIAS_202105):
+            logging.warning("Dataset opcional 'Licencias_Locales_202105.csv' no encontrado. Generando variación.")
+            print("Advertencia: 'Licencias_Locales_202105.csv' no encontrado. Generando variación.")
+            generar_variacion_por_bloques(fuente_licencias_202104, RUTA_LICENCIAS_202105)
+        fuente_licencias_202105 = leer_csv_por_bloques(RUTA_LICENCIAS_202105, chunksize, esquema='licencias')
+        if fuente_licencias_202105.esta_vacia():
+            logging.warning("El archivo opcional 'Licencias_Locales_202105.csv' está vacío después de la generación.")
+            fuente_licencias_202105 = None
+    except Exception as e:
+        logging.error(f"Error al manejar el dataset opcional 'Licencias_Locales_202105.csv': {e}")
+        print(f"Error: No se pudo procesar o generar el archivo opcional - {e}")
+
+    logging.info("Extracción de datos por bloques preparada correctamente.")
+    return fuente_licencias_202104, fuente_licencias_202105, fuente_terrazas, fuente_books
 
-def extraer_datos():
+@instrumentar('extraccion')
+def extraer_datos(manifiesto=None, max_workers=4):
+    """
+    Lee en paralelo las fuentes del manifiesto (por defecto, MANIFIESTO_FUENTES) y retorna
+    (licencias_202104, licencias_202105, terrazas, books). Un manifiesto propio debe declarar
+    fuentes con esos nombres; las demás fuentes que incluya se leen igualmente. Si falta Licencias_Locales_202105.csv
+    se genera una variación de 202104, que se usa directamente sin releer el archivo escrito.
+    """
     logging.info("Iniciando extracción de datos...")
     print("Extrayendo datos...")
 
@@ -34,9 +289,8 @@ def extraer_datos():
     df_licencias_202104, df_licencias_202105, df_terrazas, df_books = None, None, None, None
 
     try:
-        df_licencias_202104 = pd.read_csv("datasets/Licencias_Locales_202104.csv", sep=';', encoding=ENCODING)
-        df_terrazas = pd.read_csv("datasets/Terrazas_202104.csv", sep=';', encoding=ENCODING)
-        df_books = pd.read_json("datasets/books.json", lines=True)
+        datos = extraer_fuentes(manifiesto, max_workers)
+        df_licencias_202104, df_terrazas, df_books = datos['licencias_202104'], datos['terrazas'], datos['books']
         logging.info("Datasets obligatorios cargados correctamente.")
         
         # Validación de que no están vacíos
@@ -54,17 +308,17 @@ def extraer_datos():
         print(f"Error: Error inesperado durante la extracción de datos - {e}")
         return None, None, None, None
 
-    # Verificar y cargar archivo opcional, generando si falta
-    ruta_licencias_202105 = "datasets/Licencias_Locales_202105.csv"
+    # Archivo opcional: ya leído junto a los demás o, si falta, generado en memoria
+    ruta_licencias_202105 = next((spec['ruta'] for spec in manifiesto or MANIFIESTO_FUENTES
+                                  if spec['nombre'] == 'licencias_202105'), RUTA_LICENCIAS_202105)
     try:
-        if os.path.exists(ruta_licencias_202105):
-            df_licencias_202105 = pd.read_csv(ruta_licencias_202105, sep=';', encoding=ENCODING)
+        df_licencias_202105 = datos.get('licencias_202105')
+        if df_licencias_202105 is not None:
             logging.info("Dataset opcional cargado: Licencias_Locales_202105.csv")
         else:
             logging.warning("Dataset opcional 'Licencias_Locales_202105.csv' no encontrado. Generando variación.")
             print("Advertencia: 'Licencias_Locales_202105.csv' no encontrado. Generando variación.")
-            generar_variacion(df_licencias_202104, ruta_licencias_202105)
-            df_licencias_202105 = pd.read_csv(ruta_licencias_202105, sep=';', encoding=ENCODING)
+            df_licencias_202105 = generar_variacion(df_licencias_202104, ruta_licencias_202105)
             logging.info("Variación generada y dataset opcional cargado: Licencias_Locales_202105.csv")
         
         # Validación de que el archivo opcional no está vacío
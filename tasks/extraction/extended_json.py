@@ -0,0 +1,115 @@
+# extended_json.py
+import json
+import logging
+import os
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from tasks.pipeline.instrumentation import registrar_bytes
+
+FILAS_MUESTRA_JSON = 200  # Filas repartidas por el dataset que se inspeccionan para detectar columnas anidadas
+
+class FechaExtendida(str):
+    """Valor de un {"$date": ...} ya decodificado; marca la columna como fecha para tiparla después."""
+
+def decodificar_extendido(objeto):
+    """
+    object_hook de json.loads para el JSON extendido de MongoDB: {"$oid": x} pasa a x (str),
+    {"$date": x} a una FechaExtendida y {"$numberLong"/"$numberInt"/"$numberDouble": x} al número.
+    """
+    if len(objeto) != 1:
+        return objeto
+    clave, valor = next(iter(objeto.items()))
+    if clave == '$oid':
+        return str(valor)
+    if clave == '$date':
+        if isinstance(valor, dict):  # {"$date": {"$numberLong": "..."}} ya decodificado a int
+            valor = next(iter(valor.values()))
+        return FechaExtendida(valor)
+    if clave in ('$numberLong', '$numberInt'):
+        return int(valor)
+    if clave == '$numberDouble':
+        return float(valor)
+    return objeto
+
+def muestra_repartida(df, filas=FILAS_MUESTRA_JSON):
+    """Filas repartidas de forma uniforme por el DataFrame (no solo las primeras)."""
+    if len(df) <= filas:
+        return df
+    return df.iloc[np.linspace(0, len(df) - 1, filas).astype(int)]
+
+def detectar_columnas_anidadas(df, filas=FILAS_MUESTRA_JSON):
+    """
+    Clasifica las columnas object a partir de una muestra, sin recorrer todas las celdas.
+
+    Retorna:
+        dict: {'fecha': [...], 'diccionario': [...], 'lista': [...]}.
+    """
+    tipos = {'fecha': [], 'diccionario': [], 'lista': []}
+    muestra = muestra_repartida(df, filas)
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        valores = muestra[col].dropna()
+        if valores.map(lambda x: isinstance(x, FechaExtendida)).any():
+            tipos['fecha'].append(col)
+        elif valores.map(lambda x: isinstance(x, dict)).any():
+            tipos['diccionario'].append(col)
+        elif valores.map(lambda x: isinstance(x, list)).any():
+            tipos['lista'].append(col)
+    return tipos
+
+def convertir_fecha_extendida(serie):
+    """Convierte una columna de $date (ISO 8601 con zona o milisegundos epoch) a datetime64 en UTC."""
+    texto = serie.map(str, na_action='ignore')  # pandas no parsea subclases de str
+    milisegundos = pd.to_numeric(texto, errors='coerce')
+    fechas = pd.to_datetime(texto.where(milisegundos.isna()), format='ISO8601', utc=True, errors='coerce')
+    fechas = fechas.fillna(pd.to_datetime(milisegundos, unit='ms', utc=True))
+    return fechas.dt.tz_convert(None)
+
+def tipar_extendido(df, nombre=None):
+    """
+    Tipa las columnas que el decodificador dejó marcadas: fechas a datetime64 e identificadores
+    a str. Los diccionarios que no son JSON extendido se convierten a texto.
+    """
+    tipos = detectar_columnas_anidadas(df)
+    for col in tipos['fecha']:
+        df[col] = convertir_fecha_extendida(df[col])
+    if '_id' in df.columns:
+        # Mezcla de enteros y ObjectId ya decodificados: todos pasan a str
+        df['_id'] = df['_id'].astype(str)
+    for col in tipos['diccionario']:
+        df[col] = df[col].map(lambda x: str(x) if isinstance(x, dict) else x)
+    if any(tipos.values()):
+        logging.info(f"JSON extendido{f' {nombre}' if nombre else ''}: fechas {tipos['fecha']}, "
+                     f"diccionarios {tipos['diccionario']}, listas {tipos['lista']}.")
+    return df
+
+def normalizar_ids(serie):
+    """Identificadores como str, decodificando los {"$oid": ...} que no pasaron por el decodificador."""
+    return serie.map(lambda x: str(x['$oid']) if isinstance(x, dict) and '$oid' in x else str(x))
+
+def _registros(lineas):
+    return [json.loads(linea, object_hook=decodificar_extendido) for linea in lineas if linea.strip()]
+
+def leer_json_extendido(ruta, nrows=None):
+    """Lee un fichero JSON-lines con JSON extendido, decodificando $oid y $date durante la carga."""
+    with open(ruta, 'r', encoding='utf-8') as f:
+        registros = _registros(islice(f, nrows))
+    if nrows is None:
+        registrar_bytes(leidos=os.path.getsize(ruta))
+    return tipar_extendido(pd.DataFrame.from_records(registros), ruta)
+
+def leer_json_extendido_por_bloques(ruta, chunksize):
+    """Generador de bloques de 'chunksize' líneas de un JSON-lines con JSON extendido."""
+    with open(ruta, 'r', encoding='utf-8') as f:
+        while True:
+            lineas = list(islice(f, chunksize))
+            if not lineas:
+                break
+            # Un lote de solo líneas en blanco no tiene registros, pero el fichero puede seguir
+            registros = _registros(lineas)
+            if registros:
+                yield tipar_extendido(pd.DataFrame.from_records(registros), ruta)
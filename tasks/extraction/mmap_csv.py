@@ -0,0 +1,159 @@
+# mmap_csv.py
+import io
+import logging
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from tasks.pipeline.scheduler import CONTEXTO_PROCESOS
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+TAMANO_RANGO = 64 * 2 ** 20  # Bytes de CSV que parsea cada tarea (acota la memoria de cada proceso)
+MOTORES = ('c', 'pyarrow')
+
+class RangosInconsistentes(ValueError):
+    """Un rango no se pudo parsear por separado (p. ej. un campo entre comillas con saltos de línea)."""
+
+def limites_filas(mm, partes, inicio=0):
+    """
+    Divide un CSV mapeado en 'partes' rangos de bytes que empiezan y terminan en un salto de
+    línea. Cada corte se busca a partir de un desplazamiento aproximado, sin leer el resto.
+
+    Retorna:
+        list: pares (inicio, fin) contiguos que cubren [inicio, len(mm)).
+    """
+    tamano = len(mm)
+    cortes = [inicio]
+    for i in range(1, partes):
+        aproximado = max(inicio + (tamano - inicio) * i // partes, cortes[-1])
+        salto = mm.find(b'\n', aproximado)
+        if salto < 0:
+            break
+        if salto + 1 > cortes[-1]:
+            cortes.append(salto + 1)
+    if cortes[-1] < tamano:
+        cortes.append(tamano)
+    return list(zip(cortes[:-1], cortes[1:]))
+
+def _parsear_rango(ruta, inicio, fin, columnas, encoding, motor, opciones):
+    """
+    Parsea un rango de bytes del CSV en un proceso del pool. El rango se transcodifica a UTF-8
+    una sola vez y el parser trabaja sobre esos bytes sin volver a decodificarlos.
+
+    Retorna:
+        tuple: (DataFrame del rango, líneas del rango) para comprobar que no se ha partido ninguna fila.
+    """
+    with open(ruta, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        crudo = mm[inicio:fin]
+    lineas = crudo.count(b'\n') + (0 if crudo.endswith(b'\n') else 1)
+    utf8 = crudo.decode(encoding).encode('utf-8')
+    del crudo
+    if motor == 'pyarrow':
+        df = _parsear_pyarrow(utf8, columnas, opciones)
+    else:
+        df = pd.read_csv(io.BytesIO(utf8), header=None, names=columnas, encoding='utf-8', **opciones)
+    return df, lineas
+
+def _parsear_pyarrow(utf8, columnas, opciones):
+    """
+    Parsea un rango con pyarrow.csv. Las columnas de texto y categóricas se leen siempre como
+    cadenas (pyarrow infiere números en los rangos donde solo hay dígitos) y los vacíos como nulos,
+    igual que el motor C.
+    """
+    dtypes = opciones.get('dtype') or {}
+    tipos = {'float64': pa.float64(), 'object': pa.string(), 'category': pa.string()}
+    tabla = pa_csv.read_csv(
+        pa.py_buffer(utf8),
+        read_options=pa_csv.ReadOptions(column_names=columnas),
+        parse_options=pa_csv.ParseOptions(delimiter=opciones.get('sep', ',')),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={c: tipos[t] for c, t in dtypes.items() if t in tipos and c in columnas},
+            decimal_point=opciones.get('decimal', '.'), strings_can_be_null=True),
+    )
+    df = tabla.to_pandas()
+    for col in df.columns:
+        if df[col].dtype == object:
+            # pyarrow deja None en los nulos de texto; el motor C, NaN
+            df[col] = df[col].where(df[col].notna(), np.nan)
+    for col, tipo in dtypes.items():
+        if tipo == 'category' and col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+def combinar_rangos(partes):
+    """
+    Une los DataFrames de los rangos en uno. Las columnas categóricas se unen con
+    union_categoricals (categorías ordenadas, como las del parser), para que no pasen a object.
+    """
+    if len(partes) == 1:
+        return partes[0]
+    columnas = list(partes[0].columns)
+    categoricas = [c for c in columnas if all(isinstance(p[c].dtype, pd.CategoricalDtype) for p in partes)]
+    df = pd.concat([p.drop(columns=categoricas) for p in partes], ignore_index=True)
+    for col in categoricas:
+        valores = [p[col] for p in partes]
+        # Un rango sin valores tiene categorías vacías de tipo float; se igualan a las de texto
+        valores = [v.cat.set_categories(pd.Index([], dtype=object)) if len(v.cat.categories) == 0 else v
+                   for v in valores]
+        df[col] = pd.Series(union_categoricals(valores, sort_categories=True), index=df.index)
+    return df[columnas]
+
+def leer_csv_mmap(ruta, sep=';', encoding='ISO-8859-1', max_workers=None, motor='c',
+                  tamano_rango=TAMANO_RANGO, **opciones):
+    """
+    Lee un CSV grande mapeándolo en memoria y parseando rangos de filas en paralelo.
+
+    El proceso principal solo mapea el archivo para leer la cabecera y buscar los saltos de línea
+    de los cortes; cada proceso del pool mapea el mismo archivo, copia únicamente su rango,
+    lo transcodifica una vez y lo parsea con el motor C de pandas o con pyarrow. Los rangos se
+    combinan en un único DataFrame con los tipos de 'opciones' (dtype, decimal...).
+
+    Los cortes suponen que ningún campo entre comillas contiene saltos de línea; si algún rango
+    no cuadra con sus líneas se lanza RangosInconsistentes y el llamador debe usar pd.read_csv.
+
+    Parámetros:
+        max_workers (int): procesos del pool (por defecto, los CPUs disponibles).
+        motor (str): 'c' o 'pyarrow'.
+        tamano_rango (int): bytes aproximados de cada rango.
+    """
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de parseo no soportado: {motor}. Opciones: {MOTORES}")
+    if motor == 'pyarrow' and pa is None:
+        logging.warning("pyarrow no está instalado. Los rangos se parsean con el motor C de pandas.")
+        motor = 'c'
+    inicio = time.perf_counter()
+    max_workers = max_workers or os.cpu_count() or 1
+    with open(ruta, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        fin_cabecera = mm.find(b'\n') + 1 or len(mm)
+        cabecera = mm[:fin_cabecera].decode(encoding).encode('utf-8')
+        partes = max(max_workers, -(-(len(mm) - fin_cabecera) // tamano_rango))
+        rangos = limites_filas(mm, partes, fin_cabecera)
+    opciones['sep'] = sep
+    columnas = list(pd.read_csv(io.BytesIO(cabecera), nrows=0, encoding='utf-8', sep=sep).columns)
+    if not rangos:
+        return pd.read_csv(io.BytesIO(cabecera), encoding='utf-8', **opciones)
+
+    argumentos = [(ruta, a, b, columnas, encoding, motor, opciones) for a, b in rangos]
+    if max_workers == 1 or len(rangos) == 1:
+        resultados = [_parsear_rango(*args) for args in argumentos]
+    else:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(rangos)), mp_context=CONTEXTO_PROCESOS) as pool:
+            resultados = list(pool.map(_parsear_rango, *zip(*argumentos)))
+
+    for (a, b), (df, lineas) in zip(rangos, resultados):
+        if len(df) != lineas:
+            raise RangosInconsistentes(f"El rango [{a}, {b}) de {ruta} tiene {lineas} líneas y se parsearon {len(df)} filas.")
+    df = combinar_rangos([df for df, _ in resultados])
+    logging.info(f"{ruta} leído con mmap en {len(rangos)} rangos ({max_workers} procesos, motor {motor}) "
+                 f"en {time.perf_counter() - inicio:.2f} s: {len(df)} registros.")
+    return df
@@ -0,0 +1,199 @@
+# schemas.py
+import logging
+
+import pandas as pd
+
+from tasks.transformation.text_normalization import normalizar_categorias, normalizar_serie
+
+# Formato de los exports municipales de Madrid
+SEPARADOR_DECIMAL = ','
+FORMATO_FECHA = '%d/%m/%Y'
+
+# Roles de columna: las columnas 'id' y 'coordenada' no se normalizan en la Tarea 1
+ROLES_NO_NORMALIZABLES = ('id', 'coordenada')
+
+def columna(tipo, rol=None, recortar=False, formato=None):
+    """
+    Declara una columna de un esquema.
+
+    Parámetros:
+        tipo (str): 'entero' (con reducción de tamaño), 'decimal' (separador ','), 'fecha',
+            'categoria', 'texto' o 'json' (listas u objetos que se dejan tal como se leen).
+        rol (str): 'id', 'coordenada' o 'medida'; sirve para decidir qué columnas se normalizan.
+        recortar (bool): quitar el relleno de espacios de los campos descriptivos.
+        formato (str): formato de fecha (por defecto dd/mm/yyyy).
+    """
+    return {'tipo': tipo, 'rol': rol, 'recortar': recortar, 'formato': formato or FORMATO_FECHA}
+
+# Columnas del local, comunes a los exports de terrazas y de licencias
+COLUMNAS_LOCAL = {
+    'id_local': columna('entero', rol='id'),
+    'id_distrito_local': columna('entero', rol='id'),
+    'desc_distrito_local': columna('categoria', recortar=True),
+    'id_barrio_local': columna('entero', rol='id'),
+    'desc_barrio_local': columna('categoria', recortar=True),
+    'id_ndp_edificio': columna('entero', rol='id'),
+    'id_clase_ndp_edificio': columna('entero', rol='id'),
+    'id_vial_edificio': columna('entero', rol='id'),
+    'clase_vial_edificio': columna('categoria', recortar=True),
+    'desc_vial_edificio': columna('categoria', recortar=True),
+    'nom_edificio': columna('categoria', recortar=True),
+    'num_edificio': columna('entero'),
+    'Cod_Postal': columna('entero', rol='id'),
+    'coordenada_x_local': columna('decimal', rol='coordenada'),
+    'coordenada_y_local': columna('decimal', rol='coordenada'),
+    'id_tipo_acceso_local': columna('entero', rol='id'),
+    'desc_tipo_acceso_local': columna('categoria', recortar=True),
+    'id_situacion_local': columna('entero', rol='id'),
+    'desc_situacion_local': columna('categoria', recortar=True),
+    'secuencial_local_PC': columna('entero'),
+    'Escalera': columna('categoria', recortar=True),
+    'id_planta_agrupado': columna('categoria', recortar=True),
+    'id_local_agrupado': columna('categoria', recortar=True),
+    'coordenada_x_agrupacion': columna('decimal', rol='coordenada'),
+    'coordenada_y_agrupacion': columna('decimal', rol='coordenada'),
+    'rotulo': columna('texto', recortar=True),
+}
+
+ESQUEMA_TERRAZAS = {
+    'id_terraza': columna('entero', rol='id'),
+    **COLUMNAS_LOCAL,
+    'id_periodo_terraza': columna('entero', rol='id'),
+    'desc_periodo_terraza': columna('categoria', recortar=True),
+    'id_situacion_terraza': columna('entero', rol='id'),
+    'desc_situacion_terraza': columna('categoria', recortar=True),
+    'Superficie_ES': columna('decimal', rol='medida'),
+    'Superficie_RA': columna('decimal', rol='medida'),
+    'Fecha_confir_ult_decreto_resol': columna('fecha'),
+    'id_ndp_terraza': columna('entero', rol='id'),
+    'id_clase_ndp_terraza': columna('entero', rol='id'),
+    'ID_VIAL': columna('entero', rol='id'),
+    'DESC_CLASE': columna('categoria', recortar=True),
+    'DESC_NOMBRE': columna('categoria', recortar=True),
+    'nom_terraza': columna('categoria', recortar=True),
+    'num_terraza': columna('entero'),
+    'cal_terraza': columna('categoria', recortar=True),
+    'desc_ubicacion_terraza': columna('categoria', recortar=True),
+    'hora_ini_LJ_es': columna('categoria'),
+    'hora_fin_LJ_es': columna('categoria'),
+    'hora_ini_LJ_ra': columna('categoria'),
+    'hora_fin_LJ_ra': columna('categoria'),
+    'hora_ini_VS_es': columna('categoria'),
+    'hora_fin_VS_es': columna('categoria'),
+    'hora_ini_VS_ra': columna('categoria'),
+    'hora_fin_VS_ra': columna('categoria'),
+    'mesas_aux_es': columna('entero', rol='medida'),
+    'mesas_aux_ra': columna('entero', rol='medida'),
+    'mesas_es': columna('entero', rol='medida'),
+    'mesas_ra': columna('entero', rol='medida'),
+    'sillas_es': columna('entero', rol='medida'),
+    # El export coloca aquí el calificador del número de la terraza (' A', ' B', ...)
+    'sillas_ra': columna('categoria', recortar=True),
+}
+
+ESQUEMA_LICENCIAS = {
+    **COLUMNAS_LOCAL,
+    'ref_licencia': columna('texto', recortar=True),
+    'id_tipo_licencia': columna('entero', rol='id'),
+    'desc_tipo_licencia': columna('categoria', recortar=True),
+    'id_tipo_situacion_licencia': columna('entero', rol='id'),
+    'desc_tipo_situacion_licencia': columna('categoria', recortar=True),
+    'Fecha_Dec_Lic': columna('fecha'),
+}
+
+ESQUEMA_BOOKS = {
+    '_id': columna('texto', rol='id'),
+    'title': columna('texto'),
+    'isbn': columna('texto', rol='id'),
+    'pageCount': columna('entero', rol='medida'),
+    'status': columna('categoria'),
+    'authors': columna('json'),
+    'categories': columna('json'),
+    'publishedDate': columna('fecha'),  # {"$date": ...} decodificado al leer
+    'thumbnailUrl': columna('texto'),
+    'shortDescription': columna('texto'),
+    'longDescription': columna('texto'),
+}
+
+ESQUEMAS = {
+    'terrazas': ESQUEMA_TERRAZAS,
+    'licencias': ESQUEMA_LICENCIAS,
+    'books': ESQUEMA_BOOKS,
+}
+
+def dtypes_lectura(esquema):
+    """Tipos que se pasan a pd.read_csv para que el parser construya directamente las columnas."""
+    dtypes = {}
+    for nombre, spec in esquema.items():
+        if spec['tipo'] == 'decimal':
+            dtypes[nombre] = 'float64'
+        elif spec['tipo'] == 'categoria':
+            dtypes[nombre] = 'category'
+        elif spec['tipo'] in ('texto', 'fecha'):
+            dtypes[nombre] = 'object'
+    return dtypes
+
+def opciones_lectura_csv(nombre_esquema):
+    """Argumentos de pd.read_csv para leer un export municipal con su esquema."""
+    return {'dtype': dtypes_lectura(ESQUEMAS[nombre_esquema]), 'decimal': SEPARADOR_DECIMAL}
+
+def recortar_categorias(serie):
+    """
+    Quita el relleno y los espacios repetidos de una columna categórica trabajando solo sobre
+    sus categorías; las que quedan iguales se fusionan sin pasar por las filas.
+    """
+    return normalizar_categorias(serie)
+
+def aplicar_esquema(df, nombre_esquema):
+    """
+    Termina de tipar un DataFrame según su esquema: reduce enteros, convierte decimales y fechas
+    y recorta los campos descriptivos. Las columnas no declaradas conservan el tipo inferido.
+    """
+    esquema = ESQUEMAS[nombre_esquema]
+    no_declaradas = [c for c in df.columns if c not in esquema]
+    if no_declaradas:
+        logging.warning(f"Columnas sin declarar en el esquema '{nombre_esquema}': {no_declaradas}. Se mantienen los tipos inferidos.")
+
+    for col in df.columns:
+        spec = esquema.get(col)
+        if spec is None:
+            continue
+        serie = df[col]
+
+        tipo = spec['tipo']
+        if tipo == 'entero':
+            serie = pd.to_numeric(serie, errors='coerce')
+            if serie.isna().any():
+                df[col] = serie.astype('float32') if serie.abs().max() < 2 ** 24 else serie
+            else:
+                df[col] = pd.to_numeric(serie, downcast='integer')
+        elif tipo == 'decimal':
+            if serie.dtype == object:
+                serie = pd.to_numeric(serie.str.replace(SEPARADOR_DECIMAL, '.', regex=False), errors='coerce')
+            df[col] = serie.astype('float64')
+        elif tipo == 'fecha':
+            if not pd.api.types.is_datetime64_any_dtype(serie):
+                df[col] = pd.to_datetime(serie, format=spec['formato'], errors='coerce')
+        elif tipo == 'categoria':
+            if not isinstance(serie.dtype, pd.CategoricalDtype):
+                serie = serie.astype('category')
+            df[col] = recortar_categorias(serie) if spec['recortar'] else serie
+        elif tipo == 'texto' and spec['recortar'] and serie.dtype == object:
+            df[col] = normalizar_serie(serie, minusculas=False, nulo=None)
+    return df
+
+def columnas_no_normalizables(df, nombre_esquema):
+    """Columnas numéricas que, por su rol (identificadores, coordenadas), no deben normalizarse."""
+    esquema = ESQUEMAS[nombre_esquema]
+    return [c for c in df.columns if esquema.get(c, {}).get('rol') in ROLES_NO_NORMALIZABLES]
+
+def bytes_en_memoria(df):
+    """Bytes que ocupa un DataFrame, incluyendo el contenido de las cadenas."""
+    return int(df.memory_usage(deep=True).sum())
+
+def registrar_informe_memoria(nombre, df_sin_tipar, df_tipado):
+    """Registra en el log los bytes de un dataset antes y después de aplicar el esquema."""
+    antes, despues = bytes_en_memoria(df_sin_tipar), bytes_en_memoria(df_tipado)
+    reduccion = 1 - despues / antes if antes else 0.0
+    logging.info(f"Memoria del dataset {nombre}: {antes} bytes sin esquema, {despues} bytes con esquema ({reduccion:.1%} menos).")
+    return {'dataset': nombre, 'bytes_antes': antes, 'bytes_despues': despues, 'reduccion': reduccion}
@@ -1,44 +1,347 @@
 # data_loading.py
+import io
+import time
 import pandas as pd
-from sqlalchemy import create_engine
+from psycopg2 import sql
 from sqlalchemy.exc import SQLAlchemyError
 import logging
-from config.db_config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME
+from tasks.loading.db_pool import obtener_conexion, obtener_engine, conectar
+from tasks.pipeline.instrumentation import instrumentar, registrar_bytes
+from tasks.loading.table_layout import (PARTICIONES, indice, indices_tabla, crear_indices, renombrar_indices, sql_particionar,
+                                        crear_particiones, renombrar_particiones, analizar, comprobar_planes)
 
-def create_db_engine():
-    """Crea y retorna una conexión de SQLAlchemy al Data Warehouse."""
+METODOS_CARGA = ('copy', 'to_sql')
+FILAS_POR_BLOQUE_COPY = 50000  # Filas que se serializan a la vez en el buffer de COPY
+NULO_COPY = r'\N'
+SUFIJO_STAGING = '_staging'
+COLUMNA_HASH = '_hash_fila'
+
+# Claves naturales de las tablas que admiten la carga incremental (if_exists='merge')
+CLAVES_NATURALES = {
+    'licencias_terrazas_integradas': ['id_terraza', 'id_local', 'ref_licencia'],
+    'licencias_concatenadas': ['id_local', 'ref_licencia'],
+    'superficies_agregadas': ['id_barrio_local'],
+}
+
+def tipo_postgres(dtype):
+    """Tipo de columna de PostgreSQL que corresponde a un dtype de pandas."""
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'BOOLEAN'
+    # Los esquemas reducen enteros y decimales al tamaño mínimo de cada bloque; en la tabla se usan
+    # tipos que admitan los bloques siguientes
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER' if dtype.itemsize <= 4 else 'BIGINT'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'DOUBLE PRECISION'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'TIMESTAMPTZ' if getattr(dtype, 'tz', None) is not None else 'TIMESTAMP'
+    if isinstance(dtype, pd.CategoricalDtype):
+        return tipo_postgres(dtype.categories.dtype)
+    return 'TEXT'
+
+def sql_crear_tabla(df, table_name, clave=None, temporal=False, particion=None):
+    """
+    Sentencia CREATE TABLE con los tipos derivados de los dtypes del DataFrame. Si se indica
+    'clave', se declara como clave primaria; las tablas temporales se borran al hacer commit.
+    Con 'particion' (ver table_layout.particion_mensual) la tabla se crea particionada por rangos.
+    """
+    columnas = [
+        sql.SQL('{} {}').format(sql.Identifier(str(col)), sql.SQL(tipo_postgres(df[col].dtype)))
+        for col in df.columns
+    ]
+    if clave:
+        columnas.append(sql.SQL('PRIMARY KEY ({})').format(sql.SQL(', ').join(map(sql.Identifier, clave))))
+    if temporal:
+        return sql.SQL('CREATE TEMP TABLE {} ({}) ON COMMIT DROP').format(sql.Identifier(table_name), sql.SQL(', ').join(columnas))
+    crear = sql.SQL('CREATE TABLE {} ({})').format(sql.Identifier(table_name), sql.SQL(', ').join(columnas))
+    return crear + sql_particionar(particion) if particion else crear
+
+def tipos_tabla(cursor, table_name):
+    """Tipos de las columnas de una tabla existente (vacío si la tabla no existe)."""
+    cursor.execute(
+        "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s",
+        (table_name,)
+    )
+    return dict(cursor.fetchall())
+
+def es_particionada(cursor, table_name):
+    """Indica si una tabla existente está particionada."""
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)",
+                   (sql.Identifier(table_name).as_string(cursor),))
+    fila = cursor.fetchone()
+    return bool(fila and fila[0])
+
+def comprobar_indices(table_name):
+    """
+    Comprueba con EXPLAIN que las consultas objetivo de la tabla (table_layout.COMPROBACIONES)
+    usan sus índices o particiones. Un fallo aquí no invalida la carga: solo se registra.
+    Solo se comprueba en PostgreSQL (to_sql también puede cargar en otras bases de datos).
+    """
+    engine = obtener_engine()
+    if engine is None or engine.dialect.name != 'postgresql':
+        return None
+    conexion = obtener_conexion(autocommit=True)
+    if conexion is None:
+        return None
     try:
-        engine = create_engine(f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
-        logging.info("Conexión a la base de datos PostgreSQL establecida correctamente.")
-        return engine
-    except SQLAlchemyError as e:
-        logging.error(f"Error al crear el motor de base de datos: {e}")
+        with conexion.cursor() as cursor:
+            return comprobar_planes(cursor, table_name)
+    except Exception as e:
+        logging.warning(f"No se pudieron comprobar los planes de la tabla '{table_name}': {e}")
         return None
+    finally:
+        conexion.close()
+
+def ajustar_a_tabla(df, tipos):
+    """
+    Adapta un bloque a los tipos de la tabla a la que se añade: un entero que en este bloque
+    llega como float (porque tiene nulos) se escribe sin decimales para que COPY lo acepte.
+    """
+    enteras = [c for c in df.columns
+               if tipos.get(str(c)) in ('smallint', 'integer', 'bigint') and pd.api.types.is_float_dtype(df[c].dtype)]
+    return df.astype({c: 'Int64' for c in enteras}) if enteras else df
+
+def copiar_dataframe(cursor, df, table_name, filas_por_bloque=FILAS_POR_BLOQUE_COPY):
+    """
+    Copia un DataFrame a una tabla existente con COPY FROM STDIN. Cada bloque se serializa
+    a CSV en un buffer en memoria, de modo que nunca se materializa el DataFrame entero como texto.
+    """
+    copy = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL {})").format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(sql.Identifier(str(col)) for col in df.columns),
+        sql.Literal(NULO_COPY),
+    ).as_string(cursor)
+    for inicio in range(0, len(df), filas_por_bloque):
+        buffer = io.StringIO()
+        df.iloc[inicio:inicio + filas_por_bloque].to_csv(buffer, header=False, index=False, na_rep=NULO_COPY)
+        registrar_bytes(escritos=buffer.tell())
+        buffer.seek(0)
+        cursor.copy_expert(copy, buffer)
+
+def cargar_con_copy(df, table_name, if_exists='replace'):
+    """
+    Carga un DataFrame con COPY. Con 'replace' los datos se copian a una tabla de staging que
+    sustituye a la original en la misma transacción (DROP + RENAME), así que los lectores nunca
+    ven una tabla a medio cargar; la staging se particiona según PARTICIONES y sus índices se
+    crean después del COPY. Con 'append' se copian directamente a la tabla existente.
+    En ambos casos se actualizan las estadísticas con ANALYZE.
+    """
+    if if_exists not in ('replace', 'append'):
+        raise ValueError(f"Modo de carga no soportado con COPY: {if_exists}")
+
+    conexion = obtener_conexion()
+    if conexion is None:
+        raise SQLAlchemyError("No se pudo obtener una conexión del pool.")
+    try:
+        with conexion.cursor() as cursor:
+            if if_exists == 'append':
+                tipos = tipos_tabla(cursor, table_name)
+                if not tipos:
+                    cursor.execute(sql_crear_tabla(df, table_name))
+                copiar_dataframe(cursor, ajustar_a_tabla(df, tipos), table_name)
+                crear_indices(cursor, table_name, indices_tabla(table_name, df.columns))
+            else:
+                staging = table_name + SUFIJO_STAGING
+                particion = PARTICIONES.get(table_name)
+                if particion and particion['columna'] not in df.columns:
+                    particion = None
+                cursor.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(staging)))
+                cursor.execute(sql_crear_tabla(df, staging, particion=particion))
+                if particion:
+                    crear_particiones(cursor, staging, df, particion)
+                copiar_dataframe(cursor, df, staging)
+                crear_indices(cursor, staging, indices_tabla(table_name, df.columns))
+                cursor.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(table_name)))
+                cursor.execute(sql.SQL('ALTER TABLE {} RENAME TO {}').format(sql.Identifier(staging), sql.Identifier(table_name)))
+                renombrar_indices(cursor, staging, table_name)
+                if particion:
+                    renombrar_particiones(cursor, staging, table_name)
+            analizar(cursor, table_name)
+        conexion.commit()
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        conexion.close()
+
+def preparar_merge(df, table_name, clave):
+    """
+    Prepara un DataFrame para la carga incremental: descarta filas sin clave, deja una sola fila
+    por clave (la última) y añade el hash del contenido con el que se detectan los cambios.
+    """
+    faltantes = [c for c in clave if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas de la clave natural de '{table_name}': {faltantes}")
+
+    sin_clave = df[clave].isna().any(axis=1)
+    if sin_clave.any():
+        logging.warning(f"{int(sin_clave.sum())} filas sin clave natural completa no se cargarán en '{table_name}'.")
+        df = df[~sin_clave]
+    duplicadas = df.duplicated(clave, keep='last')
+    if duplicadas.any():
+        logging.warning(f"{int(duplicadas.sum())} filas con la clave natural repetida en '{table_name}'. Se conserva la última.")
+        df = df[~duplicadas]
+
+    # El hash se guarda como BIGINT: se reinterpretan los 64 bits sin signo como enteros con signo
+    hashes = pd.util.hash_pandas_object(df.drop(columns=[COLUMNA_HASH], errors='ignore'), index=False)
+    return df.assign(**{COLUMNA_HASH: hashes.to_numpy().view('int64')})
 
-def load_to_data_warehouse(df, table_name):
-    """Carga un DataFrame en el Data Warehouse en la tabla especificada."""
+def fusionar_sin_clave_unica(cursor, table_name, staging, columnas, clave):
+    """
+    Fusión para tablas particionadas, donde no puede haber un índice único sobre la clave natural
+    (tendría que incluir la columna de partición) y por tanto tampoco ON CONFLICT: primero se
+    actualizan las filas existentes cuyo hash ha cambiado y después se insertan las claves nuevas.
+
+    Retorna:
+        tuple: (filas insertadas, filas actualizadas).
+    """
+    destino, origen = sql.Identifier(table_name), sql.Identifier(staging)
+    misma_clave = sql.SQL(' AND ').join(sql.SQL('t.{0} = s.{0}').format(sql.Identifier(col)) for col in clave)
+    cursor.execute(sql.SQL(
+        "UPDATE {destino} AS t SET {asignaciones} FROM {staging} AS s "
+        "WHERE {misma_clave} AND t.{hash} IS DISTINCT FROM s.{hash}"
+    ).format(
+        destino=destino, staging=origen, misma_clave=misma_clave, hash=sql.Identifier(COLUMNA_HASH),
+        asignaciones=sql.SQL(', ').join(sql.SQL('{0} = s.{0}').format(sql.Identifier(str(col)))
+                                       for col in columnas if col not in clave),
+    ))
+    actualizadas = cursor.rowcount
+    lista = sql.SQL(', ').join(sql.Identifier(str(col)) for col in columnas)
+    cursor.execute(sql.SQL(
+        "INSERT INTO {destino} ({columnas}) SELECT {columnas} FROM {staging} AS s "
+        "WHERE NOT EXISTS (SELECT 1 FROM {destino} AS t WHERE {misma_clave})"
+    ).format(destino=destino, columnas=lista, staging=origen, misma_clave=misma_clave))
+    return cursor.rowcount, actualizadas
+
+def cargar_con_merge(df, table_name, clave):
+    """
+    Carga incremental: copia el DataFrame a una tabla temporal y lo fusiona con la tabla
+    destino con INSERT ... ON CONFLICT DO UPDATE (UPDATE + INSERT si está particionada),
+    actualizando solo las filas cuyo hash de contenido ha cambiado. Las claves que ya no están en
+    el DataFrame se conservan en la tabla. Retorna un diccionario con filas insertadas,
+    actualizadas y sin cambios.
+    """
+    df = preparar_merge(df, table_name, clave)
+    staging = table_name + SUFIJO_STAGING
+    columnas = sql.SQL(', ').join(sql.Identifier(str(col)) for col in df.columns)
+    actualizables = [str(col) for col in df.columns if col not in clave]
+
+    conexion = obtener_conexion()
+    if conexion is None:
+        raise SQLAlchemyError("No se pudo obtener una conexión del pool.")
+    try:
+        with conexion.cursor() as cursor:
+            tipos = tipos_tabla(cursor, table_name)
+            particion = PARTICIONES.get(table_name)
+            if particion and particion['columna'] not in df.columns:
+                particion = None
+            if not tipos and particion:
+                # La clave primaria tendría que incluir la columna de partición: la tabla particionada
+                # se crea sin ella y se fusiona con UPDATE + INSERT
+                cursor.execute(sql_crear_tabla(df, table_name, particion=particion))
+                crear_particiones(cursor, table_name, df, particion)
+                particionada = True
+            elif not tipos:
+                cursor.execute(sql_crear_tabla(df, table_name, clave=clave))
+                particionada = False
+            else:
+                # Tablas creadas por una carga completa: se les añade el hash y, si no están
+                # particionadas, la clave única
+                particionada = es_particionada(cursor, table_name)
+                cursor.execute(sql.SQL('ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} BIGINT').format(
+                    sql.Identifier(table_name), sql.Identifier(COLUMNA_HASH)))
+                if not particionada:
+                    cursor.execute(sql.SQL('CREATE UNIQUE INDEX IF NOT EXISTS {} ON {} ({})').format(
+                        sql.Identifier(f"{table_name}_clave_natural"), sql.Identifier(table_name),
+                        sql.SQL(', ').join(map(sql.Identifier, clave))))
+                tipos[COLUMNA_HASH] = 'bigint'
+
+            cursor.execute(sql_crear_tabla(df, staging, temporal=True))
+            copiar_dataframe(cursor, ajustar_a_tabla(df, tipos), staging)
+            if particionada:
+                crear_indices(cursor, table_name, [indice(clave)])
+                insertadas, actualizadas = fusionar_sin_clave_unica(cursor, table_name, staging, df.columns, clave)
+            else:
+                cursor.execute(sql.SQL(
+                    "INSERT INTO {destino} AS t ({columnas}) SELECT {columnas} FROM {staging} "
+                    "ON CONFLICT ({clave}) DO UPDATE SET {asignaciones} "
+                    "WHERE t.{hash} IS DISTINCT FROM EXCLUDED.{hash} "
+                    "RETURNING (xmax = 0)"
+                ).format(
+                    destino=sql.Identifier(table_name),
+                    columnas=columnas,
+                    staging=sql.Identifier(staging),
+                    clave=sql.SQL(', ').join(map(sql.Identifier, clave)),
+                    asignaciones=sql.SQL(', ').join(
+                        sql.SQL('{0} = EXCLUDED.{0}').format(sql.Identifier(col)) for col in actualizables),
+                    hash=sql.Identifier(COLUMNA_HASH),
+                ))
+                afectadas = [fila[0] for fila in cursor.fetchall()]
+                insertadas = sum(afectadas)
+                actualizadas = len(afectadas) - insertadas
+            crear_indices(cursor, table_name, indices_tabla(table_name, df.columns))
+            analizar(cursor, table_name)
+        conexion.commit()
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        conexion.close()
+
+    return {'insertadas': insertadas, 'actualizadas': actualizadas, 'sin_cambios': len(df) - insertadas - actualizadas}
+
+@instrumentar('carga_{table_name}')
+def load_to_data_warehouse(df, table_name, if_exists='replace', metodo='copy', clave=None):
+    """
+    Carga un DataFrame en el Data Warehouse en la tabla especificada.
+
+    'if_exists' sigue la semántica de DataFrame.to_sql; el modo por bloques usa 'replace' en el
+    primer bloque y 'append' en los siguientes. Con 'merge' la carga es incremental sobre la clave
+    natural de la tabla ('clave' o CLAVES_NATURALES). 'metodo' elige entre la carga masiva con COPY
+    (por defecto) y el INSERT de DataFrame.to_sql. Retorna True si la carga se completó.
+    """
     # Verificar que el DataFrame no esté vacío antes de cargar
     if df.empty:
         logging.warning(f"El DataFrame está vacío. No se cargará en la tabla {table_name}.")
-        return
-
-    # Crear motor de conexión
-    engine = create_db_engine()
-    if engine is None:
-        logging.error(f"Conexión a la base de datos fallida. No se cargará el DataFrame en la tabla {table_name}.")
-        return
+        return False
+    if metodo not in METODOS_CARGA:
+        logging.error(f"Método de carga no soportado: {metodo}. Opciones: {METODOS_CARGA}")
+        return False
 
     try:
         # Cargar los datos en la base de datos
-        df.to_sql(table_name, engine, if_exists='replace', index=False)
-        logging.info(f"Datos cargados correctamente en la tabla '{table_name}'.")
+        inicio = time.perf_counter()
+        if if_exists == 'merge':
+            clave = clave or CLAVES_NATURALES.get(table_name)
+            if not clave:
+                raise ValueError(f"La tabla '{table_name}' no tiene clave natural para la carga incremental.")
+            resumen = cargar_con_merge(df, table_name, clave)
+            duracion = time.perf_counter() - inicio
+            logging.info(
+                f"Carga incremental en la tabla '{table_name}': {resumen['insertadas']} insertadas, "
+                f"{resumen['actualizadas']} actualizadas y {resumen['sin_cambios']} sin cambios en "
+                f"{duracion:.2f} s ({len(df) / duracion if duracion else 0:.0f} filas/s)."
+            )
+            comprobar_indices(table_name)
+            return True
+        if metodo == 'copy' and if_exists in ('replace', 'append'):
+            cargar_con_copy(df, table_name, if_exists=if_exists)
+        else:
+            with conectar() as conexion:
+                df.to_sql(table_name, conexion, if_exists=if_exists, index=False)
+                conexion.commit()
+        duracion = time.perf_counter() - inicio
+        logging.info(
+            f"Datos cargados correctamente en la tabla '{table_name}' con {metodo}: {len(df)} filas en "
+            f"{duracion:.2f} s ({len(df) / duracion if duracion else 0:.0f} filas/s)."
+        )
+        if if_exists == 'replace':
+            comprobar_indices(table_name)
+        return True
     except ValueError as ve:
         logging.error(f"Error de valor al cargar datos en la tabla '{table_name}': {ve}")
     except SQLAlchemyError as sae:
         logging.error(f"Error de SQL al cargar datos en la tabla '{table_name}': {sae}")
     except Exception as e:
         logging.error(f"Error inesperado al cargar datos en la tabla '{table_name}': {e}")
-    finally:
-        # Cerrar la conexión
-        engine.dispose()
-        logging.info("Conexión a la base de datos cerrada.")
\ No newline at end of file
+    return False
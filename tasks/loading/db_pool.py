@@ -0,0 +1,131 @@
+# db_pool.py
+import logging
+import os
+import threading
+import time
+from config import db_config
+from config.db_config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import SQLAlchemyError
+
+# Tamaño del pool: config.db_config puede sobrescribir estos valores
+POOL_SIZE = getattr(db_config, 'DB_POOL_SIZE', 5)
+MAX_OVERFLOW = getattr(db_config, 'DB_MAX_OVERFLOW', 5)
+POOL_TIMEOUT = getattr(db_config, 'DB_POOL_TIMEOUT', 30)
+POOL_RECYCLE = getattr(db_config, 'DB_POOL_RECYCLE', 1800)
+
+def url_base_datos():
+    """URL de la base de datos: ETL_DB_URL si está definida (p. ej. en los benchmarks), si no config.db_config."""
+    return os.environ.get('ETL_DB_URL') or f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+_engine = None
+_lock = threading.Lock()
+_metricas = {'checkouts': 0, 'espera_total': 0.0, 'espera_maxima': 0.0, 'en_uso_maximo': 0, 'conexiones_nuevas': 0}
+
+def _registrar_eventos(engine):
+    @event.listens_for(engine, 'connect')
+    def al_conectar(conexion_dbapi, registro):
+        with _lock:
+            _metricas['conexiones_nuevas'] += 1
+
+    @event.listens_for(engine, 'checkout')
+    def al_prestar(conexion_dbapi, registro, proxy):
+        with _lock:
+            _metricas['en_uso_maximo'] = max(_metricas['en_uso_maximo'], engine.pool.checkedout())
+
+    @event.listens_for(engine, 'checkin')
+    def al_devolver(conexion_dbapi, registro):
+        # Las modelizaciones trabajan en autocommit; la conexión vuelve al pool en modo transaccional
+        if conexion_dbapi is not None and getattr(conexion_dbapi, 'autocommit', False):
+            conexion_dbapi.autocommit = False
+
+def obtener_engine():
+    """
+    Retorna el motor de SQLAlchemy compartido por todos los módulos de carga, creándolo la
+    primera vez. Usa un QueuePool con pre-ping, de modo que las conexiones se reutilizan entre
+    cargas y las caídas del servidor se detectan antes de entregar una conexión.
+    """
+    global _engine
+    with _lock:
+        if _engine is None:
+            try:
+                _engine = create_engine(
+                    url_base_datos(),
+                    pool_size=POOL_SIZE,
+                    max_overflow=MAX_OVERFLOW,
+                    pool_timeout=POOL_TIMEOUT,
+                    pool_recycle=POOL_RECYCLE,
+                    pool_pre_ping=True,
+                )
+                _registrar_eventos(_engine)
+                logging.info(f"Pool de conexiones a {_engine.dialect.name} creado (tamaño {POOL_SIZE}, desborde {MAX_OVERFLOW}).")
+            except SQLAlchemyError as e:
+                logging.error(f"Error al crear el motor de base de datos: {e}")
+                return None
+        return _engine
+
+def _medir_espera(inicio):
+    espera = time.perf_counter() - inicio
+    with _lock:
+        _metricas['checkouts'] += 1
+        _metricas['espera_total'] += espera
+        _metricas['espera_maxima'] = max(_metricas['espera_maxima'], espera)
+
+def obtener_conexion(autocommit=False):
+    """
+    Presta una conexión psycopg2 del pool. Al cerrarla (connection.close()) vuelve al pool.
+    Retorna None si no se pudo conectar.
+    """
+    engine = obtener_engine()
+    if engine is None:
+        return None
+    inicio = time.perf_counter()
+    try:
+        conexion = engine.raw_connection()
+    except Exception as error:
+        logging.error(f"Error al conectar a la base de datos: {error}")
+        return None
+    _medir_espera(inicio)
+    # El proxy del pool no reenvía las asignaciones de atributos: se fija en la conexión psycopg2
+    conexion.dbapi_connection.autocommit = autocommit
+    return conexion
+
+def conectar():
+    """Presta una conexión de SQLAlchemy del pool (para DataFrame.to_sql y read_sql)."""
+    engine = obtener_engine()
+    if engine is None:
+        raise SQLAlchemyError("No se pudo crear el motor de base de datos.")
+    inicio = time.perf_counter()
+    conexion = engine.connect()
+    _medir_espera(inicio)
+    return conexion
+
+def metricas_pool():
+    """Métricas del pool: préstamos, espera para obtener conexión y ocupación."""
+    with _lock:
+        metricas = dict(_metricas)
+    metricas['espera_media'] = metricas['espera_total'] / metricas['checkouts'] if metricas['checkouts'] else 0.0
+    if _engine is not None:
+        pool = _engine.pool
+        metricas.update({'tamano': pool.size(), 'en_uso': pool.checkedout(),
+                         'disponibles': pool.checkedin(), 'desborde': pool.overflow()})
+    return metricas
+
+def registrar_metricas_pool():
+    """Registra en el log las métricas del pool de conexiones."""
+    m = metricas_pool()
+    logging.info(
+        f"Pool de conexiones: {m['checkouts']} préstamos, {m['conexiones_nuevas']} conexiones abiertas, "
+        f"espera media {m['espera_media'] * 1000:.1f} ms (máxima {m['espera_maxima'] * 1000:.1f} ms), "
+        f"ocupación máxima {m['en_uso_maximo']}/{POOL_SIZE + MAX_OVERFLOW}."
+    )
+    return m
+
+def cerrar_pool():
+    """Cierra todas las conexiones del pool (al terminar el pipeline)."""
+    global _engine
+    with _lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+            logging.info("Pool de conexiones a la base de datos cerrado.")
@@ -1,24 +1,32 @@
 # dimensional_modeling.py
-import psycopg2
 import logging
-from config.db_config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME
+import time
+import numpy as np
+import pandas as pd
+from tasks.loading.data_loading import copiar_dataframe, comprobar_indices, tipos_tabla
+from tasks.loading.db_pool import obtener_conexion
+from tasks.loading.materialized_views import (eliminar_vistas_dependientes, create_materialized_views,
+                                              refresh_materialized_views)
+from tasks.loading.table_layout import crear_indices, eliminar_indices, analizar
+from tasks.pipeline.instrumentation import instrumentar
 
-def connect_db():
-    """Establecer conexión a la base de datos PostgreSQL."""
-    try:
-        connection = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            port=DB_PORT
-        )
-        connection.autocommit = True
-        logging.info("Conectado a la base de datos PostgreSQL.")
-        return connection
-    except Exception as error:
-        logging.error(f"Error al conectar a la base de datos: {error}")
-        return None
+COLUMNAS_HORARIO = ['hora_ini_LJ_es', 'hora_fin_LJ_es', 'hora_ini_LJ_ra', 'hora_fin_LJ_ra',
+                    'hora_ini_VS_es', 'hora_fin_VS_es', 'hora_ini_VS_ra', 'hora_fin_VS_ra']
+
+def ajustar_tipos(cursor, tabla, tipos):
+    """
+    Cambia el tipo de las columnas de 'tipos' (columna -> (data_type de information_schema, tipo SQL))
+    que aún tienen otro tipo. Solo en ese caso se eliminan antes las vistas materializadas que
+    dependen de la tabla; en una ejecución normal no se toca ninguna.
+    """
+    actuales = tipos_tabla(cursor, tabla.lower())
+    cambios = [(columna, tipo) for columna, (data_type, tipo) in tipos.items()
+               if columna in actuales and actuales[columna] != data_type]
+    if not cambios:
+        return
+    eliminar_vistas_dependientes(cursor, tabla)
+    cursor.execute(f"ALTER TABLE {tabla} " + ', '.join(f"ALTER COLUMN {columna} TYPE {tipo}" for columna, tipo in cambios) + ";")
+    logging.info(f"Tipos de {tabla} actualizados: {dict(cambios)}.")
 
 def create_dimUbicacion_table(cursor):
     """Crear tabla de Dimensión Ubicación."""
@@ -29,8 +37,8 @@ def create_dimUbicacion_table(cursor):
                 id_distrito_local_x INT,
                 id_barrio_local_x INT,
                 id_tipo_acceso_local_x INT,
-                desc_distrito_local_x INT,
-                desc_barrio_local_x INT,
+                desc_distrito_local_x VARCHAR(100),
+                desc_barrio_local_x VARCHAR(100),
                 cod_postal INT,
                 coordenada_x_local_x DECIMAL,
                 coordenada_y_local_x DECIMAL,
@@ -39,6 +47,11 @@ def create_dimUbicacion_table(cursor):
                 secuencial_local_PC_x INT
             );
         """)
+        # Tablas creadas con versiones anteriores, donde las descripciones se declararon INT
+        ajustar_tipos(cursor, 'dimUbicacion', {
+            'desc_distrito_local_x': ('character varying', 'VARCHAR(100)'),
+            'desc_barrio_local_x': ('character varying', 'VARCHAR(100)'),
+        })
         logging.info("Tabla dimUbicacion creada correctamente.")
     except Exception as error:
         logging.error(f"Error al crear la tabla dimUbicacion: {error}")
@@ -57,9 +70,16 @@ def create_dimTerraza_table(cursor):
                 Hora_Ini_VS_ES TIME,
                 Hora_Fin_VS_ES TIME,
                 Hora_Ini_VS_RA TIME,
-                Hora_Fin_VS_RA TIME
+                Hora_Fin_VS_RA TIME,
+                desc_periodo_terraza VARCHAR(45),
+                desc_situacion_terraza VARCHAR(45)
             );
         """)
+        cursor.execute("""
+            ALTER TABLE dimTerraza
+                ADD COLUMN IF NOT EXISTS desc_periodo_terraza VARCHAR(45),
+                ADD COLUMN IF NOT EXISTS desc_situacion_terraza VARCHAR(45);
+        """)
         logging.info("Tabla dimTerraza creada correctamente.")
     except Exception as error:
         logging.error(f"Error al crear la tabla dimTerraza: {error}")
@@ -75,9 +95,11 @@ def create_dimEdificio_table(cursor):
                 clase_vial_edificio_x VARCHAR(45),
                 desc_vial_edificio_x VARCHAR(75),
                 nom_edificio_x VARCHAR(55),
-                num_edificio_x VARCHAR(45)
+                num_edificio_x VARCHAR(45),
+                id_ndp_edificio INT
             );
         """)
+        cursor.execute("ALTER TABLE dimEdificio ADD COLUMN IF NOT EXISTS id_ndp_edificio INT;")
         logging.info("Tabla dimEdificio creada correctamente.")
     except Exception as error:
         logging.error(f"Error al crear la tabla dimEdificio: {error}")
@@ -132,7 +154,7 @@ def create_hechoLugar_table(cursor):
                 edificio_id INT,
                 fecha_id INT,
                 fecha DATE,
-                superficie_to INT,
+                superficie_to DECIMAL,
                 FOREIGN KEY (licencia_id) REFERENCES dimLicencia(id_licencia),
                 FOREIGN KEY (terraza_id) REFERENCES dimTerraza(id_Terraza),
                 FOREIGN KEY (edificio_id) REFERENCES dimEdificio(id_edificio),
@@ -140,13 +162,18 @@ def create_hechoLugar_table(cursor):
                 FOREIGN KEY (ubicacion_id) REFERENCES dimUbicacion(id_local)
             );
         """)
+        ajustar_tipos(cursor, 'hechoLugar', {'superficie_to': ('numeric', 'DECIMAL')})
         logging.info("Tabla hechoLugar creada correctamente.")
     except Exception as error:
         logging.error(f"Error al crear la tabla hechoLugar: {error}")
 
 def create_dimensional_tables():
-    """Función principal para crear todas las tablas dimensionales."""
-    connection = connect_db()
+    """
+    Función principal para crear todas las tablas dimensionales. Las vistas materializadas solo
+    se eliminan si el DDL cambia el tipo de una columna que usan (ver ajustar_tipos) y se crean
+    al final las que falten; las demás siguen disponibles y se refrescan tras la carga.
+    """
+    connection = obtener_conexion(autocommit=True)
     if connection is None:
         logging.error("No se pudo conectar a la base de datos. Abortando creación de tablas.")
         return
@@ -159,13 +186,184 @@ def create_dimensional_tables():
         create_dimLicencia_table(cursor)
         create_dimFecha_table(cursor)
         create_hechoLugar_table(cursor)
+        create_materialized_views(cursor)
     except Exception as error:
         logging.error(f"Error general en la creación de tablas dimensionales: {error}")
     finally:
         if connection:
             cursor.close()
             connection.close()
-            logging.info("Conexión cerrada con la base de datos PostgreSQL.")
+            logging.info("Conexión devuelta al pool.")
+
+def _filas_unicas(df, columnas):
+    """
+    Hash vectorizado de la clave natural de cada fila. Retorna los hashes y la máscara de la
+    primera aparición de cada clave, que es la fila que se conserva en la dimensión.
+    """
+    hashes = pd.util.hash_pandas_object(df[columnas], index=False).to_numpy()
+    return hashes, ~pd.Series(hashes).duplicated().to_numpy()
+
+def asignar_claves_sustitutas(df, columnas):
+    """
+    Asigna claves sustitutas consecutivas a los valores únicos de la clave natural 'columnas'.
+
+    Retorna:
+        tuple: (máscara de filas únicas, array con la clave sustituta de cada fila de df).
+    """
+    hashes, unicas = _filas_unicas(df, columnas)
+    busqueda = dict(zip(hashes[unicas], range(1, int(unicas.sum()) + 1)))
+    claves = pd.Series(hashes).map(busqueda).to_numpy()
+    return unicas, claves
+
+COLUMNAS_FECHA = ['fecha', 'anio', 'mes', 'trimestre', 'dia', 'semana', 'semana_del_anio', 'dia_de_mes']
+
+def atributos_fecha(dias):
+    """Atributos de calendario de un DatetimeIndex, con las columnas de las dimensiones fecha."""
+    return pd.DataFrame({
+        'fecha': dias.date,
+        'anio': dias.year,
+        'mes': dias.month,
+        'trimestre': dias.quarter,
+        'dia': dias.dayofweek + 1,  # 1 = lunes
+        'semana': (dias.day - 1) // 7 + 1,  # Semana del mes
+        'semana_del_anio': dias.isocalendar().week.to_numpy(),
+        'dia_de_mes': dias.day,
+    })
+
+def construir_dimFecha(fechas):
+    """Genera la dimensión fecha con un día por fila entre la primera y la última fecha."""
+    fechas = pd.to_datetime(fechas).dropna()
+    if fechas.empty:
+        return pd.DataFrame(columns=['id_fecha'] + COLUMNAS_FECHA)
+    dias = pd.date_range(fechas.min().normalize(), fechas.max().normalize(), freq='D')
+    df_fecha = atributos_fecha(dias)
+    df_fecha.insert(0, 'id_fecha', (dias.year * 10000 + dias.month * 100 + dias.day).astype('int32'))
+    return df_fecha
+
+def construir_modelo_estrella(df_joined):
+    """
+    Construye en memoria las tablas del modelo estrella a partir del JOIN de la Tarea 3.
+
+    Las dimensiones se deduplican por el hash de su clave natural; dimEdificio y dimLicencia
+    reciben claves sustitutas y hechoLugar las resuelve con diccionarios en memoria, sin
+    consultas por fila a la base de datos.
+
+    Retorna:
+        dict: tabla -> DataFrame, en el orden en que deben cargarse.
+    """
+    tablas = {}
+
+    _, unicas = _filas_unicas(df_joined, ['id_local'])
+    tablas['dimubicacion'] = pd.DataFrame({
+        'id_local': df_joined['id_local'].to_numpy()[unicas],
+        'id_distrito_local_x': df_joined['id_distrito_local_x'].to_numpy()[unicas],
+        'id_barrio_local_x': df_joined['id_barrio_local_x'].to_numpy()[unicas],
+        'id_tipo_acceso_local_x': df_joined['id_tipo_acceso_local_x'].to_numpy()[unicas],
+        'desc_distrito_local_x': df_joined['desc_distrito_local_x'].to_numpy()[unicas],
+        'desc_barrio_local_x': df_joined['desc_barrio_local_x'].to_numpy()[unicas],
+        'cod_postal': df_joined['Cod_Postal_x'].to_numpy()[unicas],
+        'coordenada_x_local_x': df_joined['coordenada_x_local_x'].to_numpy()[unicas],
+        'coordenada_y_local_x': df_joined['coordenada_y_local_x'].to_numpy()[unicas],
+        'desc_tipo_acceso_local_x': df_joined['desc_tipo_acceso_local_x'].to_numpy()[unicas],
+        'desc_situacion_local_x': df_joined['desc_situacion_local_x'].to_numpy()[unicas],
+        'secuencial_local_pc_x': df_joined['secuencial_local_PC_x'].to_numpy()[unicas],
+    })
+
+    _, unicas = _filas_unicas(df_joined, ['id_terraza'])
+    terrazas = df_joined.loc[unicas, ['id_terraza', 'rotulo_x'] + COLUMNAS_HORARIO
+                             + ['desc_periodo_terraza', 'desc_situacion_terraza']]
+    # El export no trae un nombre de terraza; el rótulo del local es lo más parecido
+    tablas['dimterraza'] = terrazas.rename(columns={'rotulo_x': 'nombre_terraza'}).rename(columns=str.lower)
+
+    # Terrazas y licencias traen los datos del edificio, así que tras el JOIN llevan sufijo (_x: terrazas)
+    unicas, edificio_id = asignar_claves_sustitutas(df_joined, ['id_ndp_edificio_x'])
+    tablas['dimedificio'] = pd.DataFrame({
+        'id_edificio': edificio_id[unicas],
+        'id_clase_ndp_edificio_x': df_joined['id_clase_ndp_edificio_x'].to_numpy()[unicas],
+        'id_vial_edificio_x': df_joined['id_vial_edificio_x'].to_numpy()[unicas],
+        'clase_vial_edificio_x': df_joined['clase_vial_edificio_x'].to_numpy()[unicas],
+        'desc_vial_edificio_x': df_joined['desc_vial_edificio_x'].to_numpy()[unicas],
+        'nom_edificio_x': df_joined['nom_edificio_x'].to_numpy()[unicas],
+        'num_edificio_x': df_joined['num_edificio_x'].to_numpy()[unicas],
+        'id_ndp_edificio': df_joined['id_ndp_edificio_x'].to_numpy()[unicas],
+    })
+
+    unicas, licencia_id = asignar_claves_sustitutas(df_joined, ['ref_licencia'])
+    tablas['dimlicencia'] = pd.DataFrame({
+        'id_licencia': licencia_id[unicas],
+        'id_tipo_licencia': df_joined['id_tipo_licencia'].to_numpy()[unicas],
+        'id_tipo_situacion_licencia': df_joined['id_tipo_situacion_licencia'].to_numpy()[unicas],
+        'desc_tipo_situacion_licencia': df_joined['desc_tipo_situacion_licencia'].to_numpy()[unicas],
+        'desc_tipo_licencia': df_joined['desc_tipo_licencia'].to_numpy()[unicas],
+        'fecha_dec_lic': df_joined['Fecha_Dec_Lic'].dt.date.to_numpy()[unicas],
+        'ref_licencia': df_joined['ref_licencia'].to_numpy()[unicas],
+    })
+
+    fechas = df_joined['Fecha_Dec_Lic']
+    tablas['dimfecha'] = construir_dimFecha(fechas)
+
+    fecha_id = (fechas.dt.year * 10000 + fechas.dt.month * 100 + fechas.dt.day).astype('Int32')
+    tablas['hecholugar'] = pd.DataFrame({
+        'id_lugar': np.arange(1, len(df_joined) + 1),
+        'terraza_id': df_joined['id_terraza'].to_numpy(),
+        'licencia_id': licencia_id,
+        'ubicacion_id': df_joined['id_local'].to_numpy(),
+        'edificio_id': edificio_id,
+        'fecha_id': fecha_id.to_numpy(),
+        'fecha': fechas.dt.date.to_numpy(),
+        'superficie_to': df_joined['Superficie_ES'].to_numpy(),
+    })
+    return tablas
+
+@instrumentar('poblar_kimball')
+def populate_dimensional_tables(df_joined):
+    """
+    Puebla el modelo estrella a partir del JOIN de la Tarea 3. Vacía las tablas y las vuelve a
+    cargar con COPY en una sola transacción, así que las consultas nunca ven el modelo a medias.
+    Los índices de table_layout.INDICES se eliminan antes del COPY y se crean al final, y se
+    refrescan las vistas materializadas de VISTAS_MATERIALIZADAS.
+    Retorna True si la carga se completó.
+    """
+    if df_joined is None or df_joined.empty:
+        logging.warning("El JOIN de la Tarea 3 está vacío. No se puebla el modelo estrella.")
+        return None
+
+    inicio = time.perf_counter()
+    tablas = construir_modelo_estrella(df_joined)
+    logging.info(f"Modelo estrella construido en memoria en {time.perf_counter() - inicio:.2f} s.")
+
+    connection = obtener_conexion()
+    if connection is None:
+        logging.error("No se pudo conectar a la base de datos. Abortando carga del modelo estrella.")
+        return None
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {', '.join(reversed(list(tablas)))};")
+            for tabla in tablas:
+                eliminar_indices(cursor, tabla)
+            for tabla, df in tablas.items():
+                inicio = time.perf_counter()
+                copiar_dataframe(cursor, df, tabla)
+                duracion = time.perf_counter() - inicio
+                logging.info(f"Tabla {tabla} cargada: {len(df)} filas en {duracion:.2f} s ({len(df) / duracion if duracion else 0:.0f} filas/s).")
+            for tabla in tablas:
+                crear_indices(cursor, tabla)
+                analizar(cursor, tabla)
+        connection.commit()
+        logging.info("Modelo estrella poblado correctamente.")
+    except Exception as error:
+        connection.rollback()
+        logging.error(f"Error al poblar el modelo estrella: {error}")
+        return None
+    finally:
+        connection.close()
+        logging.info("Conexión devuelta al pool.")
+
+    if not refresh_materialized_views():
+        logging.warning("El modelo estrella se cargó, pero alguna vista materializada no se pudo refrescar.")
+    comprobar_indices('hecholugar')
+    return True
 
 # Ejecutar si se llama directamente
 if __name__ == "__main__":
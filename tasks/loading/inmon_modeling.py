@@ -1,24 +1,21 @@
 # inmon_modeling.py
-import psycopg2
 import logging
-from config.db_config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME
+import time
+import pandas as pd
+from psycopg2.extras import execute_values
+from tasks.loading.db_pool import obtener_conexion
+from tasks.loading.dimensional_modeling import atributos_fecha, COLUMNAS_HORARIO
+from tasks.loading.table_layout import crear_indices, eliminar_indices, analizar
+from tasks.pipeline.instrumentation import instrumentar
 
-def connect_db():
-    """Establecer conexión a la base de datos PostgreSQL."""
-    try:
-        connection = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            port=DB_PORT
-        )
-        connection.autocommit = True
-        logging.info("Conectado a la base de datos PostgreSQL.")
-        return connection
-    except Exception as error:
-        logging.error(f"Error al conectar a la base de datos: {error}")
-        return None
+# El modelo Inmon vive en su propio esquema: dimTerraza y dimEdificio también existen en el modelo Kimball
+ESQUEMA_INMON = 'inmon'
+
+# Tablas en orden de claves foráneas (las referenciadas primero)
+TABLAS_INMON = ['dimPeriodoTerraza', 'dimSituacionTerraza', 'dimComplementoTerraza', 'dimTerraza',
+                'dimTipoServicioTerraza', 'dimSituacionLicencia', 'dimTipoLicencia', 'dimFechaDecLic',
+                'hechoSeguimientoLicencia', 'dimDistrito', 'dimTipoVia', 'dimBarrio', 'dimEdificio',
+                'hechoUbicacion']
 
 def create_terraza_tables(cursor):
     """Crear tablas relacionadas con Terraza."""
@@ -153,13 +150,14 @@ def create_ubicacion_tables(cursor):
 
 def create_inmon_tables():
     """Función principal para crear todas las tablas Inmon."""
-    connection = connect_db()
+    connection = obtener_conexion(autocommit=True)
     if connection is None:
         logging.error("No se pudo conectar a la base de datos. Abortando creación de tablas.")
         return
 
     try:
         cursor = connection.cursor()
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {ESQUEMA_INMON}; SET search_path TO {ESQUEMA_INMON}, public;")
         create_terraza_tables(cursor)
         create_licencia_tables(cursor)
         create_ubicacion_tables(cursor)
@@ -167,9 +165,176 @@ def create_inmon_tables():
         logging.error(f"Error general en la creación de tablas Inmon: {error}")
     finally:
         if connection:
+            # La conexión vuelve al pool: se restaura el search_path para las demás cargas
+            cursor.execute("RESET search_path;")
             cursor.close()
             connection.close()
-            logging.info("Conexión cerrada con la base de datos PostgreSQL.")
+            logging.info("Conexión devuelta al pool.")
+
+def _valores(df):
+    """Filas de un DataFrame como tuplas de tipos de Python, con None en lugar de NaN."""
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+def insertar_con_ids(cursor, tabla, df, clave):
+    """
+    Inserta las filas de una tabla con id SERIAL en un único INSERT ... RETURNING y retorna el
+    diccionario clave -> id, con el que se resuelven las referencias sin una consulta por fila.
+
+    Parámetros:
+        tabla (str): tabla destino.
+        df (DataFrame): filas a insertar; sus columnas son las de la tabla.
+        clave (list): columnas que identifican cada fila (se devuelven en el RETURNING).
+    """
+    inicio = time.perf_counter()
+    df = df.drop_duplicates(clave)
+    filas = _valores(df)
+    if not filas:
+        return {}
+    consulta = f"INSERT INTO {tabla} ({', '.join(df.columns)}) VALUES %s RETURNING id, {', '.join(clave)}"
+    devueltas = execute_values(cursor, consulta, filas, page_size=len(filas), fetch=True)
+    ids = {(fila[1] if len(clave) == 1 else tuple(fila[1:])): fila[0] for fila in devueltas}
+    logging.info(f"Tabla {ESQUEMA_INMON}.{tabla} cargada: {len(filas)} filas en {time.perf_counter() - inicio:.2f} s.")
+    return ids
+
+def insertar_filas(cursor, tabla, df):
+    """Inserta las filas de una tabla de hechos (sin resolver ids) en lotes."""
+    inicio = time.perf_counter()
+    filas = _valores(df)
+    if filas:
+        execute_values(cursor, f"INSERT INTO {tabla} ({', '.join(df.columns)}) VALUES %s", filas, page_size=10000)
+    logging.info(f"Tabla {ESQUEMA_INMON}.{tabla} cargada: {len(filas)} filas en {time.perf_counter() - inicio:.2f} s.")
+
+def resolver_ids(df, columnas, ids):
+    """Traduce las columnas de clave de cada fila al id devuelto por insertar_con_ids."""
+    valores = df[columnas].astype(object).where(df[columnas].notna(), None)
+    if len(columnas) == 1:
+        return valores[columnas[0]].map(ids)
+    return pd.Series([ids.get(clave) for clave in valores.itertuples(index=False, name=None)], index=df.index)
+
+@instrumentar('poblar_inmon')
+def populate_inmon_tables(df_terrazas, df_licencias):
+    """
+    Puebla el modelo Inmon (3FN) a partir de las terrazas y licencias limpias de la Tarea 2.
+
+    Cada tabla de búsqueda se deriva de los DataFrames en una pasada y se inserta con un solo
+    INSERT ... RETURNING; las tablas que la referencian resuelven sus claves con el diccionario
+    devuelto. Todo se carga en una transacción; los índices de table_layout.INDICES se crean
+    al final, después de insertar las filas. Retorna True si la carga se completó.
+    """
+    if df_terrazas is None or df_terrazas.empty or df_licencias is None or df_licencias.empty:
+        logging.warning("Terrazas o licencias vacías. No se puebla el modelo Inmon.")
+        return None
+
+    connection = obtener_conexion()
+    if connection is None:
+        logging.error("No se pudo conectar a la base de datos. Abortando carga del modelo Inmon.")
+        return None
+
+    inicio = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL search_path TO {ESQUEMA_INMON}, public;")
+            cursor.execute(f"TRUNCATE {', '.join(TABLAS_INMON)} RESTART IDENTITY;")
+            tablas = [f"{ESQUEMA_INMON}.{tabla.lower()}" for tabla in TABLAS_INMON]
+            for tabla in tablas:
+                eliminar_indices(cursor, tabla)
+
+            # Terraza
+            periodos = insertar_con_ids(cursor, 'dimPeriodoTerraza', pd.DataFrame(
+                {'des_periodo_terraza': df_terrazas['desc_periodo_terraza'].dropna().astype(str).unique()}),
+                ['des_periodo_terraza'])
+            situaciones_terraza = insertar_con_ids(cursor, 'dimSituacionTerraza', pd.DataFrame(
+                {'desc_situacion_terraza': df_terrazas['desc_situacion_terraza'].dropna().astype(str).unique()}),
+                ['desc_situacion_terraza'])
+            # El complemento de una terraza son sus mesas auxiliares
+            complementos = pd.DataFrame({'complemento': 'mesas_aux', 'cantidad': df_terrazas['mesas_aux_es']})
+            complementos_ids = insertar_con_ids(cursor, 'dimComplementoTerraza',
+                                                complementos.dropna(), ['complemento', 'cantidad'])
+
+            terrazas = pd.DataFrame({
+                'nro_terraza': df_terrazas['id_terraza'],
+                'nombreTerraza': df_terrazas['rotulo'],
+                'periodo_terraza_id': df_terrazas['desc_periodo_terraza'].astype(object).map(periodos),
+                'situacion_terrza_id': df_terrazas['desc_situacion_terraza'].astype(object).map(situaciones_terraza),
+                'complemento_terraza_id': resolver_ids(complementos, ['complemento', 'cantidad'], complementos_ids),
+            })
+            terrazas_ids = insertar_con_ids(cursor, 'dimTerraza', terrazas, ['nro_terraza'])
+
+            # Un horario por terraza y tipo de servicio (lunes-jueves / viernes-sábado, estacional / resto del año);
+            # la relación 1:N se guarda en el hijo, así que dimTerraza.tipo_servicio_terraza queda vacío
+            servicios = []
+            for inicio_col, fin_col in zip(COLUMNAS_HORARIO[::2], COLUMNAS_HORARIO[1::2]):
+                servicios.append(pd.DataFrame({
+                    'tipo_servicio': inicio_col.replace('hora_ini_', ''),
+                    'hora_inicio': df_terrazas[inicio_col].astype(object),
+                    'hora_fin': df_terrazas[fin_col].astype(object),
+                    'terraza_id': df_terrazas['id_terraza'].map(terrazas_ids),
+                }).dropna(subset=['hora_inicio', 'hora_fin'], how='all'))
+            insertar_filas(cursor, 'dimTipoServicioTerraza', pd.concat(servicios, ignore_index=True))
+
+            # Licencia
+            situaciones_licencia = insertar_con_ids(cursor, 'dimSituacionLicencia', pd.DataFrame(
+                {'situacion': df_licencias['desc_tipo_situacion_licencia'].dropna().astype(str).unique()}),
+                ['situacion'])
+            tipos_licencia = insertar_con_ids(cursor, 'dimTipoLicencia', pd.DataFrame(
+                {'tipo': df_licencias['desc_tipo_licencia'].dropna().astype(str).unique()}), ['tipo'])
+            fechas = pd.DatetimeIndex(df_licencias['Fecha_Dec_Lic'].dropna().unique()).sort_values()
+            fechas_ids = insertar_con_ids(cursor, 'dimFechaDecLic', atributos_fecha(fechas), ['fecha'])
+
+            # Una licencia se relaciona con las terrazas de su local
+            seguimiento = df_licencias.merge(df_terrazas[['id_local', 'id_terraza']], on='id_local', how='left')
+            insertar_filas(cursor, 'hechoSeguimientoLicencia', pd.DataFrame({
+                'situacion_licencia_id': seguimiento['desc_tipo_situacion_licencia'].astype(object).map(situaciones_licencia),
+                'tipo_licencia_id': seguimiento['desc_tipo_licencia'].astype(object).map(tipos_licencia),
+                'terraza_id': seguimiento['id_terraza'].map(terrazas_ids),
+                'fechaDecLic_id': seguimiento['Fecha_Dec_Lic'].dt.date.map(fechas_ids),
+            }).astype('Int64'))
+
+            # Ubicación
+            locales = pd.concat([df[['desc_distrito_local', 'desc_barrio_local', 'clase_vial_edificio',
+                                     'desc_vial_edificio', 'num_edificio']].astype(object)
+                                 for df in (df_terrazas, df_licencias)], ignore_index=True)
+            distritos = insertar_con_ids(cursor, 'dimDistrito', pd.DataFrame(
+                {'distrito': locales['desc_distrito_local'].dropna().unique()}), ['distrito'])
+            tipos_via = insertar_con_ids(cursor, 'dimTipoVia', pd.DataFrame(
+                {'tipo': locales['clase_vial_edificio'].dropna().unique()}), ['tipo'])
+            barrios = pd.DataFrame({
+                'barrio': locales['desc_barrio_local'],
+                'dim_distrito_id': locales['desc_distrito_local'].map(distritos),
+            }).dropna(subset=['barrio'])
+            barrios_ids = insertar_con_ids(cursor, 'dimBarrio', barrios, ['barrio', 'dim_distrito_id'])
+
+            def edificios_de(df):
+                numero = pd.to_numeric(df['num_edificio'], errors='coerce').astype('Int64').astype(str)
+                return pd.DataFrame({
+                    'edificio': (df['desc_vial_edificio'].astype(str) + ' ' + numero).str.slice(0, 75),
+                    'dim_barrio_id': resolver_ids(pd.DataFrame({
+                        'barrio': df['desc_barrio_local'].astype(object),
+                        'dim_distrito_id': df['desc_distrito_local'].astype(object).map(distritos),
+                    }), ['barrio', 'dim_distrito_id'], barrios_ids),
+                    'dim_tipo_via_id': df['clase_vial_edificio'].astype(object).map(tipos_via),
+                })
+
+            clave_edificio = ['edificio', 'dim_barrio_id', 'dim_tipo_via_id']
+            edificios_ids = insertar_con_ids(cursor, 'dimEdificio', edificios_de(locales), clave_edificio)
+            insertar_filas(cursor, 'hechoUbicacion', pd.DataFrame({
+                'dim_edificio_id': resolver_ids(edificios_de(df_terrazas), clave_edificio, edificios_ids),
+                'dim_terraza_id': df_terrazas['id_terraza'].map(terrazas_ids),
+                'superficie_to': df_terrazas['Superficie_ES'].round(2),
+            }))
+            for tabla in tablas:
+                crear_indices(cursor, tabla)
+                analizar(cursor, tabla)
+        connection.commit()
+        logging.info(f"Modelo Inmon poblado correctamente en {time.perf_counter() - inicio:.2f} s.")
+        return True
+    except Exception as error:
+        connection.rollback()
+        logging.error(f"Error al poblar el modelo Inmon: {error}")
+        return None
+    finally:
+        connection.close()
+        logging.info("Conexión devuelta al pool.")
 
 # Ejecutar si se llama directamente
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+# materialized_views.py
+import logging
+import time
+from tasks.loading.db_pool import obtener_conexion
+from tasks.pipeline.instrumentation import instrumentar
+
+# Roll-ups precalculados sobre el modelo estrella. Las claves de agrupación nulas se sustituyen
+# por un valor fijo y el índice único cubre todo el GROUP BY, para que cada fila sea única en el
+# índice que exige REFRESH ... CONCURRENTLY. 'tablas' son las tablas de las que depende la vista.
+VISTAS_MATERIALIZADAS = {
+    'mv_terrazas_distrito_barrio_periodo': {
+        'definicion': """
+            SELECT COALESCE(u.id_distrito_local_x, -1) AS id_distrito,
+                   COALESCE(u.desc_distrito_local_x, 'SIN DISTRITO') AS desc_distrito,
+                   COALESCE(u.id_barrio_local_x, -1) AS id_barrio,
+                   COALESCE(u.desc_barrio_local_x, 'SIN BARRIO') AS desc_barrio,
+                   COALESCE(t.desc_periodo_terraza, 'SIN PERIODO') AS desc_periodo,
+                   COALESCE(t.desc_situacion_terraza, 'SIN SITUACION') AS desc_situacion,
+                   COUNT(*) AS num_hechos,
+                   COUNT(DISTINCT h.terraza_id) AS num_terrazas,
+                   COUNT(DISTINCT h.licencia_id) AS num_licencias,
+                   SUM(h.superficie_to) AS superficie_total,
+                   AVG(h.superficie_to) AS superficie_media
+            FROM hechoLugar h
+            JOIN dimUbicacion u ON u.id_local = h.ubicacion_id
+            JOIN dimTerraza t ON t.id_Terraza = h.terraza_id
+            GROUP BY 1, 2, 3, 4, 5, 6
+        """,
+        'clave': ['id_distrito', 'desc_distrito', 'id_barrio', 'desc_barrio', 'desc_periodo', 'desc_situacion'],
+        'indices': [['desc_distrito'], ['desc_barrio']],
+        'tablas': ['hecholugar', 'dimubicacion', 'dimterraza'],
+    },
+    'mv_terrazas_distrito_mes': {
+        'definicion': """
+            SELECT COALESCE(u.id_distrito_local_x, -1) AS id_distrito,
+                   COALESCE(u.desc_distrito_local_x, 'SIN DISTRITO') AS desc_distrito,
+                   COALESCE(f.anio, -1) AS anio,
+                   COALESCE(f.mes, -1) AS mes,
+                   COUNT(*) AS num_hechos,
+                   COUNT(DISTINCT h.licencia_id) AS num_licencias,
+                   SUM(h.superficie_to) AS superficie_total
+            FROM hechoLugar h
+            JOIN dimUbicacion u ON u.id_local = h.ubicacion_id
+            LEFT JOIN dimFecha f ON f.id_fecha = h.fecha_id
+            GROUP BY 1, 2, 3, 4
+        """,
+        'clave': ['id_distrito', 'desc_distrito', 'anio', 'mes'],
+        'indices': [['anio', 'mes']],
+        'tablas': ['hecholugar', 'dimubicacion', 'dimfecha'],
+    },
+}
+
+def eliminar_vistas_dependientes(cursor, tabla):
+    """
+    Elimina las vistas materializadas que dependen de 'tabla'. Solo se llama antes de cambiar el
+    tipo de una de sus columnas, que PostgreSQL no permite mientras una vista la use;
+    create_materialized_views las vuelve a crear al final del DDL.
+    """
+    for vista, spec in VISTAS_MATERIALIZADAS.items():
+        if tabla.lower() in spec['tablas']:
+            cursor.execute(f"DROP MATERIALIZED VIEW IF EXISTS {vista};")
+            logging.info(f"Vista materializada {vista} eliminada para cambiar el tipo de una columna de {tabla}.")
+
+def _crear_indice_unico(cursor, vista, clave):
+    """Crea el índice único de la vista, sustituyendo el de versiones anteriores si cubre otras columnas."""
+    nombre = f"{vista}_clave"
+    cursor.execute("SELECT indexdef FROM pg_indexes WHERE indexname = %s;", (nombre,))
+    fila = cursor.fetchone()
+    if fila and not fila[0].endswith(f"({', '.join(clave)})"):
+        cursor.execute(f"DROP INDEX {nombre};")
+    cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {nombre} ON {vista} ({', '.join(clave)});")
+
+def create_materialized_views(cursor):
+    """
+    Crea las vistas materializadas que no existen (pobladas con los datos actuales de las tablas)
+    y sus índices; las que ya existen se conservan y se refrescan tras la carga. Cada vista lleva
+    un índice único sobre su clave de agrupación, necesario para refrescarla con CONCURRENTLY
+    sin bloquear las consultas.
+    """
+    for vista, spec in VISTAS_MATERIALIZADAS.items():
+        try:
+            cursor.execute(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {vista} AS {spec['definicion']};")
+            _crear_indice_unico(cursor, vista, spec['clave'])
+            for columnas in spec['indices']:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {vista}_{'_'.join(columnas)} ON {vista} ({', '.join(columnas)});")
+            logging.info(f"Vista materializada {vista} creada correctamente.")
+        except Exception as error:
+            logging.error(f"Error al crear la vista materializada {vista}: {error}")
+
+@instrumentar('refrescar_vistas')
+def refresh_materialized_views(concurrente=True):
+    """
+    Refresca las vistas materializadas tras una carga del modelo estrella. Con concurrente=True
+    usa REFRESH MATERIALIZED VIEW CONCURRENTLY, de modo que las consultas de BI siguen leyendo la
+    versión anterior mientras se recalcula; una vista que aún no tiene datos se refresca de la
+    forma normal, que es la única que PostgreSQL admite en ese caso.
+    Retorna True si se refrescaron todas y False si alguna falló.
+    """
+    connection = obtener_conexion(autocommit=True)
+    if connection is None:
+        logging.error("No se pudo conectar a la base de datos. No se refrescan las vistas materializadas.")
+        return False
+
+    correcto = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT matviewname, ispopulated FROM pg_matviews WHERE matviewname = ANY(%s);",
+                           (list(VISTAS_MATERIALIZADAS),))
+            pobladas = dict(cursor.fetchall())
+            for vista in VISTAS_MATERIALIZADAS:
+                if vista not in pobladas:
+                    logging.warning(f"La vista materializada {vista} no existe. Ejecute create_dimensional_tables().")
+                    correcto = False
+                    continue
+                modo = 'CONCURRENTLY ' if concurrente and pobladas[vista] else ''
+                inicio = time.perf_counter()
+                try:
+                    cursor.execute(f"REFRESH MATERIALIZED VIEW {modo}{vista};")
+                    cursor.execute(f"ANALYZE {vista};")
+                    logging.info(f"Vista materializada {vista} refrescada {'en paralelo a las consultas ' if modo else ''}"
+                                 f"en {time.perf_counter() - inicio:.2f} s.")
+                except Exception as error:
+                    logging.error(f"Error al refrescar la vista materializada {vista}: {error}")
+                    correcto = False
+        return correcto
+    finally:
+        connection.close()
+        logging.info("Conexión devuelta al pool.")
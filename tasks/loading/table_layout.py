@@ -0,0 +1,204 @@
+# table_layout.py
+import json
+import logging
+import pandas as pd
+from psycopg2 import sql
+
+LONGITUD_MAXIMA_NOMBRE = 63  # Límite de PostgreSQL para identificadores
+TIPOS_ESCANEO_INDICE = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+
+def indice(columnas, unico=False):
+    """Declara un índice B-tree sobre 'columnas'."""
+    return {'columnas': list(columnas), 'unico': unico}
+
+def particion_mensual(columna):
+    """Declara un particionado por rangos de un mes sobre una columna de fecha."""
+    return {'columna': columna, 'intervalo': 'mes'}
+
+def comprobacion(columna, consulta):
+    """
+    Declara una consulta objetivo cuyo plan debe usar un índice o podar particiones. En la
+    consulta, {tabla} es la tabla y %s un valor real de 'columna' que se toma de la propia tabla.
+    """
+    return {'columna': columna, 'consulta': consulta}
+
+# Índices por tabla ('esquema.tabla' fuera de public). En las tablas de hechos se indexan las
+# columnas que referencian a las dimensiones, que PostgreSQL no indexa al declarar la FOREIGN KEY.
+INDICES = {
+    'licencias_terrazas_integradas': [indice(['id_local']), indice(['ref_licencia']),
+                                      indice(['id_distrito_local_x', 'id_barrio_local_x'])],
+    'licencias_concatenadas': [indice(['id_local']), indice(['ref_licencia']),
+                               indice(['id_distrito_local', 'id_barrio_local'])],
+    'superficies_agregadas': [indice(['id_barrio_local'])],
+    'hecholugar': [indice(['terraza_id']), indice(['licencia_id']), indice(['ubicacion_id']),
+                   indice(['edificio_id']), indice(['fecha_id'])],
+    'inmon.hechoubicacion': [indice(['dim_edificio_id']), indice(['dim_terraza_id'])],
+    'inmon.hechoseguimientolicencia': [indice(['situacion_licencia_id']), indice(['tipo_licencia_id']),
+                                       indice(['terraza_id']), indice(['fechadeclic_id'])],
+    'inmon.dimterraza': [indice(['periodo_terraza_id']), indice(['situacion_terrza_id']),
+                         indice(['complemento_terraza_id']), indice(['tipo_servicio_terraza'])],
+    'inmon.dimbarrio': [indice(['dim_distrito_id'])],
+    'inmon.dimedificio': [indice(['dim_barrio_id']), indice(['dim_tipo_via_id'])],
+}
+
+# Particionado de las tablas cargadas con load_to_data_warehouse en modo 'replace'
+PARTICIONES = {
+    'licencias_concatenadas': particion_mensual('Fecha_Dec_Lic'),
+}
+
+# Consultas objetivo que se comprueban con EXPLAIN tras cada carga
+COMPROBACIONES = {
+    'licencias_terrazas_integradas': [comprobacion('id_local', 'SELECT * FROM {tabla} WHERE "id_local" = %s')],
+    'licencias_concatenadas': [
+        comprobacion('id_local', 'SELECT * FROM {tabla} WHERE "id_local" = %s'),
+        comprobacion('Fecha_Dec_Lic', 'SELECT COUNT(*) FROM {tabla} WHERE "Fecha_Dec_Lic" >= date_trunc(\'month\', %s::timestamp) '
+                                      'AND "Fecha_Dec_Lic" < date_trunc(\'month\', %s::timestamp) + interval \'1 month\''),
+    ],
+    'hecholugar': [comprobacion('terraza_id', 'SELECT * FROM {tabla} WHERE terraza_id = %s')],
+}
+
+def _identificador(tabla):
+    return sql.Identifier(*tabla.split('.'))
+
+def nombre_indice(tabla, columnas):
+    """Nombre determinista del índice: ix_<tabla>_<columnas>, recortado a 63 caracteres."""
+    return f"ix_{tabla.split('.')[-1]}_{'_'.join(columnas)}".lower()[:LONGITUD_MAXIMA_NOMBRE]
+
+def indices_tabla(tabla, columnas=None):
+    """Índices declarados de una tabla, limitados a los que solo usan columnas de 'columnas'."""
+    indices = INDICES.get(tabla.lower(), [])
+    if columnas is None:
+        return indices
+    columnas = {str(c) for c in columnas}
+    return [spec for spec in indices if set(spec['columnas']) <= columnas]
+
+def crear_indices(cursor, tabla, indices=None):
+    """
+    Crea los índices declarados de una tabla (IF NOT EXISTS). Se llama después de la carga
+    masiva, de modo que cada índice se construye una sola vez en lugar de mantenerse fila a fila.
+    """
+    indices = INDICES.get(tabla.lower(), []) if indices is None else indices
+    for spec in indices:
+        cursor.execute(sql.SQL('CREATE {}INDEX IF NOT EXISTS {} ON {} ({})').format(
+            sql.SQL('UNIQUE ' if spec['unico'] else ''),
+            sql.Identifier(nombre_indice(tabla, spec['columnas'])),
+            _identificador(tabla),
+            sql.SQL(', ').join(map(sql.Identifier, spec['columnas'])),
+        ))
+    if indices:
+        logging.info(f"Índices de la tabla {tabla} creados: {len(indices)}.")
+    return len(indices)
+
+def eliminar_indices(cursor, tabla, indices=None):
+    """Elimina los índices declarados de una tabla antes de recargarla por completo."""
+    indices = INDICES.get(tabla.lower(), []) if indices is None else indices
+    esquema = tabla.split('.')[:-1]
+    for spec in indices:
+        cursor.execute(sql.SQL('DROP INDEX IF EXISTS {}').format(
+            sql.Identifier(*esquema, nombre_indice(tabla, spec['columnas']))))
+
+def renombrar_indices(cursor, origen, destino):
+    """Renombra los índices declarados de 'destino' creados sobre la tabla de staging 'origen'."""
+    for spec in INDICES.get(destino.lower(), []):
+        cursor.execute(sql.SQL('ALTER INDEX IF EXISTS {} RENAME TO {}').format(
+            sql.Identifier(nombre_indice(origen, spec['columnas'])),
+            sql.Identifier(nombre_indice(destino, spec['columnas']))))
+
+def meses_particion(fechas):
+    """Primer día de cada mes entre la fecha mínima y la máxima (vacío si no hay fechas)."""
+    fechas = pd.to_datetime(fechas, errors='coerce').dropna()
+    if fechas.empty:
+        return pd.DatetimeIndex([])
+    return pd.date_range(fechas.min().to_period('M').to_timestamp(), fechas.max().to_period('M').to_timestamp(), freq='MS')
+
+def sql_particionar(particion):
+    """Cláusula PARTITION BY que se añade al CREATE TABLE de una tabla particionada."""
+    return sql.SQL(' PARTITION BY RANGE ({})').format(sql.Identifier(particion['columna']))
+
+def crear_particiones(cursor, tabla, df, particion):
+    """
+    Crea una partición por mes con datos en df, más una partición DEFAULT para las filas con
+    fecha nula o fuera de rango (por ejemplo, meses nuevos en cargas posteriores en modo append).
+    """
+    meses = meses_particion(df[particion['columna']]) if particion['columna'] in df.columns else pd.DatetimeIndex([])
+    for mes in meses:
+        cursor.execute(sql.SQL('CREATE TABLE {} PARTITION OF {} FOR VALUES FROM ({}) TO ({})').format(
+            sql.Identifier(f"{tabla}_p{mes:%Y%m}"), sql.Identifier(tabla),
+            sql.Literal(f"{mes:%Y-%m-%d}"), sql.Literal(f"{mes + pd.offsets.MonthBegin(1):%Y-%m-%d}")))
+    cursor.execute(sql.SQL('CREATE TABLE {} PARTITION OF {} DEFAULT').format(
+        sql.Identifier(f"{tabla}_pdefault"), sql.Identifier(tabla)))
+    logging.info(f"Tabla {tabla} particionada por meses de '{particion['columna']}': {len(meses)} particiones.")
+
+def renombrar_particiones(cursor, origen, destino):
+    """
+    Renombra las particiones '<origen>_pNNNNNN' de la tabla ya renombrada a 'destino' y da a los
+    índices de cada partición el nombre ix_<partición>_<columnas>. PostgreSQL nombra esos índices
+    a partir de la staging (recortando el nombre a 63 caracteres); si lo conservaran, la siguiente
+    carga tendría que elegir otro nombre para los suyos.
+    """
+    destino_sql = sql.Identifier(destino).as_string(cursor)
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = %s::regclass",
+        (destino_sql,)
+    )
+    for (particion,) in cursor.fetchall():
+        if particion.startswith(f"{origen}_p"):
+            cursor.execute(sql.SQL('ALTER TABLE {} RENAME TO {}').format(
+                sql.Identifier(particion), sql.Identifier(destino + particion[len(origen):])))
+
+    # Índice de cada partición, partición a la que pertenece e índice de la tabla del que cuelga
+    cursor.execute(
+        "SELECT hijo.relname, particion.relname, padre.relname FROM pg_inherits i "
+        "JOIN pg_class hijo ON hijo.oid = i.inhrelid JOIN pg_class padre ON padre.oid = i.inhparent "
+        "JOIN pg_index xh ON xh.indexrelid = hijo.oid JOIN pg_class particion ON particion.oid = xh.indrelid "
+        "JOIN pg_index xp ON xp.indexrelid = padre.oid WHERE xp.indrelid = %s::regclass",
+        (destino_sql,)
+    )
+    prefijo = nombre_indice(destino, [])
+    for hijo, particion, padre in cursor.fetchall():
+        nombre = nombre_indice(particion, [padre[len(prefijo):]])
+        if padre.startswith(prefijo) and hijo != nombre:
+            cursor.execute(sql.SQL('ALTER INDEX {} RENAME TO {}').format(sql.Identifier(hijo), sql.Identifier(nombre)))
+
+def analizar(cursor, tabla):
+    """Actualiza las estadísticas del planificador tras la carga."""
+    cursor.execute(sql.SQL('ANALYZE {}').format(_identificador(tabla)))
+
+def nodos_plan(plan):
+    """Recorre los nodos de un plan de EXPLAIN (FORMAT JSON)."""
+    yield plan
+    for hijo in plan.get('Plans', []):
+        yield from nodos_plan(hijo)
+
+def comprobar_planes(cursor, tabla):
+    """
+    Ejecuta EXPLAIN sobre las consultas objetivo de la tabla y comprueba que usan un índice
+    o, en las tablas particionadas, que solo recorren una partición. Registra un aviso si alguna
+    consulta recorre la tabla entera; en tablas pequeñas el planificador puede preferirlo.
+
+    Retorna:
+        dict: consulta -> True si el plan usa los índices o poda particiones.
+    """
+    resultados = {}
+    for spec in COMPROBACIONES.get(tabla.lower(), []):
+        cursor.execute(sql.SQL('SELECT {} FROM {} WHERE {} IS NOT NULL LIMIT 1').format(
+            sql.Identifier(spec['columna']), _identificador(tabla), sql.Identifier(spec['columna'])))
+        fila = cursor.fetchone()
+        if fila is None:
+            continue
+        consulta = spec['consulta'].format(tabla=_identificador(tabla).as_string(cursor))
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + consulta, (fila[0],) * consulta.count('%s'))
+        plan = cursor.fetchone()[0]
+        plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]['Plan']
+        nodos = list(nodos_plan(plan))
+        con_indice = any(n['Node Type'] in TIPOS_ESCANEO_INDICE for n in nodos)
+        relaciones = {n['Relation Name'] for n in nodos if 'Relation Name' in n}
+        poda = tabla.lower() in PARTICIONES and len(relaciones) == 1 and tabla not in relaciones
+        resultados[spec['consulta']] = con_indice or poda
+        if con_indice or poda:
+            logging.info(f"Plan de '{consulta}': {'usa índice' if con_indice else 'recorre una sola partición'}.")
+        else:
+            logging.warning(f"Plan de '{consulta}' sin índice ni poda de particiones "
+                            f"({', '.join(sorted({n['Node Type'] for n in nodos}))}).")
+    return resultados
@@ -0,0 +1,295 @@
+# instrumentation.py
+import contextlib
+import contextvars
+import cProfile
+import functools
+import inspect
+import io
+import json
+import logging
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import pyinstrument
+except ImportError:  # Perfilador opcional: sin él se usa cProfile
+    pyinstrument = None
+
+INTERVALO_MUESTREO = 0.01  # Segundos entre lecturas del RSS mientras dura una etapa
+LINEAS_PERFIL = 25  # Funciones del perfil cProfile que se copian al log
+PERFILADORES = ('cprofile', 'pyinstrument')
+
+_config = {
+    'ruta_eventos': None,  # JSON por líneas con un evento por etapa (None: solo memoria y log)
+    'ruta_prometheus': None,  # Textfile para el textfile collector de node_exporter
+    'perfilar': set(),  # Etapas que se ejecutan bajo el perfilador
+    'perfilador': 'cprofile',
+    'directorio_perfiles': 'logs',
+}
+_lock = threading.Lock()
+_eventos = []
+# Mediciones abiertas en el contexto actual: una etapa puede llamar a otras instrumentadas y los
+# bytes leídos o escritos cuentan para todas. Los hilos de un pool no heredan el contexto.
+_abiertas = contextvars.ContextVar('mediciones_abiertas', default=())
+
+def configurar_instrumentacion(ruta_eventos=None, ruta_prometheus=None, perfilar=None, perfilador=None,
+                               directorio_perfiles=None):
+    """
+    Configura la instrumentación de etapas.
+
+    Parámetros:
+        ruta_eventos (str): archivo JSON por líneas al que se añade un evento por etapa.
+        ruta_prometheus (str): textfile de Prometheus que se reescribe con escribir_prometheus().
+        perfilar (list): nombres de las etapas que se perfilan.
+        perfilador (str): 'cprofile' (por defecto) o 'pyinstrument' (si está instalado).
+        directorio_perfiles (str): directorio donde se guardan los perfiles.
+    """
+    if ruta_eventos is not None:
+        _config['ruta_eventos'] = ruta_eventos
+    if ruta_prometheus is not None:
+        _config['ruta_prometheus'] = ruta_prometheus
+    if perfilar is not None:
+        _config['perfilar'] = set(perfilar)
+    if perfilador is not None:
+        if perfilador not in PERFILADORES:
+            raise ValueError(f"Perfilador no soportado: {perfilador}. Opciones: {PERFILADORES}")
+        if perfilador == 'pyinstrument' and pyinstrument is None:
+            logging.warning("pyinstrument no está instalado. Se perfila con cProfile.")
+            perfilador = 'cprofile'
+        _config['perfilador'] = perfilador
+    if directorio_perfiles is not None:
+        _config['directorio_perfiles'] = directorio_perfiles
+
+def rss_actual():
+    """RSS del proceso en bytes (/proc en Linux; en otros sistemas, el máximo histórico)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maximo if sys.platform == 'darwin' else maximo * 1024
+
+class MedidorMemoria:
+    """Muestrea el RSS en un hilo mientras dura el bloque 'with' y guarda el pico."""
+
+    def __init__(self):
+        self.pico = 0
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self):
+        while not self._parar.is_set():
+            self.pico = max(self.pico, rss_actual())
+            self._parar.wait(INTERVALO_MUESTREO)
+
+    def __enter__(self):
+        self.inicial = rss_actual()
+        self.pico = self.inicial
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._hilo.join()
+        self.pico = max(self.pico, rss_actual())
+
+def filas_de(valor):
+    """Filas de un DataFrame o de una tupla/lista de DataFrames (None si no hay ninguno)."""
+    if isinstance(valor, pd.DataFrame):
+        return len(valor)
+    if isinstance(valor, (tuple, list)):
+        dataframes = [v for v in valor if isinstance(v, pd.DataFrame)]
+        return sum(len(df) for df in dataframes) if dataframes else None
+    return None
+
+class Medicion:
+    """
+    Métricas de una ejecución de una etapa. Dentro de medir(), el código de la etapa puede
+    fijar 'filas_entrada' y 'filas_salida'; los bytes se suman con registrar_bytes().
+    """
+
+    def __init__(self, etapa):
+        self.etapa = etapa
+        self.filas_entrada = None
+        self.filas_salida = None
+        self.bytes_leidos = 0
+        self.bytes_escritos = 0
+        self.correcta = True
+
+def _perfilar(etapa):
+    """Perfilador de la etapa si se pidió perfilarla ('--perfilar'), o None."""
+    if etapa not in _config['perfilar']:
+        return None
+    if _config['perfilador'] == 'pyinstrument':
+        perfil = pyinstrument.Profiler()
+        perfil.start()
+        return perfil
+    perfil = cProfile.Profile()
+    try:
+        perfil.enable()
+    except ValueError as e:
+        # Solo puede haber un perfilador cProfile activo a la vez (etapas perfiladas en paralelo)
+        logging.warning(f"No se pudo perfilar la etapa '{etapa}': {e}")
+        return None
+    return perfil
+
+def _guardar_perfil(etapa, perfil):
+    os.makedirs(_config['directorio_perfiles'], exist_ok=True)
+    base = os.path.join(_config['directorio_perfiles'], f"perfil_{etapa}")
+    if _config['perfilador'] == 'pyinstrument':
+        perfil.stop()
+        with open(base + '.html', 'w', encoding='utf-8') as f:
+            f.write(perfil.output_html())
+        logging.info(f"Perfil de la etapa '{etapa}' guardado en '{base}.html'.")
+        return
+    perfil.disable()
+    perfil.dump_stats(base + '.prof')
+    resumen = io.StringIO()
+    pstats.Stats(perfil, stream=resumen).sort_stats('cumulative').print_stats(LINEAS_PERFIL)
+    logging.info(f"Perfil de la etapa '{etapa}' guardado en '{base}.prof' (snakeviz/pstats). Resumen:\n{resumen.getvalue()}")
+
+@contextlib.contextmanager
+def medir(etapa):
+    """
+    Mide una etapa: tiempo de reloj y de CPU, filas de entrada y salida, bytes leídos y escritos
+    y pico de memoria. Al terminar registra un evento estructurado (ver eventos()).
+
+    El tiempo de CPU es el del proceso, que incluye los hilos de otras etapas que se ejecuten a la
+    vez; 'cpu_hilo_segundos' es solo el del hilo de la etapa. El pico de RSS también es del proceso.
+    """
+    medicion = Medicion(etapa)
+    token = _abiertas.set(_abiertas.get() + (medicion,))
+    perfil = _perfilar(etapa)
+    marca = datetime.now()
+    inicio, cpu, cpu_hilo = time.perf_counter(), time.process_time(), time.thread_time()
+    memoria = MedidorMemoria()
+    memoria.__enter__()
+    try:
+        yield medicion
+    except BaseException:
+        medicion.correcta = False
+        raise
+    finally:
+        duracion = time.perf_counter() - inicio
+        memoria.__exit__()
+        _abiertas.reset(token)
+        if perfil is not None:
+            _guardar_perfil(etapa, perfil)
+        registrar_evento({
+            'evento': 'etapa', 'etapa': etapa, 'inicio': marca.isoformat(timespec='milliseconds'),
+            'correcta': medicion.correcta, 'segundos': round(duracion, 4),
+            'cpu_segundos': round(time.process_time() - cpu, 4),
+            'cpu_hilo_segundos': round(time.thread_time() - cpu_hilo, 4),
+            'filas_entrada': medicion.filas_entrada, 'filas_salida': medicion.filas_salida,
+            'bytes_leidos': medicion.bytes_leidos, 'bytes_escritos': medicion.bytes_escritos,
+            'rss_pico_bytes': memoria.pico, 'rss_incremento_bytes': memoria.pico - memoria.inicial,
+            'hilo': threading.current_thread().name, 'pid': os.getpid(),
+        })
+
+def instrumentar(etapa=None):
+    """
+    Decorador que mide cada llamada a la función con medir(). 'etapa' es el nombre del evento
+    (por defecto, el de la función) y puede usar los argumentos de la llamada, por ejemplo
+    'carga_{table_name}'. Las filas de entrada son las de los DataFrames recibidos y las de
+    salida las del resultado; un resultado None o False marca la etapa como no correcta.
+    """
+    def decorador(funcion):
+        firma = inspect.signature(funcion)
+        plantilla = etapa or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            nombre = plantilla
+            if '{' in plantilla:
+                argumentos = firma.bind_partial(*args, **kwargs)
+                nombre = plantilla.format(**argumentos.arguments)
+            with medir(nombre) as medicion:
+                medicion.filas_entrada = filas_de(list(args) + list(kwargs.values()))
+                resultado = funcion(*args, **kwargs)
+                medicion.filas_salida = filas_de(resultado)
+                medicion.correcta = resultado is not None and resultado is not False
+                return resultado
+        return envoltura
+    return decorador
+
+def registrar_bytes(leidos=0, escritos=0):
+    """Suma bytes leídos o escritos a las etapas que se están midiendo en este contexto."""
+    for medicion in _abiertas.get():
+        medicion.bytes_leidos += leidos
+        medicion.bytes_escritos += escritos
+
+def registrar_evento(evento):
+    """Guarda un evento en memoria, lo añade al archivo de eventos (si hay) y lo resume en el log."""
+    with _lock:
+        _eventos.append(evento)
+        if _config['ruta_eventos']:
+            directorio = os.path.dirname(_config['ruta_eventos'])
+            if directorio and not os.path.exists(directorio):
+                os.makedirs(directorio)
+            with open(_config['ruta_eventos'], 'a', encoding='utf-8') as f:
+                f.write(json.dumps(evento, ensure_ascii=False, default=str) + '\n')
+    if evento.get('evento') == 'etapa':
+        logging.info(
+            f"Métricas de '{evento['etapa']}': {evento['segundos']:.2f} s (CPU {evento['cpu_segundos']:.2f} s), "
+            f"filas {evento['filas_entrada']} -> {evento['filas_salida']}, "
+            f"{evento['bytes_leidos'] / 2 ** 20:.1f} MB leídos, {evento['bytes_escritos'] / 2 ** 20:.1f} MB escritos, "
+            f"pico RSS {evento['rss_pico_bytes'] / 2 ** 20:.0f} MB."
+        )
+
+def eventos(etapa=None):
+    """Eventos registrados en este proceso (opcionalmente, solo los de una etapa)."""
+    with _lock:
+        return [e for e in _eventos if etapa is None or e.get('etapa') == etapa]
+
+def reiniciar_eventos():
+    with _lock:
+        _eventos.clear()
+
+# Métricas de Prometheus por etapa: (nombre, campo del evento, ayuda)
+METRICAS_PROMETHEUS = [
+    ('etl_etapa_duracion_segundos', 'segundos', 'Tiempo de reloj de la última ejecución de la etapa.'),
+    ('etl_etapa_cpu_segundos', 'cpu_segundos', 'Tiempo de CPU del proceso durante la etapa.'),
+    ('etl_etapa_filas_entrada', 'filas_entrada', 'Filas recibidas por la etapa.'),
+    ('etl_etapa_filas_salida', 'filas_salida', 'Filas producidas por la etapa.'),
+    ('etl_etapa_bytes_leidos', 'bytes_leidos', 'Bytes leídos de archivos por la etapa.'),
+    ('etl_etapa_bytes_escritos', 'bytes_escritos', 'Bytes escritos por la etapa.'),
+    ('etl_etapa_rss_pico_bytes', 'rss_pico_bytes', 'Pico de memoria residente del proceso durante la etapa.'),
+    ('etl_etapa_correcta', 'correcta', '1 si la etapa terminó correctamente.'),
+]
+
+def escribir_prometheus(ruta=None):
+    """
+    Escribe la última ejecución de cada etapa en formato de exposición de Prometheus, para el
+    textfile collector de node_exporter. Se escribe en un archivo temporal que se renombra, de
+    modo que el collector nunca lee un archivo a medias. Retorna la ruta o None si no se configuró.
+    """
+    ruta = ruta or _config['ruta_prometheus']
+    if not ruta:
+        return None
+    ultimos = {}
+    for evento in eventos():
+        if evento.get('evento') == 'etapa':
+            ultimos[evento['etapa']] = evento
+    lineas = []
+    for nombre, campo, ayuda in METRICAS_PROMETHEUS:
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} gauge"]
+        for etapa, evento in sorted(ultimos.items()):
+            valor = evento.get(campo)
+            if valor is not None:
+                lineas.append(f'{nombre}{{etapa="{etapa}"}} {float(valor):g}')
+    directorio = os.path.dirname(ruta)
+    if directorio and not os.path.exists(directorio):
+        os.makedirs(directorio)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lineas) + '\n')
+    os.replace(temporal, ruta)
+    logging.info(f"Métricas de Prometheus escritas en '{ruta}'.")
+    return ruta
@@ -0,0 +1,173 @@
+# scheduler.py
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Contexto de los pools de procesos del pipeline. Las etapas se ejecutan en hilos, y hacer fork
+# desde un proceso con varios hilos puede copiar locks tomados por otro hilo (logging, pools de
+# conexiones); 'spawn' arranca cada trabajador desde cero.
+CONTEXTO_PROCESOS = multiprocessing.get_context('spawn')
+
+class ErrorEtapa(Exception):
+    """Error de validación de una etapa; su mensaje es el que se muestra al usuario."""
+
+class Etapa:
+    """
+    Nodo del grafo de etapas.
+
+    Parámetros:
+        nombre (str): identificador de la etapa.
+        funcion (callable): recibe, en orden, los resultados de sus dependencias.
+        dependencias (list): nombres de las etapas de las que depende.
+        descripcion (str): texto usado en los mensajes de log y de error.
+    """
+
+    def __init__(self, nombre, funcion, dependencias=(), descripcion=None):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.dependencias = list(dependencias)
+        self.descripcion = descripcion or nombre
+
+def _orden_topologico(etapas):
+    por_nombre = {e.nombre: e for e in etapas}
+    for etapa in etapas:
+        for dep in etapa.dependencias:
+            if dep not in por_nombre:
+                raise ValueError(f"La etapa '{etapa.nombre}' depende de '{dep}', que no está en el grafo.")
+    orden, visitadas, en_curso = [], set(), set()
+
+    def visitar(nombre):
+        if nombre in visitadas:
+            return
+        if nombre in en_curso:
+            raise ValueError(f"El grafo de etapas tiene un ciclo en '{nombre}'.")
+        en_curso.add(nombre)
+        for dep in por_nombre[nombre].dependencias:
+            visitar(dep)
+        en_curso.discard(nombre)
+        visitadas.add(nombre)
+        orden.append(nombre)
+
+    for etapa in etapas:
+        visitar(etapa.nombre)
+    return orden
+
+def ruta_critica(etapas, linea_temporal):
+    """
+    Calcula la ruta crítica de una ejecución: la cadena de dependencias con mayor duración
+    acumulada. Retorna (lista de etapas, duración total en segundos).
+    """
+    por_nombre = {e.nombre: e for e in etapas}
+    acumulado, previo = {}, {}
+    for nombre in _orden_topologico(etapas):
+        if nombre not in linea_temporal:
+            continue
+        deps = [d for d in por_nombre[nombre].dependencias if d in acumulado]
+        mejor = max(deps, key=lambda d: acumulado[d], default=None)
+        acumulado[nombre] = linea_temporal[nombre]['duracion'] + (acumulado[mejor] if mejor else 0.0)
+        previo[nombre] = mejor
+    if not acumulado:
+        return [], 0.0
+    final = max(acumulado, key=acumulado.get)
+    ruta, nombre = [], final
+    while nombre:
+        ruta.append(nombre)
+        nombre = previo[nombre]
+    return list(reversed(ruta)), acumulado[final]
+
+def _ejecutar_etapa(funcion, argumentos):
+    inicio = time.perf_counter()
+    resultado = funcion(*argumentos)
+    return resultado, inicio, time.perf_counter(), threading.current_thread().name
+
+def ejecutar_grafo(etapas, max_workers=4, ejecutor='thread', ruta_linea_temporal=None):
+    """
+    Ejecuta un grafo de etapas lanzando en paralelo las que tienen sus dependencias resueltas.
+
+    Si una etapa falla, se registra el error como en el pipeline secuencial, no se lanzan
+    etapas nuevas y se espera a que terminen las que ya estaban en curso.
+
+    Parámetros:
+        etapas (list): lista de Etapa.
+        max_workers (int): número máximo de etapas simultáneas.
+        ejecutor (str): 'thread' (por defecto) o 'process'; con procesos, las funciones y
+            sus resultados deben poder serializarse con pickle.
+        ruta_linea_temporal (str): si se indica, guarda la línea temporal en JSON.
+
+    Retorna:
+        tuple: (resultados por etapa, True si todas terminaron bien).
+    """
+    por_nombre = {e.nombre: e for e in etapas}
+    _orden_topologico(etapas)  # Valida dependencias y ciclos antes de empezar
+    pendientes = {e.nombre for e in etapas}
+    resultados, linea_temporal, en_curso = {}, {}, {}
+    fallo = False
+    if ejecutor == 'process':
+        pool_etapas = ProcessPoolExecutor(max_workers=max_workers, mp_context=CONTEXTO_PROCESOS)
+    else:
+        pool_etapas = ThreadPoolExecutor(max_workers=max_workers)
+    inicio_ejecucion = time.perf_counter()
+
+    with pool_etapas as pool:
+        while pendientes or en_curso:
+            if not fallo:
+                listas = [n for n in sorted(pendientes) if all(d in resultados for d in por_nombre[n].dependencias)]
+                for nombre in listas:
+                    etapa = por_nombre[nombre]
+                    argumentos = [resultados[d] for d in etapa.dependencias]
+                    logging.info(f"Iniciando etapa '{nombre}'.")
+                    en_curso[pool.submit(_ejecutar_etapa, etapa.funcion, argumentos)] = nombre
+                    pendientes.discard(nombre)
+            if not en_curso:
+                break
+
+            terminadas, _ = wait(list(en_curso), return_when=FIRST_COMPLETED)
+            for futuro in terminadas:
+                nombre = en_curso.pop(futuro)
+                descripcion = por_nombre[nombre].descripcion
+                try:
+                    resultado, inicio, fin, hilo = futuro.result()
+                except ErrorEtapa as e:
+                    logging.error(str(e))
+                    print(str(e))
+                    fallo = True
+                    continue
+                except Exception as e:
+                    logging.error(f"Error durante {descripcion}: {e}")
+                    print(f"Error durante {descripcion}: {e}")
+                    fallo = True
+                    continue
+                resultados[nombre] = resultado
+                linea_temporal[nombre] = {
+                    'inicio': round(inicio - inicio_ejecucion, 4),
+                    'fin': round(fin - inicio_ejecucion, 4),
+                    'duracion': round(fin - inicio, 4),
+                    'hilo': hilo,
+                }
+                logging.info(f"Etapa '{nombre}' completada en {fin - inicio:.2f} s.")
+
+    if pendientes:
+        logging.warning(f"Etapas no ejecutadas por un error previo: {sorted(pendientes)}.")
+    registrar_linea_temporal(etapas, linea_temporal, time.perf_counter() - inicio_ejecucion, ruta_linea_temporal)
+    return resultados, not fallo and not pendientes
+
+def registrar_linea_temporal(etapas, linea_temporal, duracion_total, ruta=None):
+    """Registra la línea temporal de la ejecución y su ruta crítica en el log (y opcionalmente en JSON)."""
+    ruta_etapas, duracion_critica = ruta_critica(etapas, linea_temporal)
+    logging.info(f"Línea temporal de la ejecución ({duracion_total:.2f} s en total):")
+    for nombre, t in sorted(linea_temporal.items(), key=lambda item: item[1]['inicio']):
+        marca = '*' if nombre in ruta_etapas else ' '
+        logging.info(f"  {marca} {nombre:<22} {t['inicio']:>8.2f} s -> {t['fin']:>8.2f} s ({t['duracion']:.2f} s, {t['hilo']})")
+    logging.info(f"Ruta crítica ({duracion_critica:.2f} s): {' -> '.join(ruta_etapas)}")
+
+    if ruta:
+        directorio = os.path.dirname(ruta)
+        if directorio and not os.path.exists(directorio):
+            os.makedirs(directorio)
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({'duracion_total': round(duracion_total, 4), 'etapas': linea_temporal,
+                       'ruta_critica': ruta_etapas, 'duracion_ruta_critica': round(duracion_critica, 4)}, f, indent=2)
@@ -0,0 +1,153 @@
+# stage_cache.py
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import pandas as pd
+
+DIRECTORIO_CACHE = os.path.join('cache', 'etapas')
+DIRECTORIO_CODIGO = 'tasks'
+TAMANO_LECTURA = 1024 * 1024
+
+def _hash_archivo(ruta):
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(TAMANO_LECTURA), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+def _hash_dataframe(df):
+    """Hash del contenido de un DataFrame: columnas, tipos, índice y valores."""
+    sha = hashlib.sha256()
+    sha.update(repr(list(df.columns)).encode())
+    sha.update(repr([str(t) for t in df.dtypes]).encode())
+    try:
+        valores = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    except TypeError:
+        # Columnas con listas u otros objetos no hasheables por pandas
+        valores = pd.util.hash_pandas_object(df.astype(str), index=True).to_numpy()
+    sha.update(valores.tobytes())
+    return sha.hexdigest()
+
+def version_codigo(directorio=DIRECTORIO_CODIGO):
+    """Hash de todo el código de las tareas: cualquier cambio invalida las etapas cacheadas."""
+    sha = hashlib.sha256()
+    for ruta in sorted(glob.glob(os.path.join(directorio, '**', '*.py'), recursive=True)):
+        sha.update(ruta.encode())
+        with open(ruta, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+class CacheEtapas:
+    """
+    Caché de resultados de etapas del pipeline, indexada por el hash de sus entradas
+    (DataFrames o archivos), sus parámetros y la versión del código.
+
+    Los resultados se guardan con pickle, que reproduce exactamente índice, tipos y columnas
+    object (listas, diccionarios); los formatos columnares del almacén intermedio no lo garantizan.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_CACHE, forzar=(), desactivada=False):
+        self.directorio = directorio
+        self.forzar = set(forzar or ())
+        self.desactivada = desactivada
+        self.codigo = version_codigo()
+        self._hashes_archivos = self._cargar_indice_archivos()
+
+    # Los hashes de archivos se memoizan por (tamaño, fecha de modificación) para no releer
+    # los exports grandes en cada ejecución cuando no han cambiado
+    def _ruta_indice_archivos(self):
+        return os.path.join(self.directorio, 'hashes_archivos.json')
+
+    def _cargar_indice_archivos(self):
+        try:
+            with open(self._ruta_indice_archivos(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _guardar_indice_archivos(self):
+        os.makedirs(self.directorio, exist_ok=True)
+        with open(self._ruta_indice_archivos(), 'w', encoding='utf-8') as f:
+            json.dump(self._hashes_archivos, f)
+
+    def hash_archivo(self, ruta):
+        if not os.path.exists(ruta):
+            return 'ausente'
+        estado = os.stat(ruta)
+        firma = f"{estado.st_size}:{estado.st_mtime_ns}"
+        memo = self._hashes_archivos.get(ruta)
+        if memo and memo['firma'] == firma:
+            return memo['hash']
+        valor = _hash_archivo(ruta)
+        self._hashes_archivos[ruta] = {'firma': firma, 'hash': valor}
+        self._guardar_indice_archivos()
+        return valor
+
+    def _hash_valor(self, valor):
+        if isinstance(valor, pd.DataFrame):
+            return _hash_dataframe(valor)
+        if valor is None:
+            return 'None'
+        return hashlib.sha256(repr(valor).encode()).hexdigest()
+
+    def huella(self, nombre, entradas=(), archivos=(), parametros=None):
+        """Hash que identifica una ejecución de la etapa 'nombre'."""
+        sha = hashlib.sha256()
+        sha.update(nombre.encode())
+        sha.update(self.codigo.encode())
+        for valor in entradas:
+            sha.update(self._hash_valor(valor).encode())
+        for ruta in archivos:
+            sha.update(ruta.encode())
+            sha.update(self.hash_archivo(ruta).encode())
+        sha.update(json.dumps(parametros or {}, sort_keys=True, default=str).encode())
+        return sha.hexdigest()
+
+    def _ruta_resultado(self, nombre, huella):
+        return os.path.join(self.directorio, nombre, f"{huella}.pkl")
+
+    def ejecutar(self, nombre, funcion, *entradas, archivos=(), parametros=None):
+        """
+        Ejecuta 'funcion(*entradas, **parametros)' o, si no ha cambiado nada desde la última
+        ejecución, retorna el resultado memoizado.
+
+        Parámetros:
+            nombre (str): nombre de la etapa (el que se usa en --forzar).
+            entradas: argumentos posicionales de la función; se hashean por contenido.
+            archivos (list): rutas de archivos que la etapa lee por su cuenta.
+            parametros (dict): argumentos con nombre de la función.
+        """
+        parametros = parametros or {}
+        if self.desactivada:
+            return funcion(*entradas, **parametros)
+
+        huella = self.huella(nombre, entradas, archivos, parametros)
+        ruta = self._ruta_resultado(nombre, huella)
+        if nombre not in self.forzar and os.path.exists(ruta):
+            try:
+                resultado = pd.read_pickle(ruta)
+                logging.info(f"Etapa '{nombre}' sin cambios (huella {huella[:12]}). Se reutiliza el resultado memoizado.")
+                return resultado
+            except Exception as e:
+                logging.warning(f"No se pudo leer el resultado memoizado de la etapa '{nombre}': {e}. Se recalcula.")
+
+        if nombre in self.forzar:
+            logging.info(f"Etapa '{nombre}' forzada a recalcularse.")
+        resultado = funcion(*entradas, **parametros)
+
+        if resultado is None or (isinstance(resultado, tuple) and all(r is None for r in resultado)):
+            logging.warning(f"La etapa '{nombre}' no produjo resultados. No se memoiza.")
+            return resultado
+
+        # Solo se conserva el último resultado de cada etapa
+        directorio_etapa = os.path.dirname(ruta)
+        if os.path.exists(directorio_etapa):
+            shutil.rmtree(directorio_etapa)
+        os.makedirs(directorio_etapa)
+        pd.to_pickle(resultado, ruta)
+        logging.info(f"Resultado de la etapa '{nombre}' memoizado (huella {huella[:12]}).")
+        return resultado
@@ -0,0 +1,179 @@
+# intermediate_store.py
+import glob
+import logging
+import os
+import shutil
+
+import pandas as pd
+
+from tasks.extraction.data_extraction import FuenteBloques
+from tasks.pipeline.instrumentation import registrar_bytes
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional: sin él se mantienen los checkpoints CSV/JSON
+    pa = feather = pq = None
+
+FORMATOS = ('parquet', 'feather', 'csv')
+EXTENSIONES = {'parquet': '.parquet', 'feather': '.feather', 'csv': '.csv', 'json': '.json'}
+COMPRESION = {'parquet': 'zstd', 'feather': 'lz4'}
+
+# Configuración del almacén; main_etl la ajusta con configurar_almacen()
+_config = {
+    'formato': os.environ.get('ETL_FORMATO_INTERMEDIO', 'parquet'),
+    'exportar_csv': os.environ.get('ETL_EXPORTAR_CSV', '0') == '1',
+    'directorio': 'datasets',
+}
+
+def configurar_almacen(formato=None, exportar_csv=None, directorio=None):
+    """
+    Configura el almacén de resultados intermedios.
+
+    Parámetros:
+        formato (str): 'parquet', 'feather' o 'csv' (checkpoints CSV/JSON de siempre).
+        exportar_csv (bool): además del formato columnar, exportar el CSV/JSON histórico.
+        directorio (str): directorio donde se guardan los resultados.
+    """
+    if formato is not None:
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato intermedio no soportado: {formato}. Opciones: {FORMATOS}")
+        _config['formato'] = formato
+    if exportar_csv is not None:
+        _config['exportar_csv'] = exportar_csv
+    if directorio is not None:
+        _config['directorio'] = directorio
+    if _config['formato'] != 'csv' and pa is None:
+        logging.warning("pyarrow no está instalado. El almacén intermedio usará CSV/JSON.")
+        _config['formato'] = 'csv'
+    logging.info(f"Almacén intermedio: formato '{_config['formato']}', exportación CSV {'activada' if _config['exportar_csv'] else 'desactivada'}.")
+
+def formato_actual():
+    return _config['formato'] if pa is not None else 'csv'
+
+def ruta_intermedio(nombre, formato=None, exportacion='csv'):
+    """Ruta del resultado 'nombre' en el formato indicado ('csv' usa la exportación histórica)."""
+    formato = formato or formato_actual()
+    extension = EXTENSIONES[exportacion] if formato == 'csv' else EXTENSIONES[formato]
+    return os.path.join(_config['directorio'], nombre + extension)
+
+def _asegurar_directorio(ruta):
+    directorio = os.path.dirname(ruta)
+    if directorio and not os.path.exists(directorio):
+        os.makedirs(directorio)
+        logging.info(f"Directorio '{directorio}' creado.")
+
+def _escribir(df, ruta, formato, exportacion):
+    if formato == 'parquet':
+        df.to_parquet(ruta, index=False, compression=COMPRESION['parquet'])
+    elif formato == 'feather':
+        df.reset_index(drop=True).to_feather(ruta, compression=COMPRESION['feather'])
+    elif exportacion == 'json':
+        df.to_json(ruta, orient='records', lines=True)
+    else:
+        df.to_csv(ruta, index=False)
+
+def _borrar_archivos(nombre):
+    """Borra las versiones en un solo archivo de 'nombre' (en cualquier formato)."""
+    for extension in set(EXTENSIONES.values()):
+        ruta = os.path.join(_config['directorio'], nombre + extension)
+        if os.path.isfile(ruta):
+            os.remove(ruta)
+
+def _borrar_bloques(nombre):
+    """Borra las partes de 'nombre' escritas por bloques, si las hay."""
+    directorio = os.path.join(_config['directorio'], nombre)
+    if os.path.isdir(directorio):
+        shutil.rmtree(directorio)
+
+def guardar_intermedio(df, nombre, exportacion='csv'):
+    """
+    Guarda un resultado intermedio en el formato configurado y, si está activada la
+    exportación, también en su formato histórico ('csv' o 'json' por líneas). Si el mismo
+    resultado estaba escrito por bloques, se borran sus partes para no leer datos antiguos.
+
+    Retorna:
+        str: ruta del archivo principal escrito.
+    """
+    formato = formato_actual()
+    ruta = ruta_intermedio(nombre, formato, exportacion)
+    _borrar_bloques(nombre)
+    _asegurar_directorio(ruta)
+    try:
+        _escribir(df, ruta, formato, exportacion)
+    except (ValueError, TypeError) as e:
+        # Columnas object con tipos mezclados que Arrow no puede tipar
+        logging.warning(f"No se pudo guardar '{nombre}' en formato {formato}: {e}. Se guarda en {exportacion.upper()}.")
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        formato = 'csv'
+        ruta = ruta_intermedio(nombre, formato, exportacion)
+        _escribir(df, ruta, formato, exportacion)
+
+    if _config['exportar_csv'] and formato != 'csv':
+        _escribir(df, ruta_intermedio(nombre, 'csv', exportacion), 'csv', exportacion)
+    registrar_bytes(escritos=os.path.getsize(ruta))
+    logging.info(f"Dataset {nombre} guardado en '{ruta}'.")
+    return ruta
+
+def leer_intermedio(nombre, columnas=None, exportacion='csv'):
+    """
+    Lee un resultado intermedio. Los formatos columnar se leen con memory-map, de modo que
+    solo se cargan las páginas de las columnas pedidas. Si el resultado se escribió por
+    bloques, se leen y concatenan sus partes.
+    """
+    for formato in (formato_actual(), 'parquet', 'feather', 'csv'):
+        ruta = ruta_intermedio(nombre, formato, exportacion)
+        if not os.path.exists(ruta):
+            continue
+        registrar_bytes(leidos=os.path.getsize(ruta))
+        if formato == 'parquet' and pq is not None:
+            return pq.read_table(ruta, columns=columnas, memory_map=True).to_pandas()
+        if formato == 'feather' and feather is not None:
+            return feather.read_table(ruta, columns=columnas, memory_map=True).to_pandas()
+        if formato == 'csv':
+            if exportacion == 'json':
+                return pd.read_json(ruta, lines=True)
+            return pd.read_csv(ruta, usecols=columnas, low_memory=False)
+    partes = partes_bloques_intermedios(nombre)
+    if partes:
+        return pd.concat([leer_intermedio(parte, columnas, exportacion_parte) for parte, exportacion_parte in partes],
+                         ignore_index=True)
+    raise FileNotFoundError(f"No existe el resultado intermedio '{nombre}' en '{_config['directorio']}'.")
+
+def iniciar_bloques_intermedios(nombre):
+    """
+    Prepara el directorio de un resultado escrito por bloques, borrando las partes anteriores
+    y la versión en un solo archivo del mismo resultado.
+    """
+    directorio = os.path.join(_config['directorio'], nombre)
+    _borrar_bloques(nombre)
+    _borrar_archivos(nombre)
+    os.makedirs(directorio)
+    return directorio
+
+def guardar_bloque_intermedio(df, nombre, indice, exportacion='csv'):
+    """Guarda un bloque como 'nombre/part-NNNNN' para los resultados escritos en streaming."""
+    return guardar_intermedio(df, os.path.join(nombre, f"part-{indice:05d}"), exportacion)
+
+def partes_bloques_intermedios(nombre):
+    """
+    Partes de un resultado escrito por bloques, en orden, como pares (parte, exportación).
+    Cada parte aparece una sola vez aunque también se haya exportado a CSV/JSON.
+    """
+    directorio = os.path.join(_config['directorio'], nombre)
+    partes = {}
+    for ruta in glob.glob(os.path.join(directorio, 'part-*')):
+        base, extension = os.path.splitext(os.path.basename(ruta))
+        if extension == '.json' or base not in partes:
+            partes[base] = 'json' if extension == '.json' else partes.get(base, 'csv')
+    return [(os.path.join(nombre, base), partes[base]) for base in sorted(partes)]
+
+def leer_bloques_intermedios(nombre):
+    """Retorna una fuente por bloques (una parte por bloque) de un resultado escrito en streaming."""
+    def generar():
+        for parte, exportacion in partes_bloques_intermedios(nombre):
+            yield leer_intermedio(parte, exportacion=exportacion)
+
+    return FuenteBloques(nombre, generar)
@@ -0,0 +1,160 @@
+# aggregation.py
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Parciales de cada función de agregación (combinables sumando, o con min/max) y cómo se combinan
+PARCIALES = {
+    'sum': {'sum': 'sum'},
+    'count': {'count': 'sum'},
+    'size': {'size': 'sum'},
+    'min': {'min': 'min'},
+    'max': {'max': 'max'},
+    'mean': {'sum': 'sum', 'count': 'sum'},
+}
+
+BLOQUES_POR_COMBINACION = 32  # Parciales acumulados en streaming antes de combinarlos
+
+def agregado(funcion, columna=None):
+    """
+    Declara un agregado de una especificación.
+
+    Parámetros:
+        funcion (str): 'sum', 'count', 'size' (filas del grupo), 'min', 'max' o 'mean'.
+        columna (str): columna de entrada (no se usa con 'size').
+    """
+    if funcion not in PARCIALES:
+        raise ValueError(f"Función de agregación no soportada: {funcion}. Opciones: {tuple(PARCIALES)}")
+    if funcion != 'size' and columna is None:
+        raise ValueError(f"La función '{funcion}' necesita una columna de entrada.")
+    return {'funcion': funcion, 'columna': columna}
+
+def especificacion(claves, agregados):
+    """
+    Declara una agregación: columnas de agrupación y agregados de salida ({nombre: agregado(...)}).
+    """
+    return {'claves': list(claves), 'agregados': dict(agregados)}
+
+# Agregaciones de la Tarea 3, por dataset de entrada. Todas las de un mismo dataset se calculan
+# en una sola pasada sobre sus datos.
+AGREGACIONES_TERRAZAS = {
+    'Superficies_Agregadas': especificacion(
+        ['id_barrio_local', 'desc_barrio_local'],
+        {'Superficie_ES': agregado('sum', 'Superficie_ES')},
+    ),
+    'Terrazas_Por_Distrito': especificacion(
+        ['id_distrito_local', 'desc_distrito_local'],
+        {
+            'Cantidad_Terrazas': agregado('size'),
+            'Mesas_ES': agregado('sum', 'mesas_es'),
+            'Sillas_ES': agregado('sum', 'sillas_es'),
+            'Superficie_Media': agregado('mean', 'Superficie_ES'),
+        },
+    ),
+}
+
+AGREGACIONES_LICENCIAS = {
+    'Licencias_Por_Distrito': especificacion(
+        ['id_distrito_local', 'desc_distrito_local'],
+        {'Cantidad_Licencias': agregado('size')},
+    ),
+}
+
+def _columna_parcial(nombre, parcial):
+    return f"{nombre}__{parcial}"
+
+def agregar_parcial(df, espec):
+    """
+    Agregado parcial de un bloque: un DataFrame indexado por las claves de agrupación con una
+    columna por parcial (suma, conteo, mínimo...), que se puede combinar con los de otros bloques.
+    """
+    grupos = df.groupby(espec['claves'], observed=True, sort=False)
+    columnas = {}
+    for nombre, a in espec['agregados'].items():
+        for parcial in PARCIALES[a['funcion']]:
+            if parcial == 'size':
+                columnas[_columna_parcial(nombre, parcial)] = grupos.size()
+            else:
+                columnas[_columna_parcial(nombre, parcial)] = getattr(grupos[a['columna']], parcial)()
+    return pd.DataFrame(columnas)
+
+def combinar_parciales(parciales, espec):
+    """Combina parciales de distintos bloques, particiones o archivos en uno solo."""
+    parciales = [p for p in parciales if p is not None]
+    if len(parciales) == 1:
+        return parciales[0]
+    funciones = {_columna_parcial(nombre, parcial): combinacion
+                 for nombre, a in espec['agregados'].items()
+                 for parcial, combinacion in PARCIALES[a['funcion']].items()}
+    unidos = pd.concat(parciales)
+    return unidos.groupby(level=list(range(unidos.index.nlevels)), observed=True, sort=False).agg(funciones)
+
+def finalizar(parcial, espec):
+    """Convierte un parcial en el resultado final: una columna por agregado, ordenado por las claves."""
+    resultado = pd.DataFrame(index=parcial.index)
+    for nombre, a in espec['agregados'].items():
+        funcion = a['funcion']
+        if funcion == 'mean':
+            suma = parcial[_columna_parcial(nombre, 'sum')]
+            conteo = parcial[_columna_parcial(nombre, 'count')]
+            resultado[nombre] = suma / conteo.where(conteo > 0)
+        else:
+            resultado[nombre] = parcial[_columna_parcial(nombre, funcion)]
+    return resultado.sort_index().reset_index()
+
+def resultado_vacio(espec):
+    """Resultado de una agregación sin filas de entrada: sin grupos, pero con sus columnas."""
+    return pd.DataFrame(columns=espec['claves'] + list(espec['agregados']))
+
+def agregar(df, especificaciones):
+    """Calcula varias agregaciones sobre un DataFrame. Retorna {nombre: DataFrame}."""
+    return {nombre: finalizar(agregar_parcial(df, espec), espec) for nombre, espec in especificaciones.items()}
+
+def agregar_por_bloques(fuente, especificaciones):
+    """
+    Calcula varias agregaciones en una sola pasada sobre una fuente por bloques: cada bloque
+    produce sus parciales, que se combinan cada BLOQUES_POR_COMBINACION bloques para que la
+    memoria dependa del número de grupos y no del de filas.
+
+    Retorna:
+        dict: {nombre: DataFrame} con los resultados finales (vacíos si la fuente no tiene bloques).
+    """
+    inicio = time.perf_counter()
+    acumulados = {nombre: [] for nombre in especificaciones}
+    bloques = 0
+    for bloque in fuente:
+        bloques += 1
+        for nombre, espec in especificaciones.items():
+            acumulados[nombre].append(agregar_parcial(bloque, espec))
+            if len(acumulados[nombre]) >= BLOQUES_POR_COMBINACION:
+                acumulados[nombre] = [combinar_parciales(acumulados[nombre], espec)]
+    resultados = {}
+    for nombre, espec in especificaciones.items():
+        if not acumulados[nombre]:
+            logging.warning(f"Agregación {nombre}: la fuente no tiene bloques. El resultado queda vacío.")
+            resultados[nombre] = resultado_vacio(espec)
+            continue
+        resultados[nombre] = finalizar(combinar_parciales(acumulados[nombre], espec), espec)
+    logging.info(f"Agregaciones {list(resultados)} calculadas sobre {bloques} bloques en {time.perf_counter() - inicio:.2f} s.")
+    return resultados
+
+def agregar_en_paralelo(fuentes, especificaciones, max_workers=4):
+    """
+    Calcula las mismas agregaciones sobre varias fuentes (por ejemplo, un archivo por mes) en un
+    pool de hilos y combina sus parciales. Cada fuente puede ser un DataFrame o una fuente por bloques.
+    """
+    def parciales_fuente(fuente):
+        bloques = [fuente] if isinstance(fuente, pd.DataFrame) else fuente
+        parciales = {nombre: [] for nombre in especificaciones}
+        for bloque in bloques:
+            for nombre, espec in especificaciones.items():
+                parciales[nombre] = [combinar_parciales(parciales[nombre] + [agregar_parcial(bloque, espec)], espec)]
+        return parciales
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        por_fuente = list(pool.map(parciales_fuente, fuentes))
+    return {nombre: finalizar(combinar_parciales([p for f in por_fuente for p in f[nombre]], espec), espec)
+            if any(f[nombre] for f in por_fuente) else resultado_vacio(espec)
+            for nombre, espec in especificaciones.items()}
@@ -3,6 +3,11 @@ import pandas as pd
 import numpy as np
 import logging
 import os
+from tasks.extraction.extended_json import detectar_columnas_anidadas, normalizar_ids
+from tasks.extraction.schemas import columnas_no_normalizables
+from tasks.pipeline.instrumentation import instrumentar
+from tasks.transformation.numeric_normalization import (RANGO_UMBRAL, EstadisticasWelford, ajustar_estadisticas,
+                                                        aplicar_normalizacion, registrar_normalizacion)
 
 # Función para eliminar registros con más del 50% de valores nulos
 def filter_null_records(df, dataset_name):
@@ -13,27 +18,41 @@ def filter_null_records(df, dataset_name):
     return df_filtrado
 
 # Función para normalizar columnas numéricas con un umbral
-def normalizacion_necesaria(col, rango_umbral=950):
-    return col.max() - col.min() > rango_umbral  # Solo normalizar si el rango es mayor al umbral
-
-def normalize_numeric_columns(df, dataset_name, rango_umbral=950):
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
-    df_normalized = df.copy()
-    for col in numeric_cols:
-        if normalizacion_necesaria(df[col], rango_umbral):  # Normalizar si el rango es mayor al umbral
-            if df[col].std() != 0:
-                df_normalized[col] = (df[col] - df[col].mean()) / df[col].std()
-                logging.info(f"Columna '{col}' normalizada en el dataset {dataset_name}.")
-            else:
-                logging.warning(f"Columna '{col}' tiene desviación estándar 0 en el dataset {dataset_name}. No se normaliza.")
-        else:
-            logging.info(f"Columna '{col}' no requiere normalización en el dataset {dataset_name}.")
-    return df_normalized
+def normalize_numeric_columns(df, dataset_name, rango_umbral=RANGO_UMBRAL, excluir=(), ruta_estadisticas=None,
+                              actualizar_estadisticas=False):
+    """
+    Normaliza (z-score) las columnas numéricas cuyo rango supera el umbral, salvo las de 'excluir'.
+
+    Cada columna numérica se resume en una sola pasada sobre su array, en su dtype nativo (n, media,
+    M2, mínimo y máximo, ver EstadisticasWelford), y la normalización se aplica sobre el propio
+    DataFrame. Con 'ruta_estadisticas' se persisten la media y la desviación ajustadas para
+    reutilizarlas (o actualizarlas de forma incremental) en ejecuciones posteriores.
+    """
+    estadisticas = ajustar_estadisticas(df, excluir, ruta_estadisticas, actualizar_estadisticas)
+    registrar_normalizacion(estadisticas, dataset_name, rango_umbral)
+    return aplicar_normalizacion(df, estadisticas, rango_umbral)
+
+def ruta_estadisticas(directorio, esquema):
+    """Archivo de las estadísticas de normalización persistidas de un dataset (None sin directorio)."""
+    return os.path.join(directorio, f"normalizacion_{esquema}.json") if directorio else None
+
+# Función para convertir diccionarios de las columnas a strings
+def convertir_diccionarios_a_texto(df, nombre):
+    """Convierte a texto las columnas con diccionarios, detectadas a partir de una muestra."""
+    for col in detectar_columnas_anidadas(df)['diccionario']:
+        df[col] = df[col].map(lambda x: str(x) if isinstance(x, dict) else x)
+        logging.info(f"Columna '{col}' en '{nombre}' convertida a string para evitar 'unhashable type: dict'.")
+    return df
 
 # Función para normalizar el campo _id en JSON
 def normalize_id_field(df):
-    if '_id' in df.columns:
-        df['_id'] = df['_id'].apply(lambda x: str(x['$oid']) if isinstance(x, dict) and '$oid' in x else str(x))
+    """Normaliza el campo _id a str. Con books.json ya leído por el decodificador no hay nada que hacer."""
+    if df is None:
+        logging.error("DataFrame es None, no se puede normalizar el campo _id.")
+        return None
+    if '_id' in df.columns and pd.api.types.infer_dtype(df['_id'], skipna=True) != 'string':
+        df['_id'] = normalizar_ids(df['_id'])
+        logging.info("Campo '_id' normalizado en el dataset.")
     return df
 
 # Función para crear la columna derivada
@@ -41,9 +60,15 @@ def add_derived_column(df, col1, col2, new_col_name):
     df[new_col_name] = df[col1] / df[col2].replace({0: np.nan})  # Evitar divisiones por cero
     return df
 
-def task1_process(df_terrazas, df_licencias_202104, df_locales, df_books):
+@instrumentar('tarea1')
+def task1_process(df_terrazas, df_licencias_202104, df_locales, df_books, directorio_estadisticas=None,
+                  actualizar_estadisticas=False):
     """
     Realiza la primera etapa de transformación de datos: normalización y limpieza.
+
+    Con 'directorio_estadisticas', cada dataset se normaliza con las estadísticas guardadas en
+    'normalizacion_<esquema>.json' de ese directorio (se ajustan y guardan si no existen); con
+    'actualizar_estadisticas', además se combinan con las de los datos actuales.
     """
     # Verificar que los DataFrames no sean None
     if df_terrazas is None:
@@ -59,28 +84,68 @@ def task1_process(df_terrazas, df_licencias_202104, df_locales, df_books):
     logging.info("Iniciando la limpieza y normalización de datos - Tarea 1")
     
     try:
-        # Convertir diccionarios en las columnas a strings para evitar errores
-        for df, nombre in zip([df_terrazas, df_licencias_202104, df_books], 
-                              ['Terrazas', 'Licencias 202104', 'Books']):
-            for col in df.columns:
-                if df[col].apply(lambda x: isinstance(x, dict)).any():
-                    df[col] = df[col].apply(lambda x: str(x) if isinstance(x, dict) else x)
-                    logging.info(f"Columna '{col}' en '{nombre}' convertida a string para evitar 'unhashable type: dict'.")
+        # Convertir diccionarios en las columnas a strings para evitar errores. Los CSV municipales
+        # no pueden contenerlos; books.json llega decodificado del JSON extendido
+        convertir_diccionarios_a_texto(df_books, 'Books')
 
         # Ejemplo de normalización
+        # Los identificadores y coordenadas declarados en el esquema no se normalizan
         df_terrazas = filter_null_records(df_terrazas, 'Terrazas')
-        df_terrazas_normalizadas = normalize_numeric_columns(df_terrazas, 'Terrazas')
+        df_terrazas_normalizadas = normalize_numeric_columns(
+            df_terrazas, 'Terrazas', excluir=columnas_no_normalizables(df_terrazas, 'terrazas'),
+            ruta_estadisticas=ruta_estadisticas(directorio_estadisticas, 'terrazas'),
+            actualizar_estadisticas=actualizar_estadisticas)
         
         df_licencias_202104 = filter_null_records(df_licencias_202104, 'Licencias 202104')
-        df_licencias_normalizadas = normalize_numeric_columns(df_licencias_202104, 'Licencias 202104')
+        df_licencias_normalizadas = normalize_numeric_columns(
+            df_licencias_202104, 'Licencias 202104', excluir=columnas_no_normalizables(df_licencias_202104, 'licencias'),
+            ruta_estadisticas=ruta_estadisticas(directorio_estadisticas, 'licencias'),
+            actualizar_estadisticas=actualizar_estadisticas)
         
         df_books = normalize_id_field(df_books)
         df_books = filter_null_records(df_books, 'Books')
-        df_books_normalizadas = normalize_numeric_columns(df_books, 'Books')
+        df_books_normalizadas = normalize_numeric_columns(
+            df_books, 'Books', excluir=columnas_no_normalizables(df_books, 'books'),
+            ruta_estadisticas=ruta_estadisticas(directorio_estadisticas, 'books'),
+            actualizar_estadisticas=actualizar_estadisticas)
         
         logging.info("Limpieza y normalización de datos completada para Tarea 1.")
         return df_terrazas_normalizadas, df_licencias_normalizadas, df_locales, df_books_normalizadas
     
     except Exception as e:
         logging.error(f"Error durante la transformación en Tarea 1: {e}")
-        return None, None, None, None
\ No newline at end of file
+        return None, None, None, None
+
+def task1_process_por_bloques(fuente_terrazas, fuente_licencias_202104, fuente_books):
+    """
+    Variante de la Tarea 1 para el modo streaming.
+
+    Hace una primera pasada para calcular las estadísticas globales de cada dataset y
+    retorna fuentes por bloques que filtran nulos y normalizan al recorrerse.
+    """
+    if fuente_terrazas is None or fuente_licencias_202104 is None or fuente_books is None:
+        logging.error("Una de las fuentes de entrada es None. Abortar Tarea 1.")
+        return None, None, None
+
+    logging.info("Iniciando la limpieza y normalización de datos por bloques - Tarea 1")
+    resultado = []
+    for fuente, nombre, esquema in zip([fuente_terrazas, fuente_licencias_202104, fuente_books],
+                                       ['Terrazas', 'Licencias 202104', 'Books'],
+                                       ['terrazas', 'licencias', 'books']):
+        def preparar(bloque, nombre=nombre):
+            if nombre == 'Books':
+                bloque = normalize_id_field(convertir_diccionarios_a_texto(bloque, nombre))
+            limite = len(bloque.columns) * 0.5
+            return bloque.dropna(thresh=limite)
+
+        fuente_preparada = fuente.mapear(preparar)
+        excluir = columnas_no_normalizables(next(iter(fuente_preparada)), esquema)
+        estadisticas = EstadisticasWelford()
+        for bloque in fuente_preparada:
+            estadisticas.actualizar(bloque, [c for c in bloque.select_dtypes(include=[np.number]).columns
+                                             if c not in excluir])
+        registrar_normalizacion(estadisticas, nombre)
+        resultado.append(fuente_preparada.mapear(lambda bloque, e=estadisticas: aplicar_normalizacion(bloque, e)))
+
+    logging.info("Limpieza y normalización por bloques preparada para Tarea 1.")
+    return tuple(resultado)
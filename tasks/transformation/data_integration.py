@@ -1,12 +1,36 @@
 # data_integration.py
+import os
+import pickle
+import tempfile
 import pandas as pd
 import logging
-import os
+from tasks.extraction.data_extraction import FuenteBloques
+from tasks.pipeline.instrumentation import instrumentar
+from tasks.storage.intermediate_store import guardar_intermedio, leer_intermedio
+from tasks.transformation.aggregation import (agregar, agregar_por_bloques, AGREGACIONES_TERRAZAS,
+                                              AGREGACIONES_LICENCIAS)
+from tasks.transformation.partitioned_join import unir_particionado, particiones_hash
+from tasks.transformation.spatial_index import agregados_por_celda, TAMANO_CELDA_AGREGADOS, RADIO_VECINOS
+
+# A partir de este número de filas (sumando ambos lados) el JOIN se particiona por hash y se
+# ejecuta en un pool de procesos; por debajo, el coste de lanzar los procesos no compensa
+FILAS_JOIN_PARTICIONADO = 500_000
+
+# Particiones en las que el JOIN por bloques reparte cada lado: cada una tiene en torno a 1/16
+# de las terrazas y de las licencias, que es lo que se une en memoria de una vez
+PARTICIONES_JOIN_BLOQUES = 16
 
 # Realizar un JOIN entre Terrazas y Licencias
-def join_terrazas_licencias(df_terrazas, df_licencias):
+def join_terrazas_licencias(df_terrazas, df_licencias, nombre_salida=None, umbral_particionado=FILAS_JOIN_PARTICIONADO):
     logging.info("Realizando JOIN entre Terrazas y Licencias en la columna 'id_local'.")
-    df_integrated = pd.merge(df_terrazas, df_licencias, on="id_local", how="inner")
+    if len(df_terrazas) + len(df_licencias) >= umbral_particionado:
+        # Mismo resultado que pd.merge. Con 'nombre_salida' cada partición se guarda como una parte
+        # de ese resultado y se retorna una fuente por bloques; unir_particionado ya registra las filas
+        df_integrated = unir_particionado(df_terrazas, df_licencias, "id_local", how="inner", nombre_salida=nombre_salida)
+        if nombre_salida:
+            return df_integrated
+    else:
+        df_integrated = pd.merge(df_terrazas, df_licencias, on="id_local", how="inner")
     
     if df_integrated.empty:
         logging.warning("JOIN resultó en un DataFrame vacío. Archivo no guardado.")
@@ -17,63 +41,183 @@ def join_terrazas_licencias(df_terrazas, df_licencias):
 # Agregar superficies por barrio
 def aggregate_surface_by_barrio(df):
     logging.info("Calculando superficies totales por barrio.")
-    df_aggregated = df.groupby(['id_barrio_local', 'desc_barrio_local'])['Superficie_ES'].sum().reset_index()
+    df_aggregated = agregar(df, {'Superficies_Agregadas': AGREGACIONES_TERRAZAS['Superficies_Agregadas']})['Superficies_Agregadas']
     logging.info("Superficie agregada por barrio calculada correctamente.")
     return df_aggregated
 
 # Contar licencias por distrito
 def count_licencias_by_distrito(df):
     logging.info("Contando licencias por distrito.")
-    df_count = df.groupby(['id_distrito_local', 'desc_distrito_local']).size().reset_index(name='Cantidad_Licencias')
+    df_count = agregar(df, AGREGACIONES_LICENCIAS)['Licencias_Por_Distrito']
     logging.info("Conteo de licencias por distrito completado.")
     return df_count
 
 # Filtrar terrazas con más de 70 m²
 def filter_large_terrazas(df, min_surface=70):
     logging.info(f"Filtrando terrazas con una superficie mayor a {min_surface} m².")
-    # Asegurarse de que la columna sea numérica
-    df['Superficie_ES'] = pd.to_numeric(df['Superficie_ES'], errors='coerce')
+    # El esquema de extracción ya la tipa como decimal; solo se convierte si llega como texto.
+    # No se modifica 'df', que otras partes de la Tarea 3 pueden estar leyendo en paralelo.
+    superficie = df['Superficie_ES']
+    if not pd.api.types.is_numeric_dtype(superficie):
+        superficie = pd.to_numeric(superficie, errors='coerce')
     
     # Aplicar el filtro solo después de convertir
-    df_large = df[df['Superficie_ES'] > min_surface]
+    mascara = superficie > min_surface
+    df_large = df[mascara].assign(Superficie_ES=superficie[mascara])
     
     if df_large.empty:
         logging.warning("No se encontraron terrazas con superficie mayor al umbral especificado.")
     return df_large
 
-def task3_process(df_terrazas, df_licencias):
-    logging.info("Iniciando proceso de integración de datos - Tarea 3")
-
+# Partes de la Tarea 3: cada una calcula y guarda su resultado y no depende de las demás,
+# de modo que el planificador de main_etl puede ejecutarlas en paralelo
+@instrumentar('tarea3_join')
+def task3_join(df_terrazas, df_licencias):
     # Parte a: Realizar JOIN entre terrazas normalizadas y licencias
+    if len(df_terrazas) + len(df_licencias) >= FILAS_JOIN_PARTICIONADO:
+        # El JOIN particionado guarda su salida por partes ('Licencias_Terrazas_Integradas/part-NNNNN')
+        # y retorna una fuente por bloques sobre ellas
+        return join_terrazas_licencias(df_terrazas, df_licencias, 'Licencias_Terrazas_Integradas')
     df_integrated = join_terrazas_licencias(df_terrazas, df_licencias)
-    
-    # Guardar el resultado del JOIN
-    output_dir = 'datasets'
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        logging.info(f"Directorio '{output_dir}' creado.")
-
     if not df_integrated.empty:
-        df_integrated.to_csv(os.path.join(output_dir, 'Licencias_Terrazas_Integradas.csv'), index=False)
-        logging.info("Dataset Licencias_Terrazas_Integradas guardado.")
-    
-    # Parte b: Agregar superficie por barrio
-    df_surface_barrio = aggregate_surface_by_barrio(df_terrazas)
-    df_surface_barrio.to_csv(os.path.join(output_dir, 'Superficies_Agregadas.csv'), index=False)
-    logging.info("Dataset Superficies_Agregadas guardado.")
-    
+        guardar_intermedio(df_integrated, 'Licencias_Terrazas_Integradas')
+    return df_integrated
+
+@instrumentar('tarea3_superficies')
+def task3_superficies(df_terrazas):
+    # Parte b: Agregar superficie por barrio, junto con el resto de agregados de terrazas
+    # (mesas, sillas y superficie media por distrito), todos en la misma pasada
+    logging.info(f"Calculando las agregaciones de terrazas: {list(AGREGACIONES_TERRAZAS)}.")
+    agregados = agregar(df_terrazas, AGREGACIONES_TERRAZAS)
+    for nombre, df_agregado in agregados.items():
+        guardar_intermedio(df_agregado, nombre)
+    return agregados['Superficies_Agregadas']
+
+@instrumentar('tarea3_distritos')
+def task3_licencias_distrito(df_licencias):
     # Parte c: Contar licencias por distrito
     df_licencias_distrito = count_licencias_by_distrito(df_licencias)
-    df_licencias_distrito.to_csv(os.path.join(output_dir, 'Licencias_Por_Distrito.csv'), index=False)
-    logging.info("Dataset Licencias_Por_Distrito guardado.")
+    guardar_intermedio(df_licencias_distrito, 'Licencias_Por_Distrito')
+    return df_licencias_distrito
 
+@instrumentar('tarea3_grandes')
+def task3_terrazas_grandes(df_terrazas):
     # Parte d: Filtrar terrazas grandes y agrupar por distrito y barrio
     df_large_terrazas = filter_large_terrazas(df_terrazas)
     if not df_large_terrazas.empty:
-        df_large_terrazas.to_csv(os.path.join(output_dir, 'Terrazas_Grandes.csv'), index=False)
-        logging.info("Dataset Terrazas_Grandes guardado.")
+        guardar_intermedio(df_large_terrazas, 'Terrazas_Grandes')
+    return df_large_terrazas
+
+@instrumentar('tarea3_rejilla')
+def task3_rejilla(df_terrazas):
+    # Parte e: Agregados de terrazas por celda de una rejilla UTM (densidad y vecinos a menos de 50 m)
+    logging.info(f"Calculando agregados de terrazas por celda de {TAMANO_CELDA_AGREGADOS:.0f} m "
+                 f"(vecinos a menos de {RADIO_VECINOS:.0f} m).")
+    df_celdas = agregados_por_celda(df_terrazas)
+    if not df_celdas.empty:
+        guardar_intermedio(df_celdas, 'Terrazas_Por_Celda')
+    logging.info(f"Agregados por celda calculados: {len(df_celdas)} celdas con terrazas.")
+    return df_celdas
+
+@instrumentar('tarea3')
+def task3_process(df_terrazas, df_licencias):
+    logging.info("Iniciando proceso de integración de datos - Tarea 3")
+
+    df_integrated = task3_join(df_terrazas, df_licencias)
+    if isinstance(df_integrated, FuenteBloques):
+        # task3_process retorna DataFrames: se leen las partes del JOIN particionado
+        df_integrated = leer_intermedio(df_integrated.nombre)
+    df_surface_barrio = task3_superficies(df_terrazas)
+    df_licencias_distrito = task3_licencias_distrito(df_licencias)
+    df_large_terrazas = task3_terrazas_grandes(df_terrazas)
+    task3_rejilla(df_terrazas)
 
     logging.info("Tarea 3 completada.")
     print("Tarea 3 completada y guardada en 'datasets'.")
     
     return df_integrated, df_surface_barrio, df_licencias_distrito, df_large_terrazas
+
+def volcar_particiones(fuente, directorio, clave, n_particiones):
+    """
+    Recorre 'fuente' una sola vez y añade cada bloque, repartido por el hash de 'clave', a un
+    archivo por partición en 'directorio' (un pickle por trozo, que conserva los dtypes de cada
+    bloque). particiones_hash hashea la clave como float64, de modo que la misma clave cae en la
+    misma partición aunque los esquemas la tipen con otro tamaño en cada bloque.
+
+    Retorna:
+        set: particiones que recibieron filas.
+    """
+    archivos = {}
+    try:
+        for bloque in fuente:
+            for particion, trozo in bloque.groupby(particiones_hash(bloque, [clave], n_particiones), sort=False):
+                if particion not in archivos:
+                    archivos[particion] = open(os.path.join(directorio, f"p{particion:05d}.pkl"), 'wb')
+                pickle.dump(trozo, archivos[particion], protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        for archivo in archivos.values():
+            archivo.close()
+    return {int(particion) for particion in archivos}
+
+def leer_particion(directorio, particion):
+    """Lee y concatena los trozos de una partición escrita por volcar_particiones."""
+    trozos = []
+    with open(os.path.join(directorio, f"p{particion:05d}.pkl"), 'rb') as archivo:
+        while True:
+            try:
+                trozos.append(pickle.load(archivo))
+            except EOFError:
+                break
+    return pd.concat(trozos, ignore_index=True)
+
+def join_terrazas_licencias_por_bloques(fuente_terrazas, fuente_licencias, n_particiones=PARTICIONES_JOIN_BLOQUES):
+    """
+    JOIN por bloques con particionado por hash (grace hash join): cada fuente se lee una sola vez
+    y se vuelca a disco repartida en 'n_particiones' por el hash de 'id_local'; después se une
+    cada partición de terrazas con la misma partición de licencias. Nunca se materializa ninguno
+    de los lados completo ni se releen las licencias por cada bloque de terrazas. El volcado va a
+    un directorio temporal (TMPDIR) que se borra al terminar.
+    """
+    def generar():
+        filas = 0
+        with tempfile.TemporaryDirectory(prefix='join_bloques_') as directorio:
+            for lado in ('licencias', 'terrazas'):
+                os.makedirs(os.path.join(directorio, lado))
+            particiones_licencias = volcar_particiones(fuente_licencias, os.path.join(directorio, 'licencias'),
+                                                       "id_local", n_particiones)
+            particiones_terrazas = volcar_particiones(fuente_terrazas, os.path.join(directorio, 'terrazas'),
+                                                      "id_local", n_particiones)
+            for particion in sorted(particiones_terrazas & particiones_licencias):
+                df_integrated = pd.merge(leer_particion(os.path.join(directorio, 'terrazas'), particion),
+                                         leer_particion(os.path.join(directorio, 'licencias'), particion),
+                                         on="id_local", how="inner")
+                if df_integrated.empty:
+                    continue
+                filas += len(df_integrated)
+                yield df_integrated
+        logging.info(f"JOIN por bloques completado en {n_particiones} particiones. Número de filas resultantes: {filas}.")
+
+    return FuenteBloques('Licencias_Terrazas_Integradas', generar)
+
+def task3_process_por_bloques(fuente_terrazas, fuente_licencias):
+    """
+    Variante de la Tarea 3 para el modo streaming.
+
+    Las agregaciones se calculan como parciales por bloque (una sola pasada por dataset para todas
+    las de AGREGACIONES_TERRAZAS y AGREGACIONES_LICENCIAS) y se combinan al final; el JOIN y el
+    filtro de terrazas grandes se retornan como fuentes por bloques para que el consumidor los
+    guarde y cargue sin materializarlos.
+    """
+    logging.info("Iniciando proceso de integración de datos por bloques - Tarea 3")
+
+    fuente_integrada = join_terrazas_licencias_por_bloques(fuente_terrazas, fuente_licencias)
+
+    agregados = {**agregar_por_bloques(fuente_terrazas, AGREGACIONES_TERRAZAS),
+                 **agregar_por_bloques(fuente_licencias, AGREGACIONES_LICENCIAS)}
+    for nombre, df_agregado in agregados.items():
+        guardar_intermedio(df_agregado, nombre)
+    df_surface_barrio = agregados['Superficies_Agregadas']
+    df_licencias_distrito = agregados['Licencias_Por_Distrito']
+
+    fuente_large_terrazas = fuente_terrazas.mapear(filter_large_terrazas, 'Terrazas_Grandes')
+    return fuente_integrada, df_surface_barrio, df_licencias_distrito, fuente_large_terrazas
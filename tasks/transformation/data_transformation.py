@@ -1,8 +1,12 @@
 # data_transformation.py
 import pandas as pd
-import os
+import numpy as np
 import logging
-from textblob import TextBlob
+from tasks.extraction.data_extraction import FuenteBloques
+from tasks.pipeline.instrumentation import instrumentar
+from tasks.storage.intermediate_store import guardar_intermedio
+from tasks.transformation.spell_correction import CorrectorOrtografico
+from tasks.transformation.text_normalization import normalizar_serie
 
 # Función para eliminar duplicados
 def quitar_duplicados(df, key_columns):
@@ -15,42 +19,56 @@ def quitar_duplicados(df, key_columns):
     logging.info(f"Se eliminaron {records_removed} registros duplicados de {key_columns}.")
     return df_limpio
 
-# Función para correcciones ortográficas (con limitación para grandes volúmenes)
-def correct_typographical_errors(text):
-    """Aplica corrección ortográfica a un texto dado si es de tipo str y de longitud manejable."""
-    if isinstance(text, str) and len(text) < 100:  # Corrección solo para textos menores a 100 caracteres
-        return str(TextBlob(text).correct())
-    return text
+# Eliminación de duplicados en modo streaming
+def quitar_duplicados_por_bloques(fuente, key_columns):
+    """
+    Elimina duplicados sobre una fuente por bloques. Se conserva un hash de 64 bits por clave
+    ya vista, de modo que la memoria crece con el número de claves y no con el de columnas.
+    """
+    if fuente is None:
+        logging.error("Fuente es None, no se pueden eliminar duplicados.")
+        return None
+
+    def generar():
+        vistos = set()
+        eliminados = 0
+        for bloque in fuente:
+            hashes = pd.util.hash_pandas_object(bloque[key_columns], index=False).to_numpy()
+            nuevos = ~pd.Series(hashes).duplicated().to_numpy()
+            nuevos &= np.fromiter((h not in vistos for h in hashes), dtype=bool, count=len(hashes))
+            vistos.update(hashes[nuevos].tolist())
+            eliminados += int((~nuevos).sum())
+            yield bloque[nuevos]
+        logging.info(f"Se eliminaron {eliminados} registros duplicados de {key_columns}.")
+
+    return FuenteBloques(fuente.nombre, generar)
 
 # Función para limpiar y normalizar cadenas de texto
-def clean_text_columns(df, text_columns):
-    """Limpia y normaliza columnas de texto en un DataFrame."""
+def clean_text_columns(df, text_columns, corrector=None, dtype='object'):
+    """
+    Limpia y normaliza columnas de texto en un DataFrame.
+
+    Minúsculas, relleno y espacios repetidos se resuelven en una sola pasada sobre los valores
+    únicos de cada columna (text_normalization). La corrección ortográfica se delega en un
+    CorrectorOrtografico, que también trabaja sobre los únicos y memoiza las correcciones por token.
+    'dtype' elige el tipo de salida: 'object', 'category' o 'string[pyarrow]'.
+    """
     if df is None:
         logging.error("DataFrame es None, no se pueden limpiar y normalizar columnas de texto.")
         return None
     logging.info("Limpieza y normalización de texto en columnas categóricas.")
+    if corrector is None:
+        corrector = CorrectorOrtografico()
     for col in text_columns:
         if col in df.columns:
-            df[col] = df[col].fillna('').apply(lambda x: ', '.join(x) if isinstance(x, list) else str(x))
-            df[col] = df[col].str.lower().str.strip().replace(r'\s+', ' ', regex=True)
-            df[col] = df[col].apply(correct_typographical_errors)
+            df[col] = corrector.corregir_serie(normalizar_serie(df[col]), col)
+            if dtype != 'object':
+                df[col] = normalizar_serie(df[col], minusculas=False, dtype=dtype)
         else:
             logging.warning(f"Columna {col} no encontrada en el DataFrame.")
     return df
 
-# Normalizar el campo _id en JSON
-def normalize_id_field(df):
-    """Normaliza el campo _id en un DataFrame JSON."""
-    if df is None:
-        logging.error("DataFrame es None, no se puede normalizar el campo _id.")
-        return None
-    if '_id' in df.columns:
-        df['_id'] = df['_id'].apply(lambda x: str(x['$oid']) if isinstance(x, dict) and '$oid' in x else str(x))
-        logging.info("Campo '_id' normalizado en el dataset.")
-    else:
-        logging.warning("El campo '_id' no está presente en el DataFrame.")
-    return df
-
+@instrumentar('tarea2')
 def task2_process(df_licencias, df_locales, df_terrazas, df_books):
     """Procesa la tarea de transformación: elimina duplicados y limpia columnas de texto."""
     logging.info("Iniciando proceso de transformación de datos - Tarea 2")
@@ -62,31 +80,44 @@ def task2_process(df_licencias, df_locales, df_terrazas, df_books):
 
     # Limpieza y corrección de texto en el dataset de libros
     text_columns = ['title', 'authors', 'categories']
-    df_books_limpio = clean_text_columns(df_books, text_columns)
-    
-    # Normalizar el campo _id en el dataset de libros
-    df_books_limpio = normalize_id_field(df_books_limpio)
-
-    # Guardar los datasets transformados en el directorio 'datasets'
-    output_dir = 'datasets'
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        logging.info(f"Directorio '{output_dir}' creado para almacenar resultados.")
-
-    # Guardar los archivos transformados
+    corrector = CorrectorOrtografico()
+    df_books_limpio = clean_text_columns(df_books, text_columns, corrector)
+    corrector.guardar()
+    logging.info(f"Tasa de aciertos de la caché de corrección ortográfica en Tarea 2: {corrector.tasa_aciertos:.1%}.")
+
+
+    # Guardar los datasets transformados en el almacén intermedio
     try:
         if df_licencias_limpio is not None:
-            df_licencias_limpio.to_csv(os.path.join(output_dir, 'Licencias_SinDuplicados.csv'), index=False)
+            guardar_intermedio(df_licencias_limpio, 'Licencias_SinDuplicados')
         if df_locales_limpio is not None:
-            df_locales_limpio.to_csv(os.path.join(output_dir, 'Locales_SinDuplicados.csv'), index=False)
+            guardar_intermedio(df_locales_limpio, 'Locales_SinDuplicados')
         if df_terrazas_limpio is not None:
-            df_terrazas_limpio.to_csv(os.path.join(output_dir, 'Terrazas_SinDuplicados.csv'), index=False)
+            guardar_intermedio(df_terrazas_limpio, 'Terrazas_SinDuplicados')
         if df_books_limpio is not None:
-            df_books_limpio.to_json(os.path.join(output_dir, 'Books_Limpio.json'), orient='records', lines=True)
+            guardar_intermedio(df_books_limpio, 'Books_Limpio', exportacion='json')
         
         logging.info("Tarea 2 completada: duplicados eliminados y textos limpiados.")
         print("Tarea 2 completada y guardada en 'datasets'.")
     except Exception as e:
         logging.error(f"Error al guardar archivos transformados: {e}")
 
-    return df_licencias_limpio, df_locales_limpio, df_terrazas_limpio, df_books_limpio
\ No newline at end of file
+    return df_licencias_limpio, df_locales_limpio, df_terrazas_limpio, df_books_limpio
+
+def task2_process_por_bloques(fuente_licencias, fuente_terrazas, fuente_books):
+    """Variante de la Tarea 2 para el modo streaming: retorna fuentes por bloques sin duplicados."""
+    logging.info("Iniciando proceso de transformación de datos por bloques - Tarea 2")
+    fuente_licencias_limpio = quitar_duplicados_por_bloques(fuente_licencias, ['id_local', 'ref_licencia'])
+    fuente_terrazas_limpio = quitar_duplicados_por_bloques(fuente_terrazas, ['id_terraza'])
+
+    text_columns = ['title', 'authors', 'categories']
+
+    def limpiar_books():
+        corrector = CorrectorOrtografico()
+        for bloque in fuente_books:
+            yield clean_text_columns(bloque, text_columns, corrector)
+        corrector.guardar()
+        logging.info(f"Tasa de aciertos de la caché de corrección ortográfica en Tarea 2: {corrector.tasa_aciertos:.1%}.")
+
+    fuente_books_limpio = FuenteBloques(fuente_books.nombre, limpiar_books)
+    return fuente_licencias_limpio, fuente_terrazas_limpio, fuente_books_limpio
@@ -0,0 +1,285 @@
+# near_duplicates.py
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from tasks.pipeline.instrumentation import instrumentar
+from tasks.storage.intermediate_store import guardar_intermedio
+from tasks.transformation.text_normalization import normalizar_serie
+
+COLUMNAS_BLOQUE = ['Cod_Postal', 'id_barrio_local']
+COLUMNAS_TEXTO = ['rotulo', 'nom_edificio', 'desc_vial_edificio']
+POLITICAS = ('marcar', 'canonico', 'eliminar')
+# Clave de cada fila en los datasets a los que se aplica la política: 'eliminar' solo quita las filas
+# que, ya con el id_local canónico, repiten esta clave (la misma licencia o terraza registrada dos veces)
+CLAVE_LICENCIAS = ['id_local', 'ref_licencia']
+CLAVE_TERRAZAS = ['id_terraza']
+PRIMO_MINHASH = (1 << 31) - 1  # Primo de Mersenne: con a, b < p y trigramas de 24 bits, a*h + b cabe en 64 bits
+
+def firmas_minhash(textos, num_permutaciones=32, semilla=0):
+    """
+    Firmas MinHash de trigramas de caracteres, calculadas en NumPy sin bucles por texto.
+
+    Todos los textos se concatenan en un único buffer de bytes; cada trigrama se codifica en un
+    entero de 24 bits y, para cada permutación (a*h + b) mod p, el mínimo de cada texto se obtiene
+    con np.minimum.reduceat sobre sus trigramas. Los textos de menos de 3 bytes se rellenan con espacios.
+
+    Retorna:
+        np.ndarray: matriz (textos, num_permutaciones) de uint32.
+    """
+    codificados = [t.encode('utf-8').ljust(3) for t in textos]
+    longitudes = np.fromiter((len(t) for t in codificados), dtype=np.int64, count=len(codificados))
+    if len(codificados) == 0:
+        return np.empty((0, num_permutaciones), dtype=np.uint32)
+    buffer = np.frombuffer(b''.join(codificados), dtype=np.uint8).astype(np.uint64)
+    inicios = np.concatenate([[0], np.cumsum(longitudes)[:-1]])
+
+    # Un trigrama empieza en cada byte que tiene al menos dos bytes más de su propio texto
+    n_trigramas = longitudes - 2
+    posiciones = np.repeat(inicios, n_trigramas) + (np.arange(n_trigramas.sum()) -
+                                                    np.repeat(np.cumsum(n_trigramas) - n_trigramas, n_trigramas))
+    trigramas = buffer[posiciones] | (buffer[posiciones + 1] << np.uint64(8)) | (buffer[posiciones + 2] << np.uint64(16))
+    cortes = np.concatenate([[0], np.cumsum(n_trigramas)[:-1]])
+
+    rng = np.random.default_rng(semilla)
+    a = rng.integers(1, PRIMO_MINHASH, num_permutaciones, dtype=np.uint64)
+    b = rng.integers(0, PRIMO_MINHASH, num_permutaciones, dtype=np.uint64)
+    firmas = np.empty((len(codificados), num_permutaciones), dtype=np.uint32)
+    for k in range(num_permutaciones):
+        valores = (a[k] * trigramas + b[k]) % np.uint64(PRIMO_MINHASH)
+        firmas[:, k] = np.minimum.reduceat(valores, cortes).astype(np.uint32)
+    return firmas
+
+def _hash_bandas(firmas, bandas, filas_por_banda):
+    """
+    Un hash de 64 bits por elemento y banda LSH. 'firmas' tiene una matriz por campo y cada banda
+    combina 'filas_por_banda' valores de la firma de cada campo, así que dos elementos solo caen en
+    el mismo cubo si todos sus campos se parecen a la vez (un campo casi constante, como
+    nom_edificio, no basta para emparejar todo el bloque).
+    """
+    hashes = np.zeros((len(firmas[0]), bandas), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for banda in range(bandas):
+            for firmas_campo in firmas:
+                for fila in range(banda * filas_por_banda, (banda + 1) * filas_por_banda):
+                    hashes[:, banda] = hashes[:, banda] * np.uint64(1000003) ^ firmas_campo[:, fila].astype(np.uint64)
+    return hashes
+
+def pares_candidatos(bloques, hashes, ventana=20):
+    """
+    Pares de elementos que comparten bloque y el hash de alguna banda.
+
+    Por cada banda se ordenan los elementos por (bloque, hash) y se emparejan los vecinos iguales
+    a una distancia menor que 'ventana'. Los grupos más grandes que la ventana no generan todos
+    sus pares (solo los de vecinos cercanos), lo que mantiene el coste lineal; como los clusters
+    se cierran por transitividad, siguen quedando unidos si sus miembros son similares.
+
+    Retorna:
+        tuple: (pares únicos como array (n, 2) con i < j, pares generados antes de quitar repetidos,
+                grupos recortados por la ventana).
+    """
+    izquierda, derecha = [], []
+    recortados = 0
+    for banda in range(hashes.shape[1]):
+        orden = np.lexsort((hashes[:, banda], bloques))
+        bloque_ordenado, hash_ordenado = bloques[orden], hashes[orden, banda]
+        for distancia in range(1, ventana + 1):
+            iguales = (bloque_ordenado[:-distancia] == bloque_ordenado[distancia:]) & \
+                      (hash_ordenado[:-distancia] == hash_ordenado[distancia:])
+            if not iguales.any():
+                break
+            if distancia == ventana:
+                recortados += int(iguales.sum())
+                break
+            izquierda.append(orden[:-distancia][iguales])
+            derecha.append(orden[distancia:][iguales])
+    if not izquierda:
+        return np.empty((0, 2), dtype=np.int64), 0, recortados
+    i, j = np.concatenate(izquierda), np.concatenate(derecha)
+    # Cada par se codifica en un int64; ordenarlo y quitar los iguales consecutivos es más rápido que np.unique
+    n = np.int64(len(bloques))
+    codificados = np.minimum(i, j).astype(np.int64) * n + np.maximum(i, j)
+    codificados.sort()
+    codificados = codificados[np.concatenate([[True], codificados[1:] != codificados[:-1]])]
+    pares = np.column_stack([codificados // n, codificados % n])
+    return pares, len(i), recortados
+
+def componentes_conexas(n, pares):
+    """
+    Union-find vectorizado: cada elemento apunta al menor de su componente. En cada ronda los
+    extremos de cada par se enganchan a la menor de sus raíces y se comprimen los caminos
+    (pointer jumping) hasta que ninguna etiqueta cambia.
+
+    Retorna:
+        np.ndarray: etiqueta de componente (el menor índice de la componente) de cada elemento.
+    """
+    padres = np.arange(n)
+    if len(pares) == 0:
+        return padres
+    i, j = pares[:, 0], pares[:, 1]
+    while True:
+        raiz_i, raiz_j = padres[i], padres[j]
+        minimo = np.minimum(raiz_i, raiz_j)
+        anteriores = padres.copy()
+        np.minimum.at(padres, raiz_i, minimo)
+        np.minimum.at(padres, raiz_j, minimo)
+        while True:
+            saltos = padres[padres]
+            if np.array_equal(saltos, padres):
+                break
+            padres = saltos
+        if np.array_equal(padres, anteriores):
+            return padres
+
+def detectar_casi_duplicados(df, columna_id='id_local', columnas_bloque=COLUMNAS_BLOQUE, columnas_texto=COLUMNAS_TEXTO,
+                             umbral=0.9, bandas=16, filas_por_banda=2, ventana=20, semilla=0):
+    """
+    Detecta entidades casi duplicadas: identificadores distintos en el mismo bloque (código postal
+    y barrio) cuyos textos descriptivos apenas se diferencian.
+
+    Cada campo de texto tiene su propia firma MinHash, calculada una sola vez por valor distinto.
+    Solo se comparan pares candidatos: los que comparten bloque y alguna banda LSH (ver
+    _hash_bandas). Un candidato se confirma si la media de las similitudes de Jaccard estimadas de sus
+    campos llega a 'umbral'; así un nombre de calle largo no pesa más que el rótulo. Las entidades
+    con los mismos textos en el mismo bloque se agrupan directamente, sin pasar por LSH.
+
+    Parámetros:
+        columna_id (str): identificador de la entidad (se usa una fila por identificador).
+        umbral (float): similitud media mínima para unir dos entidades.
+        bandas, filas_por_banda (int): configuración LSH de cada campo; su firma tiene bandas * filas_por_banda valores.
+        ventana (int): vecinos por banda que se emparejan dentro de un grupo (ver pares_candidatos).
+
+    Retorna:
+        tuple: (DataFrame de clusters con columnas id_cluster, columna_id, tamano_cluster e id_canonico,
+                solo para clusters de dos o más entidades; dict de estadísticas y tiempos).
+    """
+    columnas_texto = [col for col in columnas_texto if col in df.columns]
+    if not columnas_texto:
+        raise ValueError(f"El DataFrame no tiene ninguna de las columnas de texto: {COLUMNAS_TEXTO}")
+    tiempos = {}
+    inicio = time.perf_counter()
+    entidades = df.drop_duplicates(columna_id)
+    entidades = entidades[entidades[columnas_bloque].notna().all(axis=1)]
+    ids = entidades[columna_id].to_numpy()
+    bloques, _ = pd.MultiIndex.from_frame(entidades[columnas_bloque]).factorize()
+    codigos, valores = [], []
+    for col in columnas_texto:
+        codigos_col, valores_col = pd.factorize(normalizar_serie(entidades[col]).astype(object))
+        codigos.append(codigos_col)
+        valores.append(list(valores_col))
+    con_texto = np.zeros(len(ids), dtype=bool)
+    for codigos_col, valores_col in zip(codigos, valores):
+        con_texto |= np.array([v != '' for v in valores_col], dtype=bool)[codigos_col]
+
+    # Elementos: combinaciones (bloque, textos) distintas; las entidades de un mismo elemento ya son duplicados
+    elemento, elementos = pd.MultiIndex.from_arrays([bloques, *codigos]).factorize()
+    bloque_elemento = elementos.get_level_values(0).to_numpy()
+    codigos_elemento = [elementos.get_level_values(k + 1).to_numpy() for k in range(len(columnas_texto))]
+    tiempos['preparacion'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    firmas = [firmas_minhash(valores_col, bandas * filas_por_banda, semilla) for valores_col in valores]
+    tiempos['minhash'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    indexable = np.zeros(len(elementos), dtype=bool)
+    indexable[elemento[con_texto]] = True
+    indexables = np.flatnonzero(indexable)
+    hashes = _hash_bandas([firmas_col[codigos_col[indexables]] for firmas_col, codigos_col in zip(firmas, codigos_elemento)],
+                          bandas, filas_por_banda)
+    pares, generados, recortados = pares_candidatos(bloque_elemento[indexables], hashes, ventana)
+    pares = indexables[pares] if len(pares) else pares
+    tiempos['lsh'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    similitud = np.zeros(len(pares))
+    for firmas_col, codigos_col in zip(firmas, codigos_elemento):
+        if len(pares):
+            similitud += (firmas_col[codigos_col[pares[:, 0]]] == firmas_col[codigos_col[pares[:, 1]]]).mean(axis=1)
+    similitud /= len(columnas_texto)
+    confirmados = pares[similitud >= umbral]
+    tiempos['verificacion'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    # Las entidades se unen a través de su elemento: mismos textos en el mismo bloque, o elementos similares
+    etiquetas_elemento = componentes_conexas(len(elementos), confirmados)
+    etiqueta = np.where(con_texto, etiquetas_elemento[elemento], -1 - np.arange(len(ids)))
+    clusters = pd.DataFrame({columna_id: ids, 'etiqueta': etiqueta})
+    clusters['tamano_cluster'] = clusters.groupby('etiqueta')[columna_id].transform('size')
+    clusters = clusters[clusters['tamano_cluster'] > 1]
+    clusters['id_canonico'] = clusters.groupby('etiqueta')[columna_id].transform('min')
+    clusters['id_cluster'] = pd.factorize(clusters['id_canonico'], sort=True)[0]
+    clusters = clusters[['id_cluster', columna_id, 'tamano_cluster', 'id_canonico']] \
+        .sort_values(['id_cluster', columna_id]).reset_index(drop=True)
+    tiempos['clusters'] = time.perf_counter() - inicio
+
+    n_clusters = int(clusters['id_cluster'].nunique())
+    tamanos_bloque = np.bincount(bloques).astype(np.int64) if len(bloques) else np.empty(0, dtype=np.int64)
+    estadisticas = {
+        'entidades': len(ids),
+        'bloques': len(tamanos_bloque),
+        'elementos': len(elementos),
+        'pares_generados': generados,
+        'pares_candidatos': len(pares),
+        'pares_confirmados': len(confirmados),
+        'grupos_recortados': recortados,
+        'clusters': n_clusters,
+        'entidades_duplicadas': len(clusters) - n_clusters,
+        'comparaciones_sin_indice': int((tamanos_bloque * (tamanos_bloque - 1) // 2).sum()),
+        'segundos': {fase: round(t, 4) for fase, t in tiempos.items()},
+    }
+    return clusters, estadisticas
+
+def aplicar_politica_duplicados(df, clusters, politica='marcar', columna_id='id_local', clave=None):
+    """
+    Aplica a un DataFrame los clusters de casi duplicados según la política:
+        marcar    no cambia las filas (los clusters se guardan aparte para revisarlos);
+        canonico  sustituye el identificador de cada entidad por el canónico de su cluster (el menor);
+        eliminar  como canonico y, después, quita las filas que repiten 'clave' (por defecto, todas
+                  las columnas), de modo que solo desaparecen los registros que ya existían en la
+                  entidad canónica y no las filas propias de las entidades duplicadas.
+    """
+    if politica not in POLITICAS:
+        raise ValueError(f"Política de casi duplicados no soportada: {politica}. Opciones: {POLITICAS}")
+    if df is None or politica == 'marcar' or clusters.empty:
+        return df
+    canonico = clusters.set_index(columna_id)['id_canonico']
+    afectadas = df[columna_id].isin(canonico.index) & (df[columna_id].map(canonico) != df[columna_id])
+    df = df.copy()
+    df.loc[afectadas, columna_id] = df.loc[afectadas, columna_id].map(canonico).astype(df[columna_id].dtype)
+    logging.info(f"Se reasignaron {int(afectadas.sum())} filas al {columna_id} canónico de su cluster de casi duplicados.")
+    if politica == 'eliminar':
+        repetidas = df.duplicated(subset=clave)
+        logging.info(f"Se eliminaron {int(repetidas.sum())} filas repetidas por {clave or 'fila completa'} "
+                     f"tras la fusión de casi duplicados de {columna_id}.")
+        return df[~repetidas]
+    return df
+
+@instrumentar('casi_duplicados')
+def task2_casi_duplicados(df_licencias, df_terrazas, politica='marcar', umbral=0.9):
+    """
+    Detecta locales casi duplicados sobre los locales de licencias y terrazas a la vez (así el
+    identificador canónico es el mismo en los dos datasets), guarda los clusters en el almacén
+    intermedio y aplica la política de fusión a ambos.
+    """
+    logging.info("Iniciando la detección de locales casi duplicados.")
+    locales = pd.concat([df[['id_local'] + COLUMNAS_BLOQUE + COLUMNAS_TEXTO]
+                         for df in (df_licencias, df_terrazas) if df is not None], ignore_index=True)
+    clusters, estadisticas = detectar_casi_duplicados(locales, umbral=umbral)
+    logging.info(
+        f"Casi duplicados: {estadisticas['entidades']} locales en {estadisticas['bloques']} bloques, "
+        f"{estadisticas['pares_candidatos']} pares candidatos ({estadisticas['pares_generados']} generados, "
+        f"{estadisticas['comparaciones_sin_indice']} comparaciones sin índice), {estadisticas['pares_confirmados']} "
+        f"confirmados, {estadisticas['clusters']} clusters con {estadisticas['entidades_duplicadas']} locales duplicados. "
+        f"Tiempos: {estadisticas['segundos']}."
+    )
+    if estadisticas['grupos_recortados']:
+        logging.warning(f"{estadisticas['grupos_recortados']} grupos LSH superaron la ventana de vecinos y no generaron todos sus pares.")
+    try:
+        guardar_intermedio(clusters, 'Casi_Duplicados_Locales')
+    except Exception as e:
+        logging.error(f"Error al guardar los clusters de casi duplicados: {e}")
+    return (aplicar_politica_duplicados(df_licencias, clusters, politica, clave=CLAVE_LICENCIAS),
+            aplicar_politica_duplicados(df_terrazas, clusters, politica, clave=CLAVE_TERRAZAS))
@@ -0,0 +1,186 @@
+# numeric_normalization.py
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+RANGO_UMBRAL = 950  # Solo se normalizan las columnas cuyo rango supera este valor
+
+def valores_columna(serie):
+    """Valores de una columna en su dtype numérico nativo (sin pasar a float64 si no hace falta)."""
+    if isinstance(serie.dtype, np.dtype) and serie.dtype.kind in 'iufb':
+        return serie.to_numpy()
+    return pd.to_numeric(serie, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+def resumen_columna(valores):
+    """n, media, M2, mínimo y máximo de un array, ignorando NaN."""
+    if valores.dtype.kind == 'f':
+        nulos = np.isnan(valores)
+        if nulos.any():
+            valores = valores[~nulos]
+    n = len(valores)
+    if n == 0:
+        return 0, 0.0, 0.0, np.inf, -np.inf
+    media = valores.sum(dtype='float64') / n
+    desviaciones = valores - media
+    return n, media, float(np.dot(desviaciones, desviaciones)), float(valores.min()), float(valores.max())
+
+class EstadisticasWelford:
+    """
+    Estadísticas por columna (n, media, M2, mínimo, máximo) para la normalización z-score.
+
+    Cada columna de un bloque se resume sobre su array en el dtype nativo (sin convertir el bloque
+    a una matriz float64) y el bloque se combina con lo acumulado, para todas las columnas a la vez,
+    con la actualización de Welford por lotes (Chan et al.), que es estable numéricamente y no
+    necesita volver a leer los bloques anteriores.
+    """
+
+    def __init__(self, columnas=()):
+        self.columnas = list(columnas)
+        k = len(self.columnas)
+        self.n = np.zeros(k)
+        self.media = np.zeros(k)
+        self.m2 = np.zeros(k)
+        self.minimo = np.full(k, np.inf)
+        self.maximo = np.full(k, -np.inf)
+
+    @classmethod
+    def desde_dataframe(cls, df, excluir=()):
+        """Estadísticas de las columnas numéricas de un DataFrame, salvo las de 'excluir'."""
+        estadisticas = cls([c for c in df.select_dtypes(include=[np.number]).columns if c not in excluir])
+        return estadisticas.actualizar(df)
+
+    def _ampliar(self, columnas):
+        nuevas = [c for c in columnas if c not in self.columnas]
+        if not nuevas:
+            return
+        k = len(nuevas)
+        self.columnas += nuevas
+        self.n = np.concatenate([self.n, np.zeros(k)])
+        self.media = np.concatenate([self.media, np.zeros(k)])
+        self.m2 = np.concatenate([self.m2, np.zeros(k)])
+        self.minimo = np.concatenate([self.minimo, np.full(k, np.inf)])
+        self.maximo = np.concatenate([self.maximo, np.full(k, -np.inf)])
+
+    def _combinar(self, posiciones, n_b, media_b, m2_b, min_b, max_b):
+        n_a, media_a = self.n[posiciones], self.media[posiciones]
+        n = n_a + n_b
+        con_datos = n > 0
+        delta = media_b - media_a
+        peso = np.divide(n_b, n, out=np.zeros_like(n), where=con_datos)
+        self.media[posiciones] = media_a + delta * peso
+        self.m2[posiciones] += m2_b + delta ** 2 * n_a * peso
+        self.n[posiciones] = n
+        self.minimo[posiciones] = np.fmin(self.minimo[posiciones], min_b)
+        self.maximo[posiciones] = np.fmax(self.maximo[posiciones], max_b)
+
+    def actualizar(self, df, columnas=None):
+        """Incorpora un bloque (DataFrame). Retorna self para encadenar."""
+        columnas = [c for c in (columnas or self.columnas) if c in df.columns]
+        self._ampliar(columnas)
+        if not columnas or df.empty:
+            return self
+        n_b, media_b, m2_b, min_b, max_b = (np.array(v, dtype='float64') for v in
+                                            zip(*(resumen_columna(valores_columna(df[c])) for c in columnas)))
+        posiciones = [self.columnas.index(c) for c in columnas]
+        self._combinar(posiciones, n_b, media_b, m2_b, min_b, max_b)
+        return self
+
+    def combinar(self, otra):
+        """Combina con otras estadísticas (de otro bloque, proceso o ejecución anterior)."""
+        self._ampliar(otra.columnas)
+        posiciones = [self.columnas.index(c) for c in otra.columnas]
+        self._combinar(posiciones, otra.n, otra.media, otra.m2, otra.minimo, otra.maximo)
+        return self
+
+    @property
+    def desviacion(self):
+        """Desviación estándar muestral (ddof=1, como pandas)."""
+        return np.sqrt(np.divide(self.m2, self.n - 1, out=np.full_like(self.m2, np.nan), where=self.n > 1))
+
+    @property
+    def rango(self):
+        return self.maximo - self.minimo
+
+    def a_diccionario(self):
+        return {c: {'n': float(self.n[i]), 'media': float(self.media[i]), 'm2': float(self.m2[i]),
+                    'min': float(self.minimo[i]), 'max': float(self.maximo[i])}
+                for i, c in enumerate(self.columnas)}
+
+    @classmethod
+    def desde_diccionario(cls, datos):
+        estadisticas = cls(list(datos))
+        for i, e in enumerate(datos.values()):
+            estadisticas.n[i], estadisticas.media[i], estadisticas.m2[i] = e['n'], e['media'], e['m2']
+            estadisticas.minimo[i], estadisticas.maximo[i] = e['min'], e['max']
+        return estadisticas
+
+    def guardar(self, ruta):
+        """Persiste las estadísticas ajustadas en JSON de forma atómica."""
+        directorio = os.path.dirname(ruta)
+        if directorio and not os.path.exists(directorio):
+            os.makedirs(directorio)
+        with open(f"{ruta}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.a_diccionario(), f, indent=2)
+        os.replace(f"{ruta}.tmp", ruta)
+        logging.info(f"Estadísticas de normalización guardadas en '{ruta}' ({len(self.columnas)} columnas).")
+
+    @classmethod
+    def cargar(cls, ruta):
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return cls.desde_diccionario(json.load(f))
+
+def columnas_a_normalizar(estadisticas, rango_umbral=RANGO_UMBRAL):
+    """Columnas cuyo rango supera el umbral y tienen desviación estándar distinta de cero."""
+    return [c for c, rango, std in zip(estadisticas.columnas, estadisticas.rango, estadisticas.desviacion)
+            if rango > rango_umbral and std != 0 and not np.isnan(std)]
+
+def registrar_normalizacion(estadisticas, dataset_name, rango_umbral=RANGO_UMBRAL):
+    """Registra en el log qué columnas se normalizan."""
+    for col, rango, std in zip(estadisticas.columnas, estadisticas.rango, estadisticas.desviacion):
+        if not rango > rango_umbral:
+            logging.info(f"Columna '{col}' no requiere normalización en el dataset {dataset_name}.")
+        elif std == 0:
+            logging.warning(f"Columna '{col}' tiene desviación estándar 0 en el dataset {dataset_name}. No se normaliza.")
+        else:
+            logging.info(f"Columna '{col}' normalizada en el dataset {dataset_name}.")
+
+def aplicar_normalizacion(df, estadisticas, rango_umbral=RANGO_UMBRAL):
+    """
+    Aplica z-score en el propio DataFrame, solo a las columnas que lo requieren: cada una se
+    reemplaza por su versión normalizada, sin copiar el resto del DataFrame.
+    """
+    desviacion = estadisticas.desviacion
+    for col in columnas_a_normalizar(estadisticas, rango_umbral):
+        if col in df.columns:
+            i = estadisticas.columnas.index(col)
+            df[col] = (valores_columna(df[col]) - estadisticas.media[i]) / desviacion[i]
+    return df
+
+def ajustar_estadisticas(df, excluir=(), ruta=None, actualizar=False):
+    """
+    Estadísticas con las que se normaliza un DataFrame.
+
+    Sin 'ruta' se ajustan sobre df. Con 'ruta', si existe el archivo se reutilizan las
+    estadísticas guardadas (o, con actualizar=True, se combinan con las de df y se vuelven a
+    guardar); si no existe, se ajustan sobre df y se guardan.
+    """
+    if ruta and os.path.exists(ruta):
+        try:
+            guardadas = EstadisticasWelford.cargar(ruta)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"No se pudieron leer las estadísticas de normalización '{ruta}': {e}. Se ajustan de nuevo.")
+        else:
+            if not actualizar:
+                logging.info(f"Se reutilizan las estadísticas de normalización de '{ruta}'.")
+                return guardadas
+            guardadas.combinar(EstadisticasWelford.desde_dataframe(df, excluir))
+            guardadas.guardar(ruta)
+            return guardadas
+
+    estadisticas = EstadisticasWelford.desde_dataframe(df, excluir)
+    if ruta:
+        estadisticas.guardar(ruta)
+    return estadisticas
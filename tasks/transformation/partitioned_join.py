@@ -0,0 +1,133 @@
+# partitioned_join.py
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from tasks.pipeline.scheduler import CONTEXTO_PROCESOS
+from tasks.storage.intermediate_store import (iniciar_bloques_intermedios, guardar_bloque_intermedio,
+                                              leer_bloques_intermedios)
+
+# Columnas auxiliares con la posición original de cada fila, para reproducir el orden de pd.merge
+POSICION_IZQUIERDA = '_posicion_izquierda'
+POSICION_DERECHA = '_posicion_derecha'
+
+UMBRAL_ABANICO = 1000  # Filas de salida de una sola clave a partir de las que se avisa
+MAX_CLAVES_AVISO = 10
+
+def particiones_hash(df, clave, n_particiones):
+    """
+    Número de partición de cada fila según el hash de su clave. Las columnas numéricas de la
+    clave se hashean como float64: hash_pandas_object da hashes distintos para 1 y 1.0, y el
+    esquema tipa id_local como float64 cuando tiene nulos, de modo que la misma clave entera en
+    un lado y decimal en el otro caería en particiones distintas y perdería sus parejas.
+    """
+    claves = df[clave]
+    numericas = [c for c in claves.columns if pd.api.types.is_numeric_dtype(claves[c])]
+    claves = claves.astype({c: 'float64' for c in numericas})
+    hashes = pd.util.hash_pandas_object(claves, index=False).to_numpy()
+    return (hashes % np.uint64(n_particiones)).astype(np.int64)
+
+def analizar_abanico(df_izquierda, df_derecha, clave, umbral=UMBRAL_ABANICO):
+    """
+    Estima las filas que producirá el JOIN y detecta las claves con mayor abanico (filas de la
+    izquierda por filas de la derecha), que concentran la salida en una sola partición.
+
+    Retorna:
+        tuple: (filas estimadas de salida, Serie con las claves que superan el umbral).
+    """
+    conteo_izquierda = df_izquierda[clave].value_counts()
+    conteo_derecha = df_derecha[clave].value_counts()
+    abanico = conteo_izquierda.mul(conteo_derecha, fill_value=0)
+    abanico = abanico[abanico > 0].astype(np.int64)
+    return int(abanico.sum()), abanico[abanico > umbral].sort_values(ascending=False)
+
+def _pares_particion(indice, izquierda, derecha, clave, how):
+    """Une las claves de una partición y retorna las posiciones originales de cada fila de salida."""
+    pares = pd.merge(izquierda, derecha, on=clave, how=how)
+    pares = pares.sort_values([POSICION_IZQUIERDA, POSICION_DERECHA], kind='stable')
+    return (indice, pares[POSICION_IZQUIERDA].to_numpy(np.int64),
+            pares[POSICION_DERECHA].fillna(-1).to_numpy(np.int64))
+
+def materializar(df_izquierda, df_derecha, clave, posiciones_izquierda, posiciones_derecha):
+    """
+    Construye las filas de salida a partir de las posiciones emparejadas, con las mismas columnas
+    (y sufijos _x/_y) que pd.merge. Una posición -1 en la derecha es una fila sin pareja (LEFT JOIN).
+    """
+    comunes = set(df_izquierda.columns) & set(df_derecha.columns) - set(clave)
+    izquierda = df_izquierda.take(posiciones_izquierda).reset_index(drop=True)
+    derecha = df_derecha.drop(columns=clave).reset_index(drop=True)
+    if (posiciones_derecha < 0).any():
+        derecha = derecha.reindex(posiciones_derecha).reset_index(drop=True)
+    else:
+        derecha = derecha.take(posiciones_derecha).reset_index(drop=True)
+    return pd.concat([izquierda.rename(columns={c: f"{c}_x" for c in comunes}),
+                      derecha.rename(columns={c: f"{c}_y" for c in comunes})], axis=1)
+
+def unir_particionado(df_izquierda, df_derecha, clave, n_particiones=None, max_workers=None, how='inner',
+                      nombre_salida=None, umbral_abanico=UMBRAL_ABANICO):
+    """
+    JOIN particionado por hash: reparte las claves de ambos lados por su hash y une cada partición
+    en un pool de procesos. A los procesos solo viajan las claves y la posición original de cada
+    fila; las columnas se copian una vez, al construir la salida.
+
+    Sin 'nombre_salida', retorna el mismo DataFrame que pd.merge(df_izquierda, df_derecha,
+    on=clave, how=how), con el mismo orden de filas. Con 'nombre_salida', cada partición se
+    construye y se guarda en el almacén intermedio ('nombre_salida/part-NNNNN') en cuanto vuelve
+    del pool, sin reunir nunca la salida completa, y se retorna una fuente por bloques sobre esas
+    partes: las filas son las de pd.merge, agrupadas por partición y en su orden dentro de cada una.
+    Solo admite 'inner' y 'left', que conservan el orden de la izquierda.
+    """
+    if how not in ('inner', 'left'):
+        raise ValueError(f"JOIN particionado no soportado para how='{how}'.")
+    clave = [clave] if isinstance(clave, str) else list(clave)
+    inicio = time.perf_counter()
+    max_workers = max_workers or os.cpu_count() or 1
+    n_particiones = n_particiones or max_workers * 4
+
+    filas_estimadas, claves_calientes = analizar_abanico(df_izquierda, df_derecha, clave, umbral_abanico)
+    if not claves_calientes.empty:
+        logging.warning(
+            f"JOIN en {clave}: {len(claves_calientes)} claves con más de {umbral_abanico} filas de salida "
+            f"({claves_calientes.sum() / max(filas_estimadas, 1):.1%} del total). Mayores: "
+            f"{claves_calientes.head(MAX_CLAVES_AVISO).to_dict()}."
+        )
+
+    claves_izquierda = df_izquierda[clave].reset_index(drop=True).assign(**{POSICION_IZQUIERDA: np.arange(len(df_izquierda))})
+    claves_derecha = df_derecha[clave].reset_index(drop=True).assign(**{POSICION_DERECHA: np.arange(len(df_derecha))})
+    grupos_izquierda = claves_izquierda.groupby(particiones_hash(claves_izquierda, clave, n_particiones))
+    grupos_derecha = dict(list(claves_derecha.groupby(particiones_hash(claves_derecha, clave, n_particiones))))
+    derecha_vacia = claves_derecha.iloc[:0]
+    if nombre_salida:
+        iniciar_bloques_intermedios(nombre_salida)
+
+    pares = {}
+    filas = 0
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=CONTEXTO_PROCESOS) as pool:
+        futuros = [pool.submit(_pares_particion, indice, parte, grupos_derecha.get(indice, derecha_vacia), clave, how)
+                   for indice, parte in grupos_izquierda
+                   if how == 'left' or indice in grupos_derecha]
+        for futuro in as_completed(futuros):
+            indice, posiciones_izquierda, posiciones_derecha = futuro.result()
+            filas += len(posiciones_izquierda)
+            if nombre_salida:
+                parte = materializar(df_izquierda, df_derecha, clave, posiciones_izquierda, posiciones_derecha)
+                guardar_bloque_intermedio(parte, nombre_salida, indice)
+            else:
+                pares[indice] = (posiciones_izquierda, posiciones_derecha)
+
+    logging.info(
+        f"JOIN particionado en {clave}: {filas} filas (estimadas {filas_estimadas}) en "
+        f"{len(futuros)} particiones con {max_workers} procesos, {time.perf_counter() - inicio:.2f} s."
+    )
+    if nombre_salida:
+        return leer_bloques_intermedios(nombre_salida)
+
+    # Orden de pd.merge: filas de la izquierda en su orden y, dentro de cada una, las de la derecha
+    posiciones_izquierda = np.concatenate([p[0] for p in pares.values()] or [np.empty(0, np.int64)])
+    posiciones_derecha = np.concatenate([p[1] for p in pares.values()] or [np.empty(0, np.int64)])
+    orden = np.lexsort((posiciones_derecha, posiciones_izquierda))
+    return materializar(df_izquierda, df_derecha, clave, posiciones_izquierda[orden], posiciones_derecha[orden])
@@ -0,0 +1,229 @@
+# spatial_index.py
+import logging
+
+import numpy as np
+
+from tasks.transformation.aggregation import agregar, agregado, especificacion
+
+COLUMNAS_COORDENADAS = ('coordenada_x_local', 'coordenada_y_local')  # UTM (metros)
+PUNTOS_POR_CELDA = 4  # Ocupación media buscada al elegir automáticamente el tamaño de celda del índice
+TAMANO_CELDA_AGREGADOS = 250.0  # Metros; celdas de la rejilla que se exporta en la Tarea 3
+RADIO_VECINOS = 50.0
+LOTE_CONSULTAS = 50_000  # Consultas por lote: acota los pares (consulta, candidato) en memoria
+
+AGREGACIONES_CELDAS = {
+    'Terrazas_Por_Celda': especificacion(
+        ['celda_x', 'celda_y'],
+        {
+            'Cantidad_Terrazas': agregado('size'),
+            'Superficie_ES': agregado('sum', 'Superficie_ES'),
+            'Superficie_Media': agregado('mean', 'Superficie_ES'),
+            'Mesas_ES': agregado('sum', 'mesas_es'),
+            'Sillas_ES': agregado('sum', 'sillas_es'),
+            'Vecinos_Medio': agregado('mean', 'vecinos'),
+        },
+    ),
+}
+
+def coordenadas_validas(x, y):
+    """Máscara de coordenadas utilizables: el export usa 0 para los locales sin georreferenciar."""
+    return np.isfinite(x) & np.isfinite(y) & (x > 0) & (y > 0)
+
+def tamano_celda_automatico(x, y, puntos_por_celda=PUNTOS_POR_CELDA):
+    """
+    Tamaño de celda (m) para que las celdas ocupadas tengan de media 'puntos_por_celda' puntos.
+    La densidad se estima sobre las celdas ocupadas de una rejilla de TAMANO_CELDA_AGREGADOS m,
+    no sobre el rectángulo que envuelve los puntos, porque las terrazas se concentran en el centro.
+    Se limita a RADIO_VECINOS: con celdas mayores que el radio de consulta se examinan puntos de sobra.
+    """
+    if len(x) == 0:
+        return TAMANO_CELDA_AGREGADOS
+    columnas_x, columnas_y = celdas_rejilla(x, y)
+    ocupadas = len(np.unique(columnas_x * (int(columnas_y.max()) + 1) + columnas_y - columnas_y.min()))
+    densidad = len(x) / (ocupadas * TAMANO_CELDA_AGREGADOS ** 2)
+    return float(np.clip(np.sqrt(puntos_por_celda / densidad), 1.0, RADIO_VECINOS))
+
+class IndiceRejilla:
+    """
+    Índice espacial de rejilla uniforme sobre coordenadas planas (UTM).
+
+    Los puntos se ordenan por celda, de modo que los de cada celda quedan contiguos (formato CSR:
+    clave de celda, inicio y fin). Una consulta solo examina las celdas que pueden contener
+    puntos dentro de su radio, y todas las consultas de un lote se resuelven a la vez con NumPy.
+    Por defecto el tamaño de celda se adapta a la densidad (ver tamano_celda_automatico).
+    """
+
+    def __init__(self, x, y, tamano_celda=None):
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        validos = coordenadas_validas(x, y)
+        self.indices = np.flatnonzero(validos)  # Posición en la entrada de cada punto indexado
+        self.x, self.y = x[validos], y[validos]
+        # Sin tamaño de celda explícito, se elige según la densidad de los puntos
+        self.tamano_celda = float(tamano_celda or tamano_celda_automatico(self.x, self.y))
+        if len(self.x):
+            self.origen = (self.x.min(), self.y.min())
+            columnas_x, columnas_y = self._celdas(self.x, self.y)
+            self.columnas, self.filas = int(columnas_x.max()) + 1, int(columnas_y.max()) + 1
+        else:
+            self.origen, self.columnas, self.filas = (0.0, 0.0), 1, 1
+            columnas_x = columnas_y = np.empty(0, dtype=np.int64)
+        claves = columnas_x * self.filas + columnas_y
+        self.orden = np.argsort(claves, kind='stable')
+        claves = claves[self.orden]
+        self.claves, self.inicios = np.unique(claves, return_index=True)
+        self.fines = np.append(self.inicios[1:], len(claves))
+        self.x_ordenado, self.y_ordenado = self.x[self.orden], self.y[self.orden]
+        if len(validos) > len(self.x):
+            logging.info(f"Índice espacial: {len(validos) - len(self.x)} puntos sin coordenadas válidas no se indexan.")
+
+    def __len__(self):
+        return len(self.x)
+
+    def _celdas(self, x, y):
+        columnas_x = np.floor((x - self.origen[0]) / self.tamano_celda).astype(np.int64)
+        columnas_y = np.floor((y - self.origen[1]) / self.tamano_celda).astype(np.int64)
+        return columnas_x, columnas_y
+
+    def _celdas_anillo(self, anillo):
+        """Celdas que examina una consulta: las del anillo o, si son más, las celdas ocupadas."""
+        return min((2 * anillo + 1) ** 2, max(len(self.claves), 1))
+
+    def _candidatos(self, qx, qy, anillo):
+        """
+        Pares (consulta, punto) de las celdas a distancia de Chebyshev <= 'anillo' de la celda de
+        cada consulta. Los rangos CSR de todas las celdas se expanden a la vez con np.repeat.
+        """
+        columnas_x, columnas_y = self._celdas(qx, qy)
+        if (2 * anillo + 1) ** 2 > len(self.claves):
+            # El anillo tiene más celdas que la rejilla ocupada: se filtran directamente las ocupadas
+            ocupadas_x, ocupadas_y = self.claves // self.filas, self.claves % self.filas
+            cerca = (np.abs(ocupadas_x[None, :] - columnas_x[:, None]) <= anillo) & \
+                    (np.abs(ocupadas_y[None, :] - columnas_y[:, None]) <= anillo)
+            consulta, posicion = np.nonzero(cerca)
+        else:
+            desplazamientos = np.arange(-anillo, anillo + 1)
+            dx, dy = np.meshgrid(desplazamientos, desplazamientos, indexing='ij')
+            celda_x = (columnas_x[:, None] + dx.ravel()[None, :]).ravel()
+            celda_y = (columnas_y[:, None] + dy.ravel()[None, :]).ravel()
+            consulta = np.repeat(np.arange(len(qx)), dx.size)
+            dentro = (celda_y >= 0) & (celda_y < self.filas) & (celda_x >= 0)
+            consulta, claves = consulta[dentro], celda_x[dentro] * self.filas + celda_y[dentro]
+            posicion = np.minimum(np.searchsorted(self.claves, claves), max(len(self.claves) - 1, 0))
+            existe = self.claves[posicion] == claves if len(self.claves) else np.zeros(len(claves), dtype=bool)
+            consulta, posicion = consulta[existe], posicion[existe]
+
+        inicios, longitudes = self.inicios[posicion], self.fines[posicion] - self.inicios[posicion]
+        desplazamiento = np.arange(int(longitudes.sum())) - np.repeat(np.cumsum(longitudes) - longitudes, longitudes)
+        return np.repeat(consulta, longitudes), np.repeat(inicios, longitudes) + desplazamiento
+
+    def vecinos_en_radio(self, qx, qy, radio, lote=LOTE_CONSULTAS):
+        """
+        Todos los puntos a una distancia <= 'radio' de cada consulta.
+
+        Retorna:
+            tuple: (consulta, punto, distancia); 'punto' es la posición en la entrada del índice.
+        """
+        qx, qy = np.asarray(qx, dtype=np.float64), np.asarray(qy, dtype=np.float64)
+        anillo = int(np.ceil(radio / self.tamano_celda))
+        lote = max(1, lote * 9 // self._celdas_anillo(anillo))
+        resultados = []
+        for inicio in range(0, len(qx), lote):
+            consulta, punto = self._candidatos(qx[inicio:inicio + lote], qy[inicio:inicio + lote], anillo)
+            distancia = np.hypot(self.x_ordenado[punto] - qx[inicio + consulta], self.y_ordenado[punto] - qy[inicio + consulta])
+            cerca = distancia <= radio
+            resultados.append((consulta[cerca] + inicio, self.indices[self.orden[punto[cerca]]], distancia[cerca]))
+        if not resultados:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        return tuple(np.concatenate(partes) for partes in zip(*resultados))
+
+    def contar_en_radio(self, qx, qy, radio, lote=LOTE_CONSULTAS):
+        """Número de puntos a una distancia <= 'radio' de cada consulta (incluido el propio punto si está indexado)."""
+        consulta, _, _ = self.vecinos_en_radio(qx, qy, radio, lote)
+        return np.bincount(consulta, minlength=len(qx))
+
+    def _k_vecinos_grupo(self, qx, qy, grupo, k, anillo, ultimo, puntos, distancias):
+        """
+        Resuelve un grupo de consultas de k_vecinos con los candidatos de un anillo. Escribe en
+        'puntos' y 'distancias' las consultas resueltas y retorna su máscara.
+        """
+        consulta, punto = self._candidatos(qx[grupo], qy[grupo], anillo)
+        distancia = np.hypot(self.x_ordenado[punto] - qx[grupo][consulta], self.y_ordenado[punto] - qy[grupo][consulta])
+        if not ultimo:
+            # Los candidatos más lejanos que el anillo no pueden estar entre los k de una consulta resuelta
+            cerca = distancia <= anillo * self.tamano_celda
+            consulta, punto, distancia = consulta[cerca], punto[cerca], distancia[cerca]
+        # Ordenar por (consulta, distancia) con una sola clave y quedarse con los k primeros de cada consulta
+        orden = np.argsort(consulta * (distancia.max(initial=0.0) + 1.0) + distancia, kind='stable')
+        consulta, punto, distancia = consulta[orden], punto[orden], distancia[orden]
+        rango = np.arange(len(consulta)) - np.searchsorted(consulta, np.arange(len(grupo)))[consulta]
+        tomar = rango < k
+        consulta, punto, distancia, rango = consulta[tomar], punto[tomar], distancia[tomar], rango[tomar]
+
+        kesima = np.full(len(grupo), np.inf)
+        kesima[consulta[rango == k - 1]] = distancia[rango == k - 1]
+        resueltas = (kesima <= anillo * self.tamano_celda) | ultimo
+        elegidas = resueltas[consulta]
+        filas = grupo[consulta[elegidas]]
+        puntos[filas, rango[elegidas]] = self.indices[self.orden[punto[elegidas]]]
+        distancias[filas, rango[elegidas]] = distancia[elegidas]
+        return resueltas
+
+    def k_vecinos(self, qx, qy, k, lote=LOTE_CONSULTAS):
+        """
+        Los k puntos más cercanos a cada consulta.
+
+        Se empieza por el anillo de celdas vecinas y se amplía (duplicándolo) solo para las
+        consultas cuyo k-ésimo candidato podría tener un punto más cercano fuera del anillo: el
+        resultado es exacto si la distancia del k-ésimo no supera anillo * tamano_celda. Los
+        lotes se reducen a medida que crece el anillo para acotar los pares (consulta, celda).
+
+        Retorna:
+            tuple: (puntos, distancias) de forma (consultas, k), ordenados por distancia; si hay
+            menos de k puntos indexados, el resto se rellena con -1 e infinito.
+        """
+        qx, qy = np.asarray(qx, dtype=np.float64), np.asarray(qy, dtype=np.float64)
+        puntos = np.full((len(qx), k), -1, dtype=np.int64)
+        distancias = np.full((len(qx), k), np.inf)
+        if len(self) == 0 or len(qx) == 0:
+            return puntos, distancias
+        # A partir de este anillo, el de cualquier consulta cubre toda la rejilla
+        columnas_x, columnas_y = self._celdas(qx, qy)
+        fuera = max(0, -columnas_x.min(), -columnas_y.min(),
+                    columnas_x.max() - self.columnas, columnas_y.max() - self.filas)
+        anillo_maximo = max(self.columnas, self.filas) + int(fuera)
+
+        pendientes, anillo = np.arange(len(qx)), 1
+        while len(pendientes):
+            por_lote = max(1, lote * 9 // self._celdas_anillo(anillo))
+            siguientes = []
+            for inicio in range(0, len(pendientes), por_lote):
+                grupo = pendientes[inicio:inicio + por_lote]
+                resueltas = self._k_vecinos_grupo(qx, qy, grupo, k, anillo, anillo >= anillo_maximo, puntos, distancias)
+                siguientes.append(grupo[~resueltas])
+            pendientes = np.concatenate(siguientes)
+            anillo *= 2
+        return puntos, distancias
+
+def celdas_rejilla(x, y, tamano_celda=TAMANO_CELDA_AGREGADOS):
+    """Celda (columna, fila) de cada punto en una rejilla UTM alineada con el origen de coordenadas."""
+    return np.floor(x / tamano_celda).astype(np.int64), np.floor(y / tamano_celda).astype(np.int64)
+
+def agregados_por_celda(df_terrazas, tamano_celda=TAMANO_CELDA_AGREGADOS, radio=RADIO_VECINOS):
+    """
+    Agregados de las terrazas por celda de la rejilla: cantidad, superficie, mesas, sillas y el
+    número medio de terrazas a menos de 'radio' metros de cada una (sin contarse a sí misma).
+    Las celdas se identifican por su columna y fila y por las coordenadas UTM de su centro.
+    """
+    x = df_terrazas[COLUMNAS_COORDENADAS[0]].to_numpy(dtype=np.float64)
+    y = df_terrazas[COLUMNAS_COORDENADAS[1]].to_numpy(dtype=np.float64)
+    validos = coordenadas_validas(x, y)
+    indice = IndiceRejilla(x, y)
+    vecinos = indice.contar_en_radio(x[validos], y[validos], radio) - 1
+
+    df = df_terrazas.loc[validos, ['Superficie_ES', 'mesas_es', 'sillas_es']].copy()
+    df['celda_x'], df['celda_y'] = celdas_rejilla(x[validos], y[validos], tamano_celda)
+    df['vecinos'] = vecinos
+    df_celdas = agregar(df, AGREGACIONES_CELDAS)['Terrazas_Por_Celda']
+    df_celdas.insert(2, 'centro_x', (df_celdas['celda_x'] + 0.5) * tamano_celda)
+    df_celdas.insert(3, 'centro_y', (df_celdas['celda_y'] + 0.5) * tamano_celda)
+    return df_celdas
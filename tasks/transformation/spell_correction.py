@@ -0,0 +1,139 @@
+# spell_correction.py
+import json
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from nltk.tokenize import regexp_tokenize
+from textblob import Word
+
+from tasks.pipeline.scheduler import CONTEXTO_PROCESOS
+
+# Mismo patrón que usa TextBlob.correct(): palabra, signo de puntuación o espacio
+PATRON_TOKENS = r"\w+|[^\w\s]|\s"
+LONGITUD_MAXIMA = 100  # Solo se corrigen los textos de menos de 100 caracteres
+
+RUTA_CACHE = os.path.join('cache', 'correccion_ortografica.json')
+MAX_ENTRADAS_CACHE = 200000
+MIN_TOKENS_POOL = 500  # Por debajo de este número no compensa arrancar procesos
+TAMANO_LOTE = 250
+
+def _corregir_tokens(tokens):
+    """Corrige una lista de tokens con TextBlob (se ejecuta en los procesos del pool)."""
+    return [str(Word(token).correct()) for token in tokens]
+
+def texto_corregible(text):
+    """Indica si un valor entra en la corrección ortográfica (str de longitud manejable)."""
+    return isinstance(text, str) and len(text) < LONGITUD_MAXIMA
+
+class CorrectorOrtografico:
+    """
+    Motor de corrección ortográfica con memoización por token.
+
+    Trabaja sobre los valores únicos de cada columna, resuelve cada token una sola vez
+    (caché LRU persistente en disco) y reparte los tokens nuevos en un pool de procesos.
+    El resultado es idéntico a str(TextBlob(text).correct()), porque TextBlob corrige
+    cada token de forma independiente y une los resultados sin separador.
+    """
+
+    def __init__(self, ruta_cache=RUTA_CACHE, max_entradas=MAX_ENTRADAS_CACHE, max_workers=None,
+                 min_tokens_pool=MIN_TOKENS_POOL):
+        self.ruta_cache = ruta_cache
+        self.max_entradas = max_entradas
+        self.max_workers = max_workers
+        self.min_tokens_pool = min_tokens_pool
+        self.aciertos = 0
+        self.fallos = 0
+        self.cache = self._cargar_cache()
+
+    def _cargar_cache(self):
+        """Carga la caché desde disco conservando el orden LRU guardado."""
+        cache = OrderedDict()
+        if self.ruta_cache and os.path.exists(self.ruta_cache):
+            try:
+                with open(self.ruta_cache, 'r', encoding='utf-8') as f:
+                    cache.update(json.load(f))
+                logging.info(f"Caché de corrección ortográfica cargada: {len(cache)} tokens.")
+            except (OSError, ValueError) as e:
+                logging.warning(f"No se pudo leer la caché de corrección '{self.ruta_cache}': {e}. Se empieza vacía.")
+        return cache
+
+    def guardar(self):
+        """Persiste la caché en disco de forma atómica."""
+        if not self.ruta_cache:
+            return
+        directorio = os.path.dirname(self.ruta_cache)
+        if directorio and not os.path.exists(directorio):
+            os.makedirs(directorio)
+        ruta_tmp = f"{self.ruta_cache}.tmp"
+        try:
+            with open(ruta_tmp, 'w', encoding='utf-8') as f:
+                json.dump(list(self.cache.items()), f, ensure_ascii=False)
+            os.replace(ruta_tmp, self.ruta_cache)
+            logging.info(f"Caché de corrección ortográfica guardada en '{self.ruta_cache}' ({len(self.cache)} tokens).")
+        except OSError as e:
+            logging.error(f"Error al guardar la caché de corrección '{self.ruta_cache}': {e}")
+
+    @property
+    def tasa_aciertos(self):
+        total = self.aciertos + self.fallos
+        return self.aciertos / total if total else 0.0
+
+    def _resolver_tokens(self, tokens):
+        """Devuelve un diccionario token -> corrección, calculando solo los que faltan en caché."""
+        resueltos = {}
+        pendientes = []
+        for token in tokens:
+            if token in self.cache:
+                self.cache.move_to_end(token)
+                resueltos[token] = self.cache[token]
+                self.aciertos += 1
+            else:
+                pendientes.append(token)
+                self.fallos += 1
+
+        if pendientes:
+            if len(pendientes) >= self.min_tokens_pool and self.max_workers != 1:
+                lotes = [pendientes[i:i + TAMANO_LOTE] for i in range(0, len(pendientes), TAMANO_LOTE)]
+                with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=CONTEXTO_PROCESOS) as pool:
+                    corregidos = [c for lote in pool.map(_corregir_tokens, lotes) for c in lote]
+            else:
+                corregidos = _corregir_tokens(pendientes)
+
+            for token, correccion in zip(pendientes, corregidos):
+                resueltos[token] = correccion
+                self.cache[token] = correccion
+            while len(self.cache) > self.max_entradas:
+                self.cache.popitem(last=False)
+
+        return resueltos
+
+    def corregir_textos(self, textos):
+        """Corrige una colección de textos únicos. Retorna un diccionario texto -> texto corregido."""
+        tokens_por_texto = {texto: regexp_tokenize(texto, PATRON_TOKENS) for texto in textos}
+        tokens_unicos = list(dict.fromkeys(t for tokens in tokens_por_texto.values() for t in tokens))
+        correcciones = self._resolver_tokens(tokens_unicos)
+        return {texto: ''.join(correcciones[t] for t in tokens) for texto, tokens in tokens_por_texto.items()}
+
+    def corregir_serie(self, serie, nombre=None):
+        """Aplica la corrección a una Serie trabajando una sola vez por valor único."""
+        codigos, unicos = pd.factorize(serie)
+        corregibles = [u for u in unicos if texto_corregible(u)]
+        aciertos_previos, fallos_previos = self.aciertos, self.fallos
+        correcciones = self.corregir_textos(corregibles)
+
+        valores = np.array([correcciones.get(u, u) if texto_corregible(u) else u for u in unicos], dtype=object)
+        resultado = serie.copy() if serie.dtype == object else serie.astype(object)
+        validos = codigos >= 0
+        resultado[validos] = valores[codigos[validos]]
+
+        consultas = (self.aciertos - aciertos_previos) + (self.fallos - fallos_previos)
+        tasa = (self.aciertos - aciertos_previos) / consultas if consultas else 0.0
+        logging.info(
+            f"Corrección ortográfica{f' en {nombre!r}' if nombre else ''}: {len(serie)} valores, "
+            f"{len(corregibles)} únicos corregibles, {consultas} tokens únicos, tasa de aciertos de caché {tasa:.1%}."
+        )
+        return resultado
@@ -0,0 +1,108 @@
+# text_normalization.py
+import logging
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (necesario para el dtype 'string[pyarrow]')
+except ImportError:
+    pyarrow = None
+
+TIPOS_SALIDA = ('object', 'category', 'string[pyarrow]')
+
+def normalizar_valor(valor, minusculas=True):
+    """
+    Normaliza un texto en una sola pasada: split() sin argumentos quita el relleno de los
+    extremos y colapsa los espacios interiores a la vez; después, opcionalmente, pasa a minúsculas.
+    """
+    texto = ' '.join(valor.split())
+    return texto.lower() if minusculas else texto
+
+def _normalizar_unicos(valores, minusculas):
+    return np.array([normalizar_valor(v if isinstance(v, str) else str(v), minusculas) for v in valores], dtype=object)
+
+def unir_listas(serie, separador=', '):
+    """Convierte en texto los valores que son listas (autores, categorías de books.json)."""
+    valores = serie.to_numpy()
+    listas = np.fromiter((isinstance(v, list) for v in valores), dtype=bool, count=len(valores))
+    if not listas.any():
+        return serie
+    valores = valores.copy()
+    valores[listas] = [separador.join(map(str, v)) for v in valores[listas]]
+    return pd.Series(valores, index=serie.index, name=serie.name)
+
+def _tipo_salida(dtype):
+    if dtype not in TIPOS_SALIDA:
+        raise ValueError(f"Tipo de salida no soportado: {dtype}. Opciones: {TIPOS_SALIDA}")
+    if dtype == 'string[pyarrow]' and pyarrow is None:
+        logging.warning("pyarrow no está instalado. El texto normalizado se deja como object.")
+        return 'object'
+    return dtype
+
+def normalizar_categorias(serie, minusculas=False):
+    """
+    Normaliza una columna categórica trabajando solo sobre sus categorías. Si dos categorías
+    quedan iguales tras normalizarlas, se fusionan recodificando los códigos, sin tocar las filas.
+    """
+    normalizadas = _normalizar_unicos(serie.cat.categories, minusculas)
+    codigos_nuevos, categorias = pd.factorize(normalizadas)
+    if len(categorias) == len(normalizadas):
+        return serie.cat.rename_categories(categorias)
+    codigos = serie.cat.codes.to_numpy()
+    codigos = np.where(codigos >= 0, codigos_nuevos[codigos], -1)
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=categorias), index=serie.index, name=serie.name)
+
+def normalizar_serie(serie, minusculas=True, dtype='object', nulo=''):
+    """
+    Normaliza una columna de texto (relleno, espacios repetidos y, opcionalmente, mayúsculas).
+
+    Cada valor distinto se normaliza una sola vez: se factoriza la columna, se normalizan los
+    únicos y el resultado se reconstruye con los códigos, así que el coste por fila es un 'take'.
+    Las columnas categóricas se normalizan sobre sus categorías.
+
+    Parámetros:
+        minusculas (bool): pasar a minúsculas además de limpiar los espacios.
+        dtype (str): 'object', 'category' o 'string[pyarrow]'.
+        nulo: valor para los nulos ('' como la limpieza de texto de la Tarea 2; None los conserva).
+    """
+    dtype = _tipo_salida(dtype)
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        resultado = normalizar_categorias(serie, minusculas)
+        if nulo is not None and resultado.isna().any():
+            if nulo not in resultado.cat.categories:
+                resultado = resultado.cat.add_categories([nulo])
+            resultado = resultado.fillna(nulo)
+        return resultado if dtype == 'category' else resultado.astype(object if dtype == 'object' else dtype)
+
+    codigos, unicos = pd.factorize(unir_listas(serie))
+    nulos = codigos < 0
+    # Valores distintos que quedan iguales tras normalizar comparten código
+    codigos_unicos, categorias = pd.factorize(_normalizar_unicos(unicos, minusculas))
+    categorias = np.asarray(categorias, dtype=object)
+    codigos = codigos_unicos.take(np.where(nulos, 0, codigos)) if len(codigos_unicos) else codigos.copy()
+    codigos[nulos] = -1
+    if nulo is not None and nulos.any():
+        posicion = np.flatnonzero(categorias == nulo)
+        if len(posicion) == 0:
+            categorias = np.append(categorias, nulo)
+            posicion = [len(categorias) - 1]
+        codigos[nulos] = posicion[0]
+
+    if dtype == 'category':
+        valores = pd.Categorical.from_codes(codigos, categories=pd.Index(categorias, dtype=object))
+    else:
+        valores = categorias.take(codigos) if len(categorias) else np.empty(len(codigos), dtype=object)
+        # Sin valor de reemplazo, los nulos se conservan tal como venían (None o NaN)
+        valores[codigos < 0] = serie.to_numpy()[codigos < 0]
+    resultado = pd.Series(valores, index=serie.index, name=serie.name)
+    return resultado.astype(dtype) if dtype == 'string[pyarrow]' else resultado
+
+def normalizar_columnas(df, columnas, minusculas=True, dtype='object', nulo=''):
+    """Normaliza varias columnas de texto de un DataFrame (las que no existan se avisan y se omiten)."""
+    for col in columnas:
+        if col in df.columns:
+            df[col] = normalizar_serie(df[col], minusculas, dtype, nulo)
+        else:
+            logging.warning(f"Columna {col} no encontrada en el DataFrame.")
+    return df
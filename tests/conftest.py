@@ -0,0 +1,12 @@
+# conftest.py
+import pytest
+
+from tasks.storage import intermediate_store
+
+
+@pytest.fixture
+def almacen_temporal(tmp_path, monkeypatch):
+    """Almacén intermedio en un directorio temporal, en parquet si pyarrow está instalado."""
+    monkeypatch.setitem(intermediate_store._config, 'directorio', str(tmp_path / 'datasets'))
+    monkeypatch.setitem(intermediate_store._config, 'exportar_csv', False)
+    return tmp_path / 'datasets'
@@ -0,0 +1,53 @@
+# test_aggregation.py
+import numpy as np
+import pandas as pd
+
+from tasks.extraction.data_extraction import FuenteBloques
+from tasks.transformation.aggregation import (agregar, agregar_por_bloques, agregar_en_paralelo,
+                                              AGREGACIONES_TERRAZAS, AGREGACIONES_LICENCIAS)
+
+
+def _terrazas(semilla=0, filas=3000):
+    rng = np.random.default_rng(semilla)
+    distrito = rng.integers(1, 22, filas)
+    barrio = distrito * 10 + rng.integers(0, 5, filas)
+    return pd.DataFrame({
+        'id_distrito_local': distrito, 'desc_distrito_local': [f"DISTRITO {d}" for d in distrito],
+        'id_barrio_local': barrio, 'desc_barrio_local': [f"BARRIO {b}" for b in barrio],
+        'Superficie_ES': rng.uniform(1, 200, filas).round(2),
+        'mesas_es': rng.integers(0, 20, filas), 'sillas_es': rng.integers(0, 80, filas),
+    })
+
+
+def _por_bloques(df, filas):
+    return FuenteBloques('prueba', lambda: (df.iloc[i:i + filas] for i in range(0, len(df), filas)))
+
+
+def test_por_bloques_igual_que_completo():
+    df = _terrazas()
+    completo = agregar(df, AGREGACIONES_TERRAZAS)
+    # Más bloques que BLOQUES_POR_COMBINACION para pasar por las combinaciones intermedias
+    por_bloques = agregar_por_bloques(_por_bloques(df, 50), AGREGACIONES_TERRAZAS)
+    en_paralelo = agregar_en_paralelo([df.iloc[:1000], _por_bloques(df.iloc[1000:], 300)], AGREGACIONES_TERRAZAS)
+    for nombre in AGREGACIONES_TERRAZAS:
+        pd.testing.assert_frame_equal(por_bloques[nombre], completo[nombre], check_dtype=False)
+        pd.testing.assert_frame_equal(en_paralelo[nombre], completo[nombre], check_dtype=False)
+
+
+def test_igual_que_groupby():
+    df = _terrazas(1)
+    resultado = agregar(df, AGREGACIONES_TERRAZAS)['Terrazas_Por_Distrito']
+    esperado = df.groupby(['id_distrito_local', 'desc_distrito_local']).agg(
+        Cantidad_Terrazas=('mesas_es', 'size'), Mesas_ES=('mesas_es', 'sum'),
+        Sillas_ES=('sillas_es', 'sum'), Superficie_Media=('Superficie_ES', 'mean')).reset_index()
+    pd.testing.assert_frame_equal(resultado, esperado, check_dtype=False)
+
+
+def test_fuente_vacia_retorna_columnas():
+    vacia = FuenteBloques('vacia', lambda: iter(()))
+    for especificaciones in (AGREGACIONES_TERRAZAS, AGREGACIONES_LICENCIAS):
+        resultados = agregar_por_bloques(vacia, especificaciones)
+        assert set(resultados) == set(especificaciones)
+        for nombre, espec in especificaciones.items():
+            assert resultados[nombre].empty
+            assert list(resultados[nombre].columns) == espec['claves'] + list(espec['agregados'])
@@ -0,0 +1,42 @@
+# test_data_concatenation.py
+import numpy as np
+import pandas as pd
+
+from tasks.concatenation.data_concatenation import concatenate_datasets, task4_process_por_bloques
+from tasks.extraction.data_extraction import FuenteBloques
+
+
+def _mes(rng, filas=400):
+    return pd.DataFrame({'id_local': rng.integers(0, 80, filas), 'ref_licencia': rng.integers(0, 6, filas).astype(str),
+                         'valor': rng.integers(0, 3, filas)})
+
+
+def _referencia(meses):
+    """Última versión de cada licencia, con los meses en orden cronológico."""
+    return pd.concat(meses, ignore_index=True).drop_duplicates(['id_local', 'ref_licencia'], keep='last') \
+        .reset_index(drop=True)
+
+
+def test_concatenacion_por_meses_igual_que_referencia(almacen_temporal):
+    rng = np.random.default_rng(0)
+    abril, mayo, junio = _mes(rng), _mes(rng), _mes(rng)
+    fuente = concatenate_datasets(abril, mayo, [('202106', junio)])
+    partes = list(fuente)
+    assert len(partes) == 3
+    pd.testing.assert_frame_equal(pd.concat(partes, ignore_index=True), _referencia([abril, mayo, junio]))
+
+
+def test_un_solo_mes(almacen_temporal):
+    abril = _mes(np.random.default_rng(1))
+    pd.testing.assert_frame_equal(pd.concat(list(concatenate_datasets(abril)), ignore_index=True), abril)
+
+
+def test_por_bloques_igual_que_referencia():
+    rng = np.random.default_rng(2)
+    abril, mayo = _mes(rng), _mes(rng)
+
+    def por_bloques(df):
+        return FuenteBloques('mes', lambda: (df.iloc[i:i + 37] for i in range(0, len(df), 37)))
+
+    resultado = pd.concat(list(task4_process_por_bloques(por_bloques(abril), por_bloques(mayo))), ignore_index=True)
+    pd.testing.assert_frame_equal(resultado, _referencia([abril, mayo]))
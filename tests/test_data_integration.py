@@ -0,0 +1,28 @@
+# test_data_integration.py
+import numpy as np
+import pandas as pd
+
+from tasks.extraction.data_extraction import FuenteBloques
+from tasks.transformation.data_integration import join_terrazas_licencias_por_bloques
+
+
+def _por_bloques(df, filas):
+    return FuenteBloques('prueba', lambda: (df.iloc[i:i + filas] for i in range(0, len(df), filas)))
+
+
+def test_join_por_bloques_igual_que_merge():
+    rng = np.random.default_rng(0)
+    terrazas = pd.DataFrame({'id_local': rng.integers(0, 300, 1200), 'id_terraza': np.arange(1200),
+                             'rotulo': 'terraza'})
+    licencias = pd.DataFrame({'id_local': rng.integers(0, 400, 900), 'ref_licencia': np.arange(900).astype(str),
+                              'rotulo': 'licencia'})
+    # En streaming cada bloque puede llegar con otro ancho de entero; la clave debe caer en la misma partición
+    licencias_bloques = FuenteBloques('licencias', lambda: (
+        licencias.iloc[i:i + 100].astype({'id_local': 'int16' if i % 200 else 'int64'}) for i in range(0, 900, 100)))
+    fuente = join_terrazas_licencias_por_bloques(_por_bloques(terrazas, 150), licencias_bloques, n_particiones=4)
+
+    columnas = ['id_local', 'id_terraza', 'ref_licencia']
+    resultado = pd.concat(list(fuente), ignore_index=True).astype({'id_local': 'int64'})
+    esperado = pd.merge(terrazas, licencias, on='id_local')
+    pd.testing.assert_frame_equal(resultado.sort_values(columnas).reset_index(drop=True),
+                                  esperado.sort_values(columnas).reset_index(drop=True))
@@ -0,0 +1,141 @@
+# test_data_loading.py
+"""
+Cargas con COPY e incrementales contra PostgreSQL. Necesitan una base de datos de pruebas en
+ETL_TEST_DB_URL (p. ej. postgresql://usuario@localhost/dw_pruebas); sin ella se omiten.
+Las tablas que crean se borran al terminar.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from tasks.loading import table_layout
+from tasks.loading.table_layout import indice, particion_mensual
+
+TABLA = 'prueba_merge'
+TABLA_PARTICIONADA = 'prueba_merge_particionada'
+TABLA_COPY = 'prueba_copy'
+TABLA_COPY_PARTICIONADA = 'prueba_copy_particionada'
+TABLAS = (TABLA, TABLA_PARTICIONADA, TABLA_COPY, TABLA_COPY_PARTICIONADA)
+
+
+@pytest.fixture
+def base_datos(monkeypatch):
+    url = os.environ.get('ETL_TEST_DB_URL')
+    if not url:
+        pytest.skip("ETL_TEST_DB_URL no está definida.")
+    data_loading = pytest.importorskip('tasks.loading.data_loading')
+    db_pool = pytest.importorskip('tasks.loading.db_pool')
+    monkeypatch.setenv('ETL_DB_URL', url)
+    for tabla in (TABLA_PARTICIONADA, TABLA_COPY_PARTICIONADA):
+        monkeypatch.setitem(table_layout.PARTICIONES, tabla, particion_mensual('fecha'))
+    for tabla in (TABLA_COPY, TABLA_COPY_PARTICIONADA):
+        monkeypatch.setitem(table_layout.INDICES, tabla, [indice(['id']), indice(['descripcion', 'fecha'])])
+    db_pool.cerrar_pool()
+
+    def consultar(consulta):
+        conexion = db_pool.obtener_conexion()
+        try:
+            with conexion.cursor() as cursor:
+                cursor.execute(consulta)
+                return cursor.fetchall() if cursor.description else None
+        finally:
+            conexion.commit()
+            conexion.close()
+
+    def borrar():
+        for tabla in TABLAS:
+            consultar(f"DROP TABLE IF EXISTS {tabla}, {tabla}{data_loading.SUFIJO_STAGING} CASCADE")
+
+    borrar()
+    yield data_loading, consultar
+    borrar()
+    db_pool.cerrar_pool()
+
+
+def _licencias():
+    return pd.DataFrame({
+        'id': [1, 2, 3],
+        'descripcion': ['a', 'b', 'c'],
+        'fecha': pd.to_datetime(['2021-04-03', '2021-04-20', '2021-05-02']),
+    })
+
+
+@pytest.mark.parametrize('tabla', [TABLA, TABLA_PARTICIONADA])
+def test_merge_inserta_actualiza_y_conserva(base_datos, tabla):
+    data_loading, consultar = base_datos
+    df = _licencias()
+    assert data_loading.cargar_con_merge(df, tabla, ['id']) == {'insertadas': 3, 'actualizadas': 0, 'sin_cambios': 0}
+    assert data_loading.cargar_con_merge(df, tabla, ['id']) == {'insertadas': 0, 'actualizadas': 0, 'sin_cambios': 3}
+
+    # Cambia una fila, llega una clave nueva y desaparece otra: la que falta se conserva
+    cambios = pd.DataFrame({'id': [2, 4], 'descripcion': ['b2', 'd'],
+                            'fecha': pd.to_datetime(['2021-04-20', '2021-06-01'])})
+    assert data_loading.cargar_con_merge(cambios, tabla, ['id']) == {'insertadas': 1, 'actualizadas': 1, 'sin_cambios': 0}
+    assert consultar(f"SELECT id, descripcion FROM {tabla} ORDER BY id") == [(1, 'a'), (2, 'b2'), (3, 'c'), (4, 'd')]
+
+    particionada = consultar(f"SELECT relkind = 'p' FROM pg_class WHERE relname = '{tabla}'")[0][0]
+    assert particionada == (tabla == TABLA_PARTICIONADA)
+
+
+def test_merge_sobre_carga_completa(base_datos):
+    data_loading, consultar = base_datos
+    assert data_loading.load_to_data_warehouse(_licencias(), TABLA, if_exists='replace')
+    assert data_loading.cargar_con_merge(_licencias(), TABLA, ['id']) == {'insertadas': 0, 'actualizadas': 3, 'sin_cambios': 0}
+    assert data_loading.cargar_con_merge(_licencias(), TABLA, ['id']) == {'insertadas': 0, 'actualizadas': 0, 'sin_cambios': 3}
+    assert consultar(f"SELECT count(*) FROM {TABLA}") == [(3,)]
+
+
+def _relaciones(consultar, tabla):
+    """Tablas, particiones e índices cuyo nombre empieza por 'tabla'."""
+    return sorted(fila[0] for fila in consultar(f"SELECT relname FROM pg_class WHERE relname LIKE '{tabla}%' "
+                                               f"OR relname LIKE 'ix_{tabla}%'"))
+
+
+@pytest.mark.parametrize('tabla', [TABLA_COPY, TABLA_COPY_PARTICIONADA])
+def test_copy_reemplaza_con_staging(base_datos, tabla):
+    data_loading, consultar = base_datos
+    # Texto con separadores, comillas, saltos de línea y nulos, que COPY debe conservar
+    df = pd.DataFrame({
+        'id': [1, 2, 3],
+        'descripcion': ['a;b, "c"', 'línea\nsegunda', None],
+        'superficie': [1.5, float('nan'), 3.0],
+        'fecha': pd.to_datetime(['2021-04-03', '2021-04-20', '2021-05-02']),
+    })
+    assert data_loading.load_to_data_warehouse(df, tabla, if_exists='replace')
+    assert consultar(f"SELECT id, descripcion, superficie FROM {tabla} ORDER BY id") == [
+        (1, 'a;b, "c"', 1.5), (2, 'línea\nsegunda', None), (3, None, 3.0)]
+
+    # La segunda carga sustituye la tabla entera; índices y particiones quedan con el nombre final
+    assert data_loading.load_to_data_warehouse(df.tail(1), tabla, if_exists='replace')
+    assert consultar(f"SELECT id FROM {tabla}") == [(3,)]
+    relaciones = _relaciones(consultar, tabla)
+    assert not [r for r in relaciones if data_loading.SUFIJO_STAGING in r]
+    assert {f"ix_{tabla}_id", f"ix_{tabla}_descripcion_fecha"} <= set(relaciones)
+    if tabla == TABLA_COPY_PARTICIONADA:
+        assert consultar(f"SELECT relkind FROM pg_class WHERE relname = '{tabla}'") == [('p',)]
+        assert f"{tabla}_p202105" in relaciones
+
+
+def test_copy_fallido_conserva_la_tabla(base_datos, monkeypatch):
+    data_loading, consultar = base_datos
+    assert data_loading.load_to_data_warehouse(_licencias(), TABLA_COPY, if_exists='replace')
+
+    def copiar_dataframe(cursor, df, table_name, *args):
+        raise RuntimeError("COPY interrumpido")
+
+    monkeypatch.setattr(data_loading, 'copiar_dataframe', copiar_dataframe)
+    assert not data_loading.load_to_data_warehouse(_licencias().head(1), TABLA_COPY, if_exists='replace')
+    assert consultar(f"SELECT count(*) FROM {TABLA_COPY}") == [(3,)]
+    assert consultar(f"SELECT to_regclass('{TABLA_COPY}{data_loading.SUFIJO_STAGING}')") == [(None,)]
+
+
+def test_copy_anade_bloques_con_enteros_nulos(base_datos):
+    data_loading, consultar = base_datos
+    assert data_loading.load_to_data_warehouse(_licencias(), TABLA_COPY, if_exists='replace')
+    # Un bloque posterior en el que 'id' llega como float porque tiene nulos
+    bloque = pd.DataFrame({'id': [4.0, float('nan')], 'descripcion': ['d', 'e'],
+                           'fecha': pd.to_datetime(['2021-06-01', '2021-06-02'])})
+    assert data_loading.load_to_data_warehouse(bloque, TABLA_COPY, if_exists='append')
+    assert consultar(f"SELECT id, descripcion FROM {TABLA_COPY} ORDER BY descripcion") == [
+        (1, 'a'), (2, 'b'), (3, 'c'), (4, 'd'), (None, 'e')]
@@ -0,0 +1,44 @@
+# test_extended_json.py
+import pandas as pd
+import pytest
+
+from tasks.extraction.extended_json import leer_json_extendido, leer_json_extendido_por_bloques
+
+LIBROS = (
+    '{"_id": 1, "title": "A", "pageCount": {"$numberInt": "416"}, '
+    '"publishedDate": {"$date": "2009-04-01T00:00:00.000-0700"}, "authors": ["X", "Y"]}\n'
+    '{"_id": {"$oid": "5f1d7b2e9c1a4b3d2e6f7a8b"}, "title": "B", "pageCount": {"$numberLong": "592"}, '
+    '"publishedDate": {"$date": {"$numberLong": "1294992000000"}}, "authors": []}\n'
+)
+
+
+@pytest.fixture
+def ruta_json(tmp_path):
+    def escribir(texto):
+        ruta = tmp_path / 'libros.json'
+        ruta.write_text(texto, encoding='utf-8')
+        return str(ruta)
+    return escribir
+
+
+def test_decodifica_oid_date_y_numeros(ruta_json):
+    df = leer_json_extendido(ruta_json(LIBROS))
+    assert df['_id'].tolist() == ['1', '5f1d7b2e9c1a4b3d2e6f7a8b']
+    assert df['pageCount'].tolist() == [416, 592]
+    assert df['publishedDate'].tolist() == [pd.Timestamp('2009-04-01 07:00:00'), pd.Timestamp('2011-01-14 08:00:00')]
+    assert df['authors'].tolist() == [['X', 'Y'], []]
+
+
+def test_lineas_en_blanco_no_cortan_la_lectura_por_bloques(ruta_json):
+    ruta = ruta_json('{"a":1}\n\n{"a":2}\n')
+    bloques = list(leer_json_extendido_por_bloques(ruta, 1))
+    assert pd.concat(bloques, ignore_index=True)['a'].tolist() == [1, 2]
+    assert leer_json_extendido(ruta)['a'].tolist() == [1, 2]
+
+
+@pytest.mark.parametrize('chunksize', [1, 2, 3])
+def test_por_bloques_igual_que_completo(ruta_json, chunksize):
+    ruta = ruta_json(LIBROS + '\n   \n' + LIBROS)
+    completo = leer_json_extendido(ruta)
+    por_bloques = pd.concat(list(leer_json_extendido_por_bloques(ruta, chunksize)), ignore_index=True)
+    pd.testing.assert_frame_equal(por_bloques, completo)
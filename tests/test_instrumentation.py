@@ -0,0 +1,97 @@
+# test_instrumentation.py
+import json
+
+import pandas as pd
+import pytest
+
+from tasks.pipeline import instrumentation
+from tasks.pipeline.instrumentation import (instrumentar, medir, registrar_bytes, eventos, escribir_prometheus,
+                                            filas_de, reiniciar_eventos)
+
+
+@pytest.fixture(autouse=True)
+def eventos_limpios(tmp_path, monkeypatch):
+    for clave, valor in [('ruta_eventos', None), ('ruta_prometheus', None), ('perfilar', set()),
+                         ('perfilador', 'cprofile'), ('directorio_perfiles', str(tmp_path / 'perfiles'))]:
+        monkeypatch.setitem(instrumentation._config, clave, valor)
+    reiniciar_eventos()
+    yield
+    reiniciar_eventos()
+
+
+@instrumentar('carga_{table_name}')
+def cargar(df, table_name, if_exists='replace'):
+    registrar_bytes(escritos=100)
+    return True if if_exists == 'replace' else None
+
+
+@instrumentar()
+def duplicar(df):
+    registrar_bytes(leidos=10)
+    cargar(df, 'interna')
+    return pd.concat([df, df]), df.head(1)
+
+
+def test_nombre_filas_y_resultado():
+    df = pd.DataFrame({'a': range(4)})
+    cargar(df, 'licencias')
+    cargar(df, table_name='terrazas', if_exists='append')
+    licencias, terrazas = eventos('carga_licencias')[0], eventos('carga_terrazas')[0]
+    assert licencias['filas_entrada'] == 4 and licencias['filas_salida'] is None
+    assert licencias['correcta'] and not terrazas['correcta']
+    assert licencias['bytes_escritos'] == 100
+
+
+def test_bytes_cuentan_para_las_etapas_abiertas():
+    df = pd.DataFrame({'a': range(3)})
+    duplicar(df)
+    externa, interna = eventos('duplicar')[0], eventos('carga_interna')[0]
+    assert externa['filas_entrada'] == 3 and externa['filas_salida'] == 7
+    assert (externa['bytes_leidos'], externa['bytes_escritos']) == (10, 100)
+    assert (interna['bytes_leidos'], interna['bytes_escritos']) == (0, 100)
+    # Fuera de una medición, los bytes no se atribuyen a ninguna etapa
+    registrar_bytes(leidos=1)
+    assert eventos('duplicar')[0]['bytes_leidos'] == 10
+
+
+def test_error_se_registra_y_se_propaga():
+    with pytest.raises(RuntimeError):
+        with medir('fallida') as medicion:
+            medicion.filas_entrada = 5
+            raise RuntimeError("fallo")
+    evento = eventos('fallida')[0]
+    assert not evento['correcta'] and evento['filas_entrada'] == 5
+    assert evento['segundos'] >= 0 and evento['rss_pico_bytes'] > 0
+
+
+def test_eventos_json_y_prometheus(tmp_path, monkeypatch):
+    monkeypatch.setitem(instrumentation._config, 'ruta_eventos', str(tmp_path / 'logs' / 'eventos.jsonl'))
+    df = pd.DataFrame({'a': range(2)})
+    cargar(df, 'tabla')
+    cargar(df, 'tabla', if_exists='append')
+    with open(tmp_path / 'logs' / 'eventos.jsonl', encoding='utf-8') as f:
+        lineas = [json.loads(linea) for linea in f]
+    assert [e['etapa'] for e in lineas] == ['carga_tabla', 'carga_tabla']
+
+    ruta = escribir_prometheus(str(tmp_path / 'metricas' / 'etl.prom'))
+    with open(ruta, encoding='utf-8') as f:
+        texto = f.read()
+    assert '# TYPE etl_etapa_duracion_segundos gauge' in texto
+    # Solo cuenta la última ejecución de cada etapa
+    assert 'etl_etapa_correcta{etapa="carga_tabla"} 0' in texto
+    assert 'etl_etapa_filas_entrada{etapa="carga_tabla"} 2' in texto
+    assert 'etl_etapa_filas_salida{' not in texto
+
+
+def test_perfil_cprofile(tmp_path, monkeypatch):
+    monkeypatch.setitem(instrumentation._config, 'perfilar', {'duplicar'})
+    duplicar(pd.DataFrame({'a': [1]}))
+    assert (tmp_path / 'perfiles' / 'perfil_duplicar.prof').exists()
+    assert not (tmp_path / 'perfiles' / 'perfil_carga_interna.prof').exists()
+
+
+def test_filas_de():
+    df = pd.DataFrame({'a': range(3)})
+    assert filas_de(df) == 3
+    assert filas_de((df, None, df.head(1))) == 4
+    assert filas_de([None, 'texto']) is None and filas_de(True) is None
@@ -0,0 +1,87 @@
+# test_intermediate_store.py
+import pandas as pd
+import pytest
+
+from tasks.storage import intermediate_store
+from tasks.storage.intermediate_store import (guardar_intermedio, leer_intermedio, iniciar_bloques_intermedios,
+                                              guardar_bloque_intermedio, leer_bloques_intermedios, FORMATOS)
+
+
+@pytest.fixture(params=FORMATOS)
+def formato(request, almacen_temporal, monkeypatch):
+    if request.param != 'csv':
+        pytest.importorskip('pyarrow')
+    monkeypatch.setitem(intermediate_store._config, 'formato', request.param)
+    return request.param
+
+
+def _datos(inicio=0, filas=5):
+    return pd.DataFrame({'id': range(inicio, inicio + filas), 'superficie': [x * 1.5 for x in range(filas)],
+                         'distrito': [f"D{x % 2}" for x in range(filas)]})
+
+
+def test_ida_y_vuelta(formato, almacen_temporal):
+    df = _datos()
+    ruta = guardar_intermedio(df, 'Resultado')
+    assert ruta.endswith(f".{formato}")
+    pd.testing.assert_frame_equal(leer_intermedio('Resultado'), df)
+    pd.testing.assert_frame_equal(leer_intermedio('Resultado', columnas=['id', 'distrito']), df[['id', 'distrito']])
+
+
+def test_tipos_columnares(formato, almacen_temporal):
+    if formato == 'csv':
+        pytest.skip("El CSV no conserva fechas ni categorías.")
+    df = _datos().assign(fecha=pd.date_range('2021-04-01', periods=5),
+                         distrito=lambda d: d['distrito'].astype('category'))
+    guardar_intermedio(df, 'Resultado')
+    pd.testing.assert_frame_equal(leer_intermedio('Resultado'), df)
+
+
+def test_partes_en_orden(formato, almacen_temporal):
+    guardar_intermedio(_datos(100), 'Resultado')  # Versión anterior en un solo archivo
+    iniciar_bloques_intermedios('Resultado')
+    partes = [_datos(0, 3), _datos(3, 4), _datos(7, 2)]
+    # Se escriben desordenadas, como las particiones que terminan antes
+    for indice in (2, 0, 1):
+        guardar_bloque_intermedio(partes[indice], 'Resultado', indice)
+
+    esperado = pd.concat(partes, ignore_index=True)
+    pd.testing.assert_frame_equal(leer_intermedio('Resultado'), esperado)
+    bloques = list(leer_bloques_intermedios('Resultado'))
+    assert [bloque['id'].tolist() for bloque in bloques] == [parte['id'].tolist() for parte in partes]
+
+
+def test_guardar_completo_borra_las_partes(formato, almacen_temporal):
+    iniciar_bloques_intermedios('Resultado')
+    guardar_bloque_intermedio(_datos(0, 3), 'Resultado', 0)
+    guardar_intermedio(_datos(50), 'Resultado')
+    assert not (almacen_temporal / 'Resultado').exists()
+    assert leer_intermedio('Resultado')['id'].tolist() == list(range(50, 55))
+
+
+def test_exportacion_csv_y_json(almacen_temporal, monkeypatch):
+    pytest.importorskip('pyarrow')
+    monkeypatch.setitem(intermediate_store._config, 'formato', 'parquet')
+    monkeypatch.setitem(intermediate_store._config, 'exportar_csv', True)
+    guardar_intermedio(_datos(), 'Tabla')
+    iniciar_bloques_intermedios('Libros')
+    guardar_bloque_intermedio(_datos(0, 2), 'Libros', 0, exportacion='json')
+    guardar_bloque_intermedio(_datos(2, 2), 'Libros', 1, exportacion='json')
+    assert (almacen_temporal / 'Tabla.parquet').exists() and (almacen_temporal / 'Tabla.csv').exists()
+    assert sorted(p.name for p in (almacen_temporal / 'Libros').iterdir()) == [
+        'part-00000.json', 'part-00000.parquet', 'part-00001.json', 'part-00001.parquet']
+    # Cada parte se lee una sola vez aunque esté exportada
+    assert leer_intermedio('Libros')['id'].tolist() == [0, 1, 2, 3]
+
+
+def test_tipos_mezclados_se_guardan_en_csv(almacen_temporal, monkeypatch):
+    pytest.importorskip('pyarrow')
+    monkeypatch.setitem(intermediate_store._config, 'formato', 'parquet')
+    df = pd.DataFrame({'id': [1, 2], 'valor': [1, 'a']})
+    assert guardar_intermedio(df, 'Mezclado').endswith('.csv')
+    assert leer_intermedio('Mezclado')['valor'].astype(str).tolist() == ['1', 'a']
+
+
+def test_resultado_inexistente(almacen_temporal):
+    with pytest.raises(FileNotFoundError):
+        leer_intermedio('No_Existe')
@@ -0,0 +1,68 @@
+# test_mmap_csv.py
+import mmap
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tasks.extraction.mmap_csv import leer_csv_mmap, limites_filas, RangosInconsistentes
+
+OPCIONES = {'dtype': {'desc_distrito': 'category', 'superficie': 'float64', 'rotulo': 'object'}, 'decimal': ','}
+
+
+@pytest.fixture
+def export_municipal(tmp_path):
+    """CSV como los exports de Madrid: ';', Latin-1, decimales con ',' y campos vacíos."""
+    rng = np.random.default_rng(0)
+    distritos = ['CENTRO', 'CHAMBERÍ', 'TETUÁN', 'SALAMANCA']
+    lineas = ['id_local;desc_distrito;superficie;rotulo;num']
+    for i in range(600):
+        distrito = distritos[i % 4] if i % 37 else ''
+        superficie = f"{rng.random() * 100:.2f}".replace('.', ',') if i % 11 else ''
+        rotulo = f"CAFETERÍA Nº {i}" if i % 13 else ''
+        lineas.append(f"{280000 + i};{distrito};{superficie};{rotulo};{i % 7}")
+    ruta = tmp_path / 'export.csv'
+    ruta.write_bytes(('\n'.join(lineas) + '\n').encode('ISO-8859-1'))
+    return str(ruta)
+
+
+@pytest.mark.parametrize('motor', ['c', 'pyarrow'])
+def test_igual_que_read_csv(export_municipal, motor):
+    if motor == 'pyarrow':
+        pytest.importorskip('pyarrow')
+    esperado = pd.read_csv(export_municipal, sep=';', encoding='ISO-8859-1', **OPCIONES)
+    resultado = leer_csv_mmap(export_municipal, max_workers=1, motor=motor, tamano_rango=1000, **OPCIONES)
+    pd.testing.assert_frame_equal(resultado, esperado)
+    # Los nulos de texto son NaN con los dos motores, como en pd.read_csv
+    assert not resultado['rotulo'].map(lambda valor: valor is None).any()
+
+
+def test_rangos_en_procesos(export_municipal):
+    esperado = pd.read_csv(export_municipal, sep=';', encoding='ISO-8859-1', **OPCIONES)
+    resultado = leer_csv_mmap(export_municipal, max_workers=2, tamano_rango=4000, **OPCIONES)
+    pd.testing.assert_frame_equal(resultado, esperado)
+
+
+def test_sin_filas_y_sin_salto_final(tmp_path):
+    solo_cabecera = tmp_path / 'vacio.csv'
+    solo_cabecera.write_bytes(b'a;b\n')
+    assert leer_csv_mmap(str(solo_cabecera), max_workers=1).columns.tolist() == ['a', 'b']
+    sin_salto = tmp_path / 'sin_salto.csv'
+    sin_salto.write_bytes(b'a;b\n1;2\n3;4')
+    assert leer_csv_mmap(str(sin_salto), max_workers=1, tamano_rango=4)['b'].tolist() == [2, 4]
+
+
+def test_limites_filas(export_municipal):
+    with open(export_municipal, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        inicio = mm.find(b'\n') + 1
+        rangos = limites_filas(mm, 7, inicio)
+        assert rangos[0][0] == inicio and rangos[-1][1] == len(mm)
+        assert all(fin == siguiente for (_, fin), (siguiente, _) in zip(rangos, rangos[1:]))
+        assert all(mm[fin - 1:fin] == b'\n' for _, fin in rangos)
+
+
+def test_salto_de_linea_entre_comillas(tmp_path):
+    ruta = tmp_path / 'comillas.csv'
+    ruta.write_bytes(b'a;b\n' + b'1;x\n' * 50 + b'2;"dos\nlineas"\n' + b'3;y\n' * 50)
+    with pytest.raises((RangosInconsistentes, pd.errors.ParserError)):
+        leer_csv_mmap(str(ruta), max_workers=1, tamano_rango=64)
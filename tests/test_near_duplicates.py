@@ -0,0 +1,84 @@
+# test_near_duplicates.py
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from tasks.transformation.near_duplicates import (firmas_minhash, componentes_conexas, detectar_casi_duplicados,
+                                                  aplicar_politica_duplicados, CLAVE_TERRAZAS)
+
+
+def _trigramas(texto):
+    texto = texto.ljust(3)
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def _componentes_bfs(n, pares):
+    vecinos = [[] for _ in range(n)]
+    for i, j in pares:
+        vecinos[i].append(j)
+        vecinos[j].append(i)
+    etiquetas = np.full(n, -1)
+    for inicio in range(n):
+        if etiquetas[inicio] >= 0:
+            continue
+        componente, cola = [inicio], deque([inicio])
+        etiquetas[inicio] = inicio
+        while cola:
+            for vecino in vecinos[cola.popleft()]:
+                if etiquetas[vecino] < 0:
+                    etiquetas[vecino] = inicio
+                    componente.append(vecino)
+                    cola.append(vecino)
+        etiquetas[componente] = min(componente)
+    return etiquetas
+
+
+def test_minhash_estima_jaccard_de_trigramas():
+    pares = [('BAR LA PLAZA', 'BAR LA PLAZA'), ('CAFETERIA EL SOL', 'CAFETERIA EL SOL S.L.'),
+             ('RESTAURANTE CASA PEPE', 'CASA PEPE RESTAURANTE'), ('TABERNA', 'PIZZERIA NAPOLI')]
+    firmas = firmas_minhash([t for par in pares for t in par], num_permutaciones=256)
+    for k, (a, b) in enumerate(pares):
+        jaccard = len(_trigramas(a) & _trigramas(b)) / len(_trigramas(a) | _trigramas(b))
+        estimada = (firmas[2 * k] == firmas[2 * k + 1]).mean()
+        assert abs(estimada - jaccard) < 0.1
+    assert firmas_minhash([]).shape == (0, 32)
+
+
+def test_componentes_conexas_igual_que_bfs():
+    rng = np.random.default_rng(0)
+    for n, m in [(1, 0), (10, 4), (500, 300), (2000, 1900)]:
+        pares = rng.integers(0, n, (m, 2))
+        pares = pares[pares[:, 0] != pares[:, 1]]
+        np.testing.assert_array_equal(componentes_conexas(n, pares), _componentes_bfs(n, pares))
+    # Cadena larga: la compresión de caminos tiene que llegar al extremo
+    cadena = np.column_stack([np.arange(1, 1000), np.arange(999)])
+    assert (componentes_conexas(1000, cadena) == 0).all()
+
+
+def _locales():
+    return pd.DataFrame({
+        'id_local': [1, 2, 3, 4, 5],
+        'Cod_Postal': [28001, 28001, 28001, 28002, 28002],
+        'id_barrio_local': [11, 11, 11, 12, 12],
+        'rotulo': ['BAR LA PLAZA', 'BAR  la plaza', 'ZAPATERIA LOPEZ', 'BAR LA PLAZA', 'CAFE CENTRAL'],
+        'nom_edificio': ['', '', '', '', ''],
+        'desc_vial_edificio': ['MAYOR', 'MAYOR', 'MAYOR', 'MAYOR', 'ALCALA'],
+    })
+
+
+def test_detecta_solo_duplicados_del_mismo_bloque():
+    clusters, estadisticas = detectar_casi_duplicados(_locales())
+    assert sorted(clusters['id_local']) == [1, 2]
+    assert set(clusters['id_canonico']) == {1}
+    assert estadisticas['entidades_duplicadas'] == 1
+
+
+def test_politica_eliminar_conserva_terrazas_distintas():
+    clusters, _ = detectar_casi_duplicados(_locales())
+    terrazas = pd.DataFrame({'id_terraza': [10, 11, 12, 10], 'id_local': [1, 2, 3, 2]})
+    eliminadas = aplicar_politica_duplicados(terrazas, clusters, 'eliminar', clave=CLAVE_TERRAZAS)
+    assert sorted(eliminadas['id_terraza']) == [10, 11, 12]
+    assert set(eliminadas['id_local']) == {1, 3}
+    canonicas = aplicar_politica_duplicados(terrazas, clusters, 'canonico')
+    assert canonicas['id_local'].tolist() == [1, 1, 3, 1]
@@ -0,0 +1,60 @@
+# test_numeric_normalization.py
+import numpy as np
+import pandas as pd
+
+from tasks.transformation.numeric_normalization import EstadisticasWelford, ajustar_estadisticas
+
+
+def _datos(semilla=0, filas=5000):
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        'entero': rng.integers(-1000, 100000, filas).astype('int32'),
+        'decimal': rng.normal(1e6, 250.0, filas),
+        'con_nulos': np.where(rng.random(filas) < 0.1, np.nan, rng.random(filas) * 3000),
+        'texto': 'a',
+    })
+
+
+def _esperado(df, columna):
+    valores = df[columna].dropna().to_numpy(dtype='float64')
+    return valores.mean(), valores.std(ddof=1), valores.min(), valores.max()
+
+
+def test_estadisticas_iguales_a_numpy():
+    df = _datos()
+    estadisticas = EstadisticasWelford.desde_dataframe(df)
+    assert estadisticas.columnas == ['entero', 'decimal', 'con_nulos']
+    for i, columna in enumerate(estadisticas.columnas):
+        media, desviacion, minimo, maximo = _esperado(df, columna)
+        np.testing.assert_allclose(estadisticas.media[i], media, rtol=1e-12)
+        np.testing.assert_allclose(estadisticas.desviacion[i], desviacion, rtol=1e-9)
+        assert (estadisticas.minimo[i], estadisticas.maximo[i]) == (minimo, maximo)
+
+
+def test_bloques_y_combinacion_iguales_a_una_pasada():
+    df = _datos(1)
+    completa = EstadisticasWelford.desde_dataframe(df)
+    por_bloques = EstadisticasWelford()
+    for inicio in range(0, len(df), 333):
+        por_bloques.actualizar(df.iloc[inicio:inicio + 333], completa.columnas)
+    mitades = EstadisticasWelford.desde_dataframe(df.iloc[:1234]).combinar(EstadisticasWelford.desde_dataframe(df.iloc[1234:]))
+    for otra in (por_bloques, mitades):
+        np.testing.assert_allclose(otra.media, completa.media, rtol=1e-12)
+        np.testing.assert_allclose(otra.desviacion, completa.desviacion, rtol=1e-9)
+        np.testing.assert_array_equal(otra.n, completa.n)
+
+
+def test_persistencia_y_actualizacion(tmp_path):
+    ruta = str(tmp_path / 'normalizacion.json')
+    primera, segunda = _datos(2), _datos(3)
+    guardadas = ajustar_estadisticas(primera, ruta=ruta)
+    reutilizadas = ajustar_estadisticas(segunda, ruta=ruta)
+    np.testing.assert_array_equal(reutilizadas.media, guardadas.media)
+
+    actualizadas = ajustar_estadisticas(segunda, ruta=ruta, actualizar=True)
+    ambas = pd.concat([primera, segunda], ignore_index=True)
+    for i, columna in enumerate(actualizadas.columnas):
+        media, desviacion, _, _ = _esperado(ambas, columna)
+        np.testing.assert_allclose(actualizadas.media[i], media, rtol=1e-12)
+        np.testing.assert_allclose(actualizadas.desviacion[i], desviacion, rtol=1e-9)
+    np.testing.assert_array_equal(EstadisticasWelford.cargar(ruta).n, actualizadas.n)
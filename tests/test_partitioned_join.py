@@ -0,0 +1,61 @@
+# test_partitioned_join.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from tasks.extraction.data_extraction import FuenteBloques
+from tasks.storage.intermediate_store import leer_intermedio
+from tasks.transformation.partitioned_join import unir_particionado
+
+
+def _lados(semilla=0):
+    rng = np.random.default_rng(semilla)
+    izquierda = pd.DataFrame({'k': rng.integers(0, 200, 2000), 'j': rng.integers(0, 3, 2000),
+                              'x': rng.random(2000), 'comun': 'izquierda'})
+    derecha = pd.DataFrame({'k': rng.integers(0, 250, 1500), 'j': rng.integers(0, 3, 1500),
+                            'y': rng.random(1500), 'comun': 'derecha'})
+    return izquierda, derecha
+
+
+@pytest.mark.parametrize('how', ['inner', 'left'])
+@pytest.mark.parametrize('clave', ['k', ['k', 'j']])
+def test_mismo_resultado_que_merge(how, clave):
+    izquierda, derecha = _lados()
+    esperado = pd.merge(izquierda, derecha, on=clave, how=how)
+    resultado = unir_particionado(izquierda, derecha, clave, n_particiones=7, max_workers=2, how=how)
+    pd.testing.assert_frame_equal(resultado, esperado)
+
+
+def test_claves_con_distinto_dtype_y_nulos():
+    # id_local entero en un lado y float64 con nulos en el otro, como lo deja aplicar_esquema
+    izquierda, derecha = _lados(2)
+    derecha['k'] = derecha['k'].astype('float64')
+    derecha.loc[::50, 'k'] = np.nan
+    izquierda = pd.concat([izquierda, izquierda.head(20).assign(k=np.nan)], ignore_index=True)
+    izquierda['k'] = izquierda['k'].astype('Int64')
+    esperado = pd.merge(izquierda, derecha, on='k', how='inner')
+    resultado = unir_particionado(izquierda, derecha, 'k', n_particiones=7, max_workers=2)
+    assert len(resultado) == len(esperado)
+    pd.testing.assert_frame_equal(resultado, esperado)
+
+
+def test_partes_guardadas_por_particion(almacen_temporal):
+    izquierda, derecha = _lados(1)
+    esperado = pd.merge(izquierda, derecha, on='k', how='inner')
+    fuente = unir_particionado(izquierda, derecha, 'k', n_particiones=5, max_workers=2, nombre_salida='Unido')
+    assert isinstance(fuente, FuenteBloques)
+    assert len(list((almacen_temporal / 'Unido').glob('part-*'))) == 5
+    # Mismas filas que pd.merge, agrupadas por partición y en el orden de pd.merge dentro de cada una
+    partes = list(fuente)
+    for parte in partes:
+        pd.testing.assert_frame_equal(parte, esperado[esperado['k'].isin(parte['k'])].reset_index(drop=True))
+    unido = pd.concat(partes, ignore_index=True)
+    pd.testing.assert_frame_equal(unido.sort_values(['x', 'y'], ignore_index=True),
+                                  esperado.sort_values(['x', 'y'], ignore_index=True))
+    pd.testing.assert_frame_equal(leer_intermedio('Unido'), unido)
+
+
+def test_how_no_soportado():
+    izquierda, derecha = _lados()
+    with pytest.raises(ValueError):
+        unir_particionado(izquierda, derecha, 'k', how='outer')
@@ -0,0 +1,84 @@
+# test_scheduler.py
+import pandas as pd
+import pytest
+
+from tasks.extraction.data_extraction import FuenteBloques
+from tasks.pipeline.scheduler import Etapa, ErrorEtapa, ejecutar_grafo
+
+
+@pytest.fixture
+def main_etl(tmp_path, monkeypatch):
+    # main_etl crea 'logs/' en el directorio actual al importarse y necesita la configuración de la base de datos
+    monkeypatch.chdir(tmp_path)
+    pytest.importorskip('tasks.loading.data_loading')
+    import main_etl
+    return main_etl
+
+
+def _fallar(*_):
+    raise ErrorEtapa("La validación falló.")
+
+
+def test_error_etapa_salta_dependientes():
+    ejecutadas = []
+
+    def registrar(nombre):
+        return lambda *_: ejecutadas.append(nombre) or nombre
+
+    grafo = [
+        Etapa('origen', registrar('origen')),
+        Etapa('validacion', _fallar, ['origen']),
+        Etapa('dependiente', registrar('dependiente'), ['validacion']),
+        Etapa('indirecta', registrar('indirecta'), ['dependiente']),
+    ]
+    resultados, completado = ejecutar_grafo(grafo, max_workers=2)
+    assert not completado
+    assert ejecutadas == ['origen']
+    assert set(resultados) == {'origen'}
+
+
+def test_resultados_de_las_dependencias_en_orden():
+    grafo = [
+        Etapa('a', lambda: 2),
+        Etapa('b', lambda: 3),
+        Etapa('producto', lambda a, b: a * b, ['a', 'b']),
+        Etapa('resta', lambda b, a: b - a, ['b', 'a']),
+    ]
+    resultados, completado = ejecutar_grafo(grafo, max_workers=4)
+    assert completado
+    assert resultados['producto'] == 6 and resultados['resta'] == 1
+
+
+def test_ciclo_y_dependencia_desconocida():
+    with pytest.raises(ValueError):
+        ejecutar_grafo([Etapa('a', lambda b: b, ['b']), Etapa('b', lambda a: a, ['a'])])
+    with pytest.raises(ValueError):
+        ejecutar_grafo([Etapa('a', lambda x: x, ['x'])])
+
+
+def test_carga_fallida_salta_el_modelado(main_etl, monkeypatch):
+    monkeypatch.setattr(main_etl, 'load_to_data_warehouse', lambda *args, **kwargs: None)
+    modelado = []
+    grafo = [
+        Etapa('datos', lambda: pd.DataFrame({'a': [1, 2]})),
+        Etapa('carga', lambda df: main_etl.cargar_tabla(df, 'tabla'), ['datos']),
+        Etapa('modelado', lambda _: modelado.append(True), ['carga']),
+    ]
+    resultados, completado = ejecutar_grafo(grafo)
+    assert not completado
+    assert 'carga' not in resultados and not modelado
+
+
+def test_carga_por_bloques_fallida(main_etl, monkeypatch):
+    modos = []
+
+    def load_to_data_warehouse(df, table_name, if_exists='replace'):
+        modos.append(if_exists)
+        return if_exists == 'replace'
+
+    monkeypatch.setattr(main_etl, 'load_to_data_warehouse', load_to_data_warehouse)
+    bloques = [pd.DataFrame({'a': [1]}), pd.DataFrame({'a': [2]}), pd.DataFrame({'a': [3]})]
+    with pytest.raises(ErrorEtapa):
+        main_etl.cargar_tabla(FuenteBloques('datos', lambda: iter(bloques)), 'tabla')
+    # El primer bloque reemplaza la tabla; la carga se detiene en el primer bloque que falla
+    assert modos == ['replace', 'append']
@@ -0,0 +1,62 @@
+# test_schemas.py
+import io
+
+import numpy as np
+import pandas as pd
+
+from tasks.extraction.schemas import aplicar_esquema, columnas_no_normalizables, opciones_lectura_csv
+
+# Export municipal: ';', decimales con ',' y fechas dd/mm/yyyy, con el relleno de espacios de origen
+EXPORT_LICENCIAS = (
+    "id_local;id_distrito_local;desc_distrito_local;coordenada_x_local;Cod_Postal;ref_licencia;"
+    "Fecha_Dec_Lic;num_edificio;columna_nueva\n"
+    "280001;1;CENTRO      ;440123,5;28013;  LIC/2021  001 ;01/04/2021;12;x\n"
+    "280002;1;  CENTRO;440200,25;;LIC/2021/002;31/04/2021;;y\n"
+    "280003;2;ARGANZUELA  ;;28045;LIC/2021/003;15/05/2021;7;z\n"
+)
+
+
+def _leer(texto, esquema):
+    df = pd.read_csv(io.StringIO(texto), sep=';', **opciones_lectura_csv(esquema))
+    return aplicar_esquema(df, esquema)
+
+
+def test_tipos_del_esquema():
+    df = _leer(EXPORT_LICENCIAS, 'licencias')
+    # Enteros reducidos; con nulos, float32 si caben sin pérdida
+    assert df['id_local'].dtype == np.int32 and df['id_distrito_local'].dtype == np.int8
+    assert df['Cod_Postal'].dtype == np.float32 and df['num_edificio'].dtype == np.float32
+    assert df['coordenada_x_local'].tolist()[:2] == [440123.5, 440200.25]
+    assert df['Fecha_Dec_Lic'].tolist()[0] == pd.Timestamp('2021-04-01')
+    assert df['Fecha_Dec_Lic'].isna().tolist() == [False, True, False]  # 31/04 no existe
+
+
+def test_recorta_y_fusiona_categorias():
+    df = _leer(EXPORT_LICENCIAS, 'licencias')
+    assert isinstance(df['desc_distrito_local'].dtype, pd.CategoricalDtype)
+    assert df['desc_distrito_local'].tolist() == ['CENTRO', 'CENTRO', 'ARGANZUELA']
+    assert sorted(df['desc_distrito_local'].cat.categories) == ['ARGANZUELA', 'CENTRO']
+    assert df['ref_licencia'].tolist() == ['LIC/2021 001', 'LIC/2021/002', 'LIC/2021/003']
+
+
+def test_columnas_sin_declarar(caplog):
+    df = _leer(EXPORT_LICENCIAS, 'licencias')
+    assert df['columna_nueva'].tolist() == ['x', 'y', 'z']
+    assert 'columna_nueva' in caplog.text
+
+
+def test_columnas_no_normalizables():
+    df = _leer(EXPORT_LICENCIAS, 'licencias')
+    assert columnas_no_normalizables(df, 'licencias') == ['id_local', 'id_distrito_local', 'coordenada_x_local',
+                                                          'Cod_Postal']
+
+
+def test_esquema_books():
+    df = pd.DataFrame({'_id': [1, 2], 'pageCount': ['416', None], 'status': ['PUBLISH', 'MEAP'],
+                       'authors': [['A'], []], 'publishedDate': ['01/04/2009', None]})
+    df = aplicar_esquema(df, 'books')
+    assert df['pageCount'].tolist()[0] == 416 and np.isnan(df['pageCount'].tolist()[1])
+    assert isinstance(df['status'].dtype, pd.CategoricalDtype)
+    assert df['authors'].tolist() == [['A'], []]
+    assert columnas_no_normalizables(df, 'books') == ['_id']
+
@@ -0,0 +1,56 @@
+# test_spatial_index.py
+import numpy as np
+import pytest
+
+from tasks.transformation.spatial_index import IndiceRejilla
+
+
+def _puntos(semilla=0, n=3000):
+    rng = np.random.default_rng(semilla)
+    # Puntos agrupados (como las terrazas de un barrio), algunos dispersos y algunos sin coordenadas
+    centros_x, centros_y = rng.uniform(440000, 446000, 20), rng.uniform(4470000, 4476000, 20)
+    x = np.concatenate([rng.normal(c, 80, n // 20) for c in centros_x] + [rng.uniform(440000, 446000, 50)])
+    y = np.concatenate([rng.normal(c, 80, n // 20) for c in centros_y] + [rng.uniform(4470000, 4476000, 50)])
+    x[::97] = np.nan
+    return x, y
+
+
+def _distancias(x, y, qx, qy):
+    return np.hypot(x[None, :] - qx[:, None], y[None, :] - qy[:, None])
+
+
+@pytest.mark.parametrize('tamano_celda', [None, 10.0, 400.0])
+def test_vecinos_en_radio_igual_que_fuerza_bruta(tamano_celda):
+    x, y = _puntos()
+    indice = IndiceRejilla(x, y, tamano_celda)
+    validos = np.flatnonzero(np.isfinite(x))[:400]
+    qx, qy = x[validos], y[validos] + 5.0
+    consulta, punto, distancia = indice.vecinos_en_radio(qx, qy, 50.0, lote=97)
+
+    distancias = _distancias(x, y, qx, qy)
+    esperados = {(int(i), int(j)) for i, j in zip(*np.nonzero(distancias <= 50.0))}
+    assert set(zip(consulta.tolist(), punto.tolist())) == esperados
+    np.testing.assert_allclose(distancia, distancias[consulta, punto])
+    np.testing.assert_array_equal(indice.contar_en_radio(qx, qy, 50.0),
+                                  np.nan_to_num(distancias <= 50.0).sum(axis=1))
+
+
+@pytest.mark.parametrize('k', [1, 5])
+def test_k_vecinos_igual_que_fuerza_bruta(k):
+    x, y = _puntos(1)
+    indice = IndiceRejilla(x, y)
+    rng = np.random.default_rng(2)
+    qx, qy = rng.uniform(439000, 447000, 300), rng.uniform(4469000, 4477000, 300)
+    puntos, distancias = indice.k_vecinos(qx, qy, k, lote=50)
+
+    todas = np.where(np.isnan(_distancias(x, y, qx, qy)), np.inf, _distancias(x, y, qx, qy))
+    esperadas = np.sort(todas, axis=1)[:, :k]
+    np.testing.assert_allclose(distancias, esperadas)
+    np.testing.assert_allclose(todas[np.arange(len(qx))[:, None], puntos], esperadas)
+
+
+def test_k_mayor_que_los_puntos_indexados():
+    indice = IndiceRejilla([440000.0, 440010.0, 0.0], [4470000.0, 4470000.0, 0.0], 5.0)  # 0: sin georreferenciar
+    puntos, distancias = indice.k_vecinos([440001.0], [4470000.0], 3)
+    assert puntos.tolist() == [[0, 1, -1]]
+    assert distancias[0, 2] == np.inf
@@ -0,0 +1,53 @@
+# test_spell_correction.py
+import numpy as np
+import pandas as pd
+import pytest
+
+textblob = pytest.importorskip('textblob')
+pytest.importorskip('nltk')
+
+from tasks.transformation.spell_correction import CorrectorOrtografico, LONGITUD_MAXIMA
+
+
+def _correccion_original(text):
+    # Corrección anterior al motor memoizado: TextBlob sobre cada valor de menos de 100 caracteres
+    if isinstance(text, str) and len(text) < LONGITUD_MAXIMA:
+        return str(textblob.TextBlob(text).correct())
+    return text
+
+
+# Sin pool y con un pool de procesos para todos los tokens nuevos
+@pytest.mark.parametrize('max_workers, min_tokens_pool', [(1, 500), (2, 1)])
+def test_igual_que_textblob(tmp_path, max_workers, min_tokens_pool):
+    largo = 'Terraza en la calle Mayr con vistass a la plaza, ' * 3
+    serie = pd.Series(['Helo, wrld!', 'teh  cat (smal)', '', 'Helo, wrld!', largo, largo[:LONGITUD_MAXIMA - 1],
+                       np.nan, 'CAFETERIA  LA  PLAZA;', '', 'speling: misteak...', 42, 'teh  cat (smal)'])
+    corrector = CorrectorOrtografico(ruta_cache=str(tmp_path / 'cache.json'), max_workers=max_workers,
+                                     min_tokens_pool=min_tokens_pool)
+    resultado = corrector.corregir_serie(serie)
+    pd.testing.assert_series_equal(resultado, serie.map(_correccion_original))
+    assert resultado[4] == largo
+
+
+def test_cache_persistente(tmp_path):
+    ruta = str(tmp_path / 'cache' / 'correccion.json')
+    corrector = CorrectorOrtografico(ruta_cache=ruta, max_workers=1)
+    esperado = corrector.corregir_textos(['Helo, wrld!', 'teh cat'])
+    corrector.guardar()
+
+    recargado = CorrectorOrtografico(ruta_cache=ruta, max_workers=1)
+    assert list(recargado.cache.items()) == list(corrector.cache.items())
+    assert recargado.corregir_textos(['Helo, wrld!', 'teh cat']) == esperado
+    assert recargado.fallos == 0 and recargado.tasa_aciertos == 1.0
+
+
+def test_cache_descarta_la_entrada_menos_usada(tmp_path):
+    ruta = str(tmp_path / 'correccion.json')
+    corrector = CorrectorOrtografico(ruta_cache=ruta, max_entradas=3, max_workers=1)
+    corrector.corregir_textos(['a b'])  # Tokens 'a', ' ' y 'b'
+    corrector.corregir_textos(['a'])  # 'a' pasa a ser la más reciente
+    corrector.corregir_textos(['c'])  # Supera el máximo: sale ' ', la menos usada
+    assert list(corrector.cache) == ['b', 'a', 'c']
+
+    corrector.guardar()
+    assert list(CorrectorOrtografico(ruta_cache=ruta, max_entradas=3, max_workers=1).cache) == ['b', 'a', 'c']
@@ -0,0 +1,74 @@
+# test_stage_cache.py
+import os
+
+import pandas as pd
+import pytest
+
+from tasks.pipeline.stage_cache import CacheEtapas
+
+
+@pytest.fixture
+def directorio(tmp_path):
+    return str(tmp_path / 'cache')
+
+
+@pytest.fixture
+def etapa():
+    llamadas = []
+
+    def sumar(df, incremento=1):
+        llamadas.append(incremento)
+        return df.assign(valor=df['valor'] + incremento)
+
+    sumar.llamadas = llamadas
+    return sumar
+
+
+def _datos(valores=(1, 2, 3)):
+    return pd.DataFrame({'valor': list(valores)}, index=[10, 20, 30][:len(valores)])
+
+
+def test_acierto_reutiliza_el_resultado(directorio, etapa):
+    primero = CacheEtapas(directorio).ejecutar('etapa', etapa, _datos())
+    # Otra ejecución del pipeline: nueva instancia, mismas entradas
+    segundo = CacheEtapas(directorio).ejecutar('etapa', etapa, _datos())
+    assert len(etapa.llamadas) == 1
+    pd.testing.assert_frame_equal(segundo, primero)
+
+
+def test_fallo_si_cambian_entradas_o_parametros(directorio, etapa):
+    cache = CacheEtapas(directorio)
+    cache.ejecutar('etapa', etapa, _datos())
+    cache.ejecutar('etapa', etapa, _datos((1, 2, 4)))
+    cache.ejecutar('etapa', etapa, _datos((1, 2, 4)).astype({'valor': 'float64'}))
+    resultado = cache.ejecutar('etapa', etapa, _datos((1, 2, 4)), parametros={'incremento': 5})
+    assert etapa.llamadas == [1, 1, 1, 5]
+    assert resultado['valor'].tolist() == [6, 7, 9]
+    # Solo se conserva el último resultado de cada etapa
+    assert len(os.listdir(os.path.join(directorio, 'etapa'))) == 1
+
+
+def test_fallo_si_cambia_un_archivo(directorio, tmp_path):
+    ruta = tmp_path / 'origen.csv'
+    ruta.write_text('valor\n1\n')
+    leer = lambda: pd.read_csv(ruta)
+    assert CacheEtapas(directorio).ejecutar('lectura', leer, archivos=[str(ruta)])['valor'].tolist() == [1]
+    ruta.write_text('valor\n22\n')
+    assert CacheEtapas(directorio).ejecutar('lectura', leer, archivos=[str(ruta)])['valor'].tolist() == [22]
+
+
+def test_forzar_recalcula(directorio, etapa):
+    CacheEtapas(directorio).ejecutar('etapa', etapa, _datos())
+    CacheEtapas(directorio, forzar=['etapa']).ejecutar('etapa', etapa, _datos())
+    CacheEtapas(directorio, forzar=['otra']).ejecutar('etapa', etapa, _datos())
+    assert len(etapa.llamadas) == 2
+
+
+def test_no_memoiza_resultados_vacios_ni_con_la_cache_desactivada(directorio, etapa):
+    vacia = []
+    for _ in range(2):
+        CacheEtapas(directorio).ejecutar('vacia', lambda: vacia.append(1))
+        CacheEtapas(directorio, desactivada=True).ejecutar('etapa', etapa, _datos())
+    assert len(vacia) == 2 and len(etapa.llamadas) == 2
+    assert not os.path.exists(os.path.join(directorio, 'vacia'))
+    assert not os.path.exists(os.path.join(directorio, 'etapa'))
@@ -0,0 +1,63 @@
+# test_text_normalization.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from tasks.transformation.text_normalization import normalizar_serie, normalizar_categorias, normalizar_columnas
+
+
+def _normalizacion_fila_a_fila(serie, minusculas=True):
+    # Las pasadas de clean_text_columns que reemplaza la normalización sobre valores únicos
+    texto = serie.fillna('').apply(lambda x: ', '.join(x) if isinstance(x, list) else str(x))
+    if minusculas:
+        texto = texto.str.lower()
+    return texto.str.strip().replace(r'\s+', ' ', regex=True)
+
+
+SERIE = pd.Series(['  CAFETERIA   LA PLAZA ', 'Cafeteria la plaza', None, 'BAR\tSOL', 'BAR SOL  ', np.nan,
+                   '', ['Autor A', 'Autor B'], 7], name='rotulo', index=range(10, 19))
+
+
+@pytest.mark.parametrize('minusculas', [True, False])
+def test_igual_que_fila_a_fila(minusculas):
+    pd.testing.assert_series_equal(normalizar_serie(SERIE, minusculas=minusculas),
+                                   _normalizacion_fila_a_fila(SERIE, minusculas))
+
+
+def test_conserva_nulos():
+    resultado = normalizar_serie(pd.Series(['  a ', None, np.nan, 'b']), nulo=None)
+    assert resultado[0] == 'a' and resultado[3] == 'b'
+    assert resultado[1] is None and np.isnan(resultado[2])
+
+
+def test_tipos_de_salida():
+    categorica = normalizar_serie(SERIE, dtype='category')
+    assert isinstance(categorica.dtype, pd.CategoricalDtype)
+    assert categorica.astype(object).tolist() == _normalizacion_fila_a_fila(SERIE).tolist()
+    # 'CAFETERIA   LA PLAZA' y 'Cafeteria la plaza' quedan en la misma categoría
+    assert categorica.cat.categories.tolist().count('cafeteria la plaza') == 1
+    with pytest.raises(ValueError):
+        normalizar_serie(SERIE, dtype='int64')
+
+
+def test_salida_arrow():
+    pytest.importorskip('pyarrow')
+    resultado = normalizar_serie(SERIE, dtype='string[pyarrow]')
+    assert resultado.dtype == 'string[pyarrow]'
+    assert resultado.tolist() == _normalizacion_fila_a_fila(SERIE).tolist()
+
+
+def test_categorias_fusionadas_sin_tocar_filas():
+    serie = pd.Series(['CENTRO  ', ' CENTRO', 'RETIRO', None], dtype='category')
+    resultado = normalizar_categorias(serie)
+    assert resultado.tolist()[:3] == ['CENTRO', 'CENTRO', 'RETIRO'] and pd.isna(resultado.tolist()[3])
+    assert sorted(resultado.cat.categories) == ['CENTRO', 'RETIRO']
+    # Sobre una categórica, normalizar_serie también rellena los nulos
+    assert normalizar_serie(serie, minusculas=True).tolist() == ['centro', 'centro', 'retiro', '']
+
+
+def test_normalizar_columnas(caplog):
+    df = pd.DataFrame({'a': [' X  Y '], 'b': ['Z']})
+    resultado = normalizar_columnas(df, ['a', 'no_existe'])
+    assert resultado['a'].tolist() == ['x y'] and resultado['b'].tolist() == ['Z']
+    assert 'no_existe' in caplog.text